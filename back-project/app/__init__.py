@@ -1 +1,7 @@
-# This file makes the app directory a Python package 
\ No newline at end of file
+# This file makes the app directory a Python package
+
+# .env загружается при импорте пакета - раньше любого модуля, читающего настройки через os.getenv
+# (main, CLI сервисов, alembic, бенчмарки)
+from app.utils.env import load_env
+
+load_env()
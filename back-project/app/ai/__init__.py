@@ -1,3 +1,38 @@
-from .agent import petcare_agent
+import importlib
 
-__all__ = ['petcare_agent']
\ No newline at end of file
+import anyio
+
+# Модуль агента тянет google.adk, google.genai и google.generativeai (секунды импорта и десятки МБ),
+# поэтому загружается при первом обращении к AI, а не при старте приложения
+AGENT_MODULE = "app.ai.agent"
+
+_agent = None
+
+
+def get_agent():
+    """Модуль агента (модель, сервис сессий, Runner); импортирует его при первом вызове"""
+    global _agent
+    if _agent is None:
+        _agent = importlib.import_module(AGENT_MODULE)
+    return _agent
+
+
+async def load_agent():
+    """Как get_agent, но первый импорт идёт в потоке и не блокирует event loop"""
+    if _agent is not None:
+        return _agent
+    return await anyio.to_thread.run_sync(get_agent)
+
+
+def loaded_agent():
+    """Модуль агента, если уже загружен (остановка приложения не должна грузить ADK ради flush)"""
+    return _agent
+
+
+def __getattr__(name):
+    if name == "petcare_agent":
+        return get_agent().petcare_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['petcare_agent', 'get_agent', 'load_agent', 'loaded_agent']
@@ -1,20 +1,24 @@
 from google.adk.agents import Agent
-from google.adk.sessions import DatabaseSessionService
 from google.adk.runners import Runner
 from google.genai import types
-from google.generativeai import configure
 import os
-from dotenv import load_dotenv
+from app.ai.session_store import InstrumentedSessionService
+from app.ai.stub_llm import StubLlm, is_stub_model
 
-# Load environment variables
-load_dotenv()
+# Модель агента: имя Gemini или stub[...] - локальная заглушка для бенчмарков (см. app/ai/stub_llm.py)
+AI_MODEL = os.getenv("AI_MODEL", "gemini-2.0-flash")
 
-# Configure Google AI
+# Configure Google AI (не нужен для заглушки)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set")
-
-configure(api_key=GOOGLE_API_KEY)
+if is_stub_model(AI_MODEL):
+    agent_model = StubLlm(model=AI_MODEL)
+else:
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY environment variable is not set")
+    # google.generativeai - около секунды импорта, нужен только для настоящей модели
+    from google.generativeai import configure
+    configure(api_key=GOOGLE_API_KEY)
+    agent_model = AI_MODEL
 
 # Database configuration for session service
 DATABASE_URL = (
@@ -27,7 +31,7 @@ DATABASE_URL = (
 # --- Agent Configuration ---
 petcare_agent = Agent(
     name="PetCareAdvisor",
-    model="gemini-2.0-flash",
+    model=agent_model,
     description="Pet care companion for daily routines and general pet wellbeing",
     instruction="""
 Language:
@@ -127,7 +131,7 @@ Additional rules:
 )
 
 APP_NAME = "petcare_assistant_app"
-session_service = DatabaseSessionService(db_url=DATABASE_URL)
+session_service = InstrumentedSessionService(db_url=DATABASE_URL)
 runner = Runner(
     agent=petcare_agent,
     app_name=APP_NAME,
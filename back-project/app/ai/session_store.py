@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+from prometheus_client import Counter, Histogram
+from sqlalchemy import MetaData, Table, and_, select
+
+logger = logging.getLogger(__name__)
+
+# События AI-сессий пишутся как в ADK: append_event - одна транзакция на событие, с проверкой
+# устаревания сессии. Буфер записи на ход убран: пачка в одной транзакции требует приватных
+# ORM-классов и маркеров ревизии ADK, а запись после ответа теряет ход при падении воркера
+# Очистка истории: события старше отметки скрываются сразу, физически удаляются фоновой компакцией
+AI_HISTORY_COMPACTION_DELAY_SECONDS = float(os.getenv("AI_HISTORY_COMPACTION_DELAY_SECONDS", 30))
+AI_HISTORY_COMPACTION_BATCH = int(os.getenv("AI_HISTORY_COMPACTION_BATCH", 500))
+
+# Ключ состояния сессии: события с timestamp <= значения считаются удалёнными
+HISTORY_WATERMARK_KEY = "history_cleared_at"
+# ADK хранит время событий без часового пояса (UTC) в этих СУБД
+NAIVE_TIMESTAMP_DIALECTS = ("sqlite", "postgresql", "mysql")
+
+SessionKey = Tuple[str, str, str]
+
+# full - сессия с историей событий (Runner), metadata - только проверка существования
+SESSION_LOAD_SECONDS = Histogram(
+    "ai_session_load_seconds", "AI session read latency", ["mode"]
+)
+SESSION_LOADED_EVENTS = Histogram(
+    "ai_session_loaded_events", "Events loaded per full AI session read",
+    buckets=(0, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+SESSION_ENSURE = Counter(
+    "ai_session_ensure_total", "Session existence checks in /ai/assist", ["result"]
+)
+EVENTS_COMPACTED = Counter(
+    "ai_session_events_compacted_total", "Hidden AI session events physically deleted"
+)
+
+# Метаданные сессии без событий: состояние и ревизия, история не читается
+METADATA_ONLY = GetSessionConfig(num_recent_events=0)
+
+
+class InstrumentedSessionService(DatabaseSessionService):
+    """DatabaseSessionService с метриками чтения, дешёвой проверкой существования сессии
+    и очисткой истории за O(1): отметка в состоянии сессии + фоновая компакция"""
+
+    def __init__(self, *args, compaction_delay_seconds: float = AI_HISTORY_COMPACTION_DELAY_SECONDS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compaction_delay_seconds = compaction_delay_seconds
+        self._tasks = set()
+        self._events_table: Optional[Table] = None
+
+    async def get_session(
+        self, *, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig] = None
+    ) -> Optional[Session]:
+        mode = "metadata" if config is not None and config.num_recent_events == 0 else "full"
+        started = time.perf_counter()
+        session = await super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=METADATA_ONLY)
+        if session is not None and mode == "full":
+            # События очищенной истории (ещё не удалённые компакцией) не читаются из БД:
+            # отметка берётся из состояния, события - только начиная с неё
+            watermark = session.state.get(HISTORY_WATERMARK_KEY)
+            limit = config.num_recent_events if config else None
+            if watermark:
+                # after_timestamp включает границу: служебное событие очистки читается и отбрасывается ниже
+                config = (config or GetSessionConfig()).model_copy(update={
+                    "after_timestamp": max(watermark, (config and config.after_timestamp) or 0),
+                    "num_recent_events": limit + 1 if limit else limit,
+                })
+            session = await super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+            if session is not None:
+                if watermark:
+                    session.events = [event for event in session.events if event.timestamp > watermark]
+                    if limit:
+                        session.events = session.events[-limit:]
+                SESSION_LOADED_EVENTS.observe(len(session.events))
+        SESSION_LOAD_SECONDS.labels(mode).observe(time.perf_counter() - started)
+        return session
+
+    async def ensure_session(self, *, app_name: str, user_id: str, session_id: str) -> bool:
+        """Создать сессию, если её нет; True - если создана. Сессии ключуются по (app, user, id),
+        поэтому чужая сессия с тем же id не видна и не затрагивается - создаётся своя"""
+        if await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=METADATA_ONLY):
+            SESSION_ENSURE.labels("existing").inc()
+            return False
+        try:
+            await self.create_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        except AlreadyExistsError:
+            # Параллельный запрос с тем же session_id успел создать её первым
+            SESSION_ENSURE.labels("existing").inc()
+            return False
+        SESSION_ENSURE.labels("created").inc()
+        return True
+
+    async def clear_history(self, *, app_name: str, user_id: str, session_id: str) -> bool:
+        """Скрыть все события сессии одной записью (состояние сохраняется); False - сессии нет.
+        Отметка пишется служебным событием с state_delta - оно само попадает под отметку"""
+        session = await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=METADATA_ONLY)
+        if session is None:
+            return False
+        event = Event(invocation_id=f"clear-{uuid.uuid4().hex}", author="user", actions=EventActions())
+        event.actions.state_delta[HISTORY_WATERMARK_KEY] = event.timestamp
+        await self.append_event(session, event)
+        self._spawn(self._compact_later((app_name, user_id, session_id), event.timestamp))
+        return True
+
+    async def compact_history(self, key: SessionKey, watermark: float, batch_size: int = AI_HISTORY_COMPACTION_BATCH) -> int:
+        """Удалить скрытые события сессии пачками по batch_size; возвращает число удалённых"""
+        app_name, user_id, session_id = key
+        events = await self._get_events_table()
+        moment = datetime.fromtimestamp(watermark, tz=timezone.utc)
+        if self.db_engine.dialect.name in NAIVE_TIMESTAMP_DIALECTS:
+            moment = moment.replace(tzinfo=None)
+        scope = and_(
+            events.c.app_name == app_name,
+            events.c.user_id == user_id,
+            events.c.session_id == session_id,
+        )
+        deleted = 0
+        while True:
+            async with self.db_engine.begin() as conn:
+                ids = (await conn.execute(
+                    select(events.c.id).where(scope, events.c.timestamp <= moment).limit(batch_size)
+                )).scalars().all()
+                if ids:
+                    await conn.execute(events.delete().where(scope, events.c.id.in_(ids)))
+            deleted += len(ids)
+            EVENTS_COMPACTED.inc(len(ids))
+            if len(ids) < batch_size:
+                return deleted
+            # Не занимать соединение и event loop надолго
+            await asyncio.sleep(0)
+
+    async def compact_all(self, app_name: str, batch_size: int = AI_HISTORY_COMPACTION_BATCH) -> int:
+        """Досчистить все сессии с отметкой (например, если процесс перезапустился до компакции)"""
+        deleted = 0
+        response = await self.list_sessions(app_name=app_name)
+        for session in response.sessions:
+            watermark = session.state.get(HISTORY_WATERMARK_KEY)
+            if watermark:
+                deleted += await self.compact_history((app_name, session.user_id, session.id), watermark, batch_size)
+        return deleted
+
+    async def warm_up(self) -> None:
+        """Открыть соединение async-движка ADK до приёма трафика"""
+        async with self.db_engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+    async def flush(self) -> None:
+        """Дождаться фоновых задач (остановка приложения, Runner.close)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _compact_later(self, key: SessionKey, watermark: float):
+        await asyncio.sleep(self.compaction_delay_seconds)
+        try:
+            deleted = await self.compact_history(key, watermark)
+            logger.info("AI session history compacted", extra={"session_id": key[2], "events": deleted})
+        except Exception:
+            # Не страшно: события уже скрыты, их удалит следующая очистка или compact_all
+            logger.warning("AI session history compaction failed", exc_info=True, extra={"session_id": key[2]})
+
+    async def _get_events_table(self) -> Table:
+        # Схема хранилища принадлежит ADK и зависит от версии; берём только нужные колонки из БД
+        if self._events_table is None:
+            async with self.db_engine.connect() as conn:
+                self._events_table = await conn.run_sync(
+                    lambda sync_conn: Table("events", MetaData(), autoload_with=sync_conn)
+                )
+        return self._events_table
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание хранилища AI-сессий")
+    parser.add_argument("--compact", action="store_true", help="удалить события очищенных историй")
+    args = parser.parse_args()
+
+    if args.compact:
+        from app.ai.agent import APP_NAME, DATABASE_URL
+        service = InstrumentedSessionService(db_url=DATABASE_URL)
+        print(f"Deleted {asyncio.run(service.compact_all(APP_NAME))} hidden events")
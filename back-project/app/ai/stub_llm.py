@@ -0,0 +1,77 @@
+import asyncio
+import os
+import random
+import zlib
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import Field
+
+STUB_MODEL_PREFIX = "stub"
+
+_VOCABULARY = (
+    "your", "pet", "needs", "fresh", "water", "daily", "walks", "regular", "meals", "and",
+    "a", "calm", "routine", "check", "with", "the", "vet", "if", "anything", "changes",
+    "keep", "an", "eye", "on", "weight", "play", "time", "helps", "too", "grooming",
+)
+
+
+def is_stub_model(model: str) -> bool:
+    return model.startswith(STUB_MODEL_PREFIX)
+
+
+class StubLlm(BaseLlm):
+    """Детерминированная локальная модель для нагрузочных тестов и профилирования /ai/assist:
+    не ходит в сеть и не требует GOOGLE_API_KEY. Один и тот же промпт даёт один и тот же ответ"""
+
+    model: str = STUB_MODEL_PREFIX
+    # Скорость "генерации" и длина ответа подбираются под реальную модель; читаются при создании,
+    # чтобы учитывать .env, загруженный после импорта модуля
+    tokens_per_second: float = Field(default_factory=lambda: float(os.getenv("AI_STUB_TOKENS_PER_SECOND", 50)))
+    response_tokens: int = Field(default_factory=lambda: int(os.getenv("AI_STUB_RESPONSE_TOKENS", 60)))
+    # Задержка до первого токена (сеть + prefill у настоящей модели)
+    first_token_seconds: float = Field(default_factory=lambda: float(os.getenv("AI_STUB_FIRST_TOKEN_SECONDS", 0.2)))
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [rf"{STUB_MODEL_PREFIX}.*"]
+
+    @staticmethod
+    def last_user_prompt(llm_request: LlmRequest) -> str:
+        for content in reversed(llm_request.contents or []):
+            if content.role == "user" and content.parts:
+                return "".join(part.text or "" for part in content.parts)
+        return ""
+
+    def reply_tokens(self, prompt: str) -> list[str]:
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        return [rng.choice(_VOCABULARY) for _ in range(self.response_tokens)]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        prompt = self.last_user_prompt(llm_request)
+        tokens = self.reply_tokens(prompt)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        await asyncio.sleep(self.first_token_seconds)
+
+        if stream:
+            for i, token in enumerate(tokens):
+                await asyncio.sleep(delay)
+                text = token if i == 0 else " " + token
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), partial=True)
+        else:
+            await asyncio.sleep(delay * len(tokens))
+
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=" ".join(tokens))]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=len(prompt.split()),
+                candidates_token_count=len(tokens),
+                total_token_count=len(prompt.split()) + len(tokens)
+            ),
+            turn_complete=True
+        )
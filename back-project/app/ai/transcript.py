@@ -0,0 +1,31 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+# Сводка о питомцах, которую /ai/assist добавляет перед сообщением пользователя для контекста модели
+PET_SUMMARY_PATTERN = re.compile(r"^User's pets:\n.*?\n\n", flags=re.DOTALL)
+NO_PETS_PATTERN = re.compile(r"^User has no pets registered\.\n\n")
+
+
+def event_text(event) -> Optional[str]:
+    """Текст события сессии ADK в том виде, в каком его видел пользователь"""
+    content_text = None
+    if hasattr(event, 'content') and event.content:
+        if hasattr(event.content, 'parts') and event.content.parts:
+            content_text = event.content.parts[0].text if event.content.parts[0] else None
+        elif isinstance(event.content, str):
+            content_text = event.content
+
+    if content_text and getattr(event, 'author', None) == 'user':
+        content_text = PET_SUMMARY_PATTERN.sub('', content_text)
+        content_text = NO_PETS_PATTERN.sub('', content_text)
+    return content_text
+
+
+def event_timestamp(event) -> Optional[str]:
+    timestamp = getattr(event, 'timestamp', None)
+    if not timestamp:
+        return None
+    if isinstance(timestamp, (int, float)):
+        return datetime.fromtimestamp(timestamp).isoformat()
+    return str(timestamp)
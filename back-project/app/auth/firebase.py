@@ -1,13 +1,21 @@
+import logging
 import os
-import firebase_admin
-import requests
-from firebase_admin import credentials, auth
+import threading
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 
+logger = logging.getLogger(__name__)
+
+# firebase_admin (вместе с google-auth, requests, grpc) грузится при первом обращении, а не при старте
+_auth = None
+_init_lock = threading.Lock()
+
 # Инициализация Firebase Admin SDK
 def initialize_firebase():
     """Инициализация Firebase Admin SDK"""
+    import firebase_admin
+    from firebase_admin import credentials
+
     try:
         # Проверяем, не инициализирован ли уже Firebase
         if not firebase_admin._apps:
@@ -34,11 +42,22 @@ def initialize_firebase():
                 cred = credentials.Certificate(firebase_config)
             
             firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK initialized successfully")
-    except Exception as e:
-        print(f"Error initializing Firebase Admin SDK: {e}")
+            logger.info("Firebase Admin SDK initialized")
+    except Exception:
+        logger.exception("Error initializing Firebase Admin SDK")
         raise
 
+def get_firebase_auth():
+    """Модуль firebase_admin.auth; при первом вызове импортирует и инициализирует SDK"""
+    global _auth
+    if _auth is None:
+        with _init_lock:
+            if _auth is None:
+                initialize_firebase()
+                from firebase_admin import auth
+                _auth = auth
+    return _auth
+
 def create_firebase_user(email: str, password: str, display_name: str = None) -> Dict[str, Any]:
     """
     Создание пользователя в Firebase
@@ -51,6 +70,8 @@ def create_firebase_user(email: str, password: str, display_name: str = None) ->
     Returns:
         Dict с данными созданного пользователя Firebase
     """
+    auth = get_firebase_auth()
+
     try:
         user_record = auth.create_user(
             email=email,
@@ -112,6 +133,8 @@ def send_email_verification_with_token(email: str, password: str) -> bool:
     Returns:
         True если email отправлен успешно
     """
+    import requests
+
     try:
         # Получаем API Key из переменных окружения
         api_key = os.getenv("FIREBASE_API_KEY")
@@ -182,6 +205,8 @@ def send_email_verification(email: str) -> bool:
     Returns:
         True если email отправлен успешно
     """
+    import requests
+
     try:
         # Получаем API Key из переменных окружения
         api_key = os.getenv("FIREBASE_API_KEY")
@@ -227,13 +252,15 @@ def check_email_verification(email: str) -> bool:
     Returns:
         True если email верифицирован, False в противном случае
     """
+    auth = get_firebase_auth()
+
     try:
         user_record = auth.get_user_by_email(email)
         return user_record.email_verified
     except auth.UserNotFoundError:
         return False
-    except Exception as e:
-        print(f"Error checking email verification: {e}")
+    except Exception:
+        logger.exception("Error checking email verification", extra={"email": email})
         return False
 
 def verify_firebase_token(id_token: str) -> Optional[Dict[str, Any]]:
@@ -246,6 +273,8 @@ def verify_firebase_token(id_token: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dict с данными пользователя Firebase или None если токен недействителен
     """
+    auth = get_firebase_auth()
+
     try:
         # Валидируем токен через Firebase Admin SDK
         decoded_token = auth.verify_id_token(id_token)
@@ -290,6 +319,8 @@ def get_firebase_user_by_uid(uid: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dict с данными пользователя или None если пользователь не найден
     """
+    auth = get_firebase_auth()
+
     try:
         user_record = auth.get_user(uid)
         return {
@@ -303,8 +334,8 @@ def get_firebase_user_by_uid(uid: str) -> Optional[Dict[str, Any]]:
         }
     except auth.UserNotFoundError:
         return None
-    except Exception as e:
-        print(f"Error getting Firebase user: {e}")
+    except Exception:
+        logger.exception("Error getting Firebase user", extra={"firebase_uid": uid})
         return None
 
 def change_firebase_password(uid: str, new_password: str) -> bool:
@@ -318,6 +349,8 @@ def change_firebase_password(uid: str, new_password: str) -> bool:
     Returns:
         True если пароль изменен успешно
     """
+    auth = get_firebase_auth()
+
     try:
         auth.update_user(uid, password=new_password)
         return True
@@ -344,6 +377,8 @@ def change_password_with_token(email: str, current_password: str, new_password:
     Returns:
         True если пароль изменен успешно
     """
+    import requests
+
     try:
         # Получаем API Key из переменных окружения
         api_key = os.getenv("FIREBASE_API_KEY")
@@ -417,6 +452,8 @@ def delete_firebase_user(uid: str) -> bool:
     Returns:
         True если пользователь удален успешно
     """
+    auth = get_firebase_auth()
+
     try:
         auth.delete_user(uid)
         return True
@@ -439,6 +476,8 @@ def delete_firebase_user_by_email(email: str) -> bool:
     Returns:
         True если пользователь удален успешно
     """
+    auth = get_firebase_auth()
+
     try:
         user_record = auth.get_user_by_email(email)
         return delete_firebase_user(user_record.uid)
@@ -450,6 +489,3 @@ def delete_firebase_user_by_email(email: str) -> bool:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete Firebase user: {str(e)}"
         )
-
-# Инициализируем Firebase при импорте модуля
-initialize_firebase() 
\ No newline at end of file
@@ -18,7 +18,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
 from app.db.session import Base
-from app.models import user, pet, activity_record
+from app.models import user, pet, activity_record, refresh_token, scheduled_reminder, agenda_occurrence, idempotency_key, account_deletion_job
 
 target_metadata = Base.metadata
 
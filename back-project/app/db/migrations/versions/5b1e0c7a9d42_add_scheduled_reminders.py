@@ -0,0 +1,46 @@
+"""add scheduled_reminders
+
+Revision ID: 5b1e0c7a9d42
+Revises: 04bb9854bb6e
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c7a9d42'
+down_revision: Union[str, Sequence[str], None] = '04bb9854bb6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'scheduled_reminders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence_index', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('due_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['record_id'], ['activity_records.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('record_id'),
+    )
+    op.create_index(op.f('ix_scheduled_reminders_id'), 'scheduled_reminders', ['id'], unique=False)
+    op.create_index(op.f('ix_scheduled_reminders_user_id'), 'scheduled_reminders', ['user_id'], unique=False)
+    op.create_index(op.f('ix_scheduled_reminders_due_at'), 'scheduled_reminders', ['due_at'], unique=False)
+    # Очередь заполняется из существующих записей: ReminderService.rebuild_queue (python -m app.services.reminder_service --rebuild)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scheduled_reminders_due_at'), table_name='scheduled_reminders')
+    op.drop_index(op.f('ix_scheduled_reminders_user_id'), table_name='scheduled_reminders')
+    op.drop_index(op.f('ix_scheduled_reminders_id'), table_name='scheduled_reminders')
+    op.drop_table('scheduled_reminders')
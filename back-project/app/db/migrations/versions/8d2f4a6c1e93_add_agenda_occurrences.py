@@ -0,0 +1,56 @@
+"""add agenda_occurrences
+
+Revision ID: 8d2f4a6c1e93
+Revises: 5b1e0c7a9d42
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4a6c1e93'
+down_revision: Union[str, Sequence[str], None] = '5b1e0c7a9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Тип уже создан для activity_records.category
+    activity_category_enum = postgresql.ENUM('FEEDING', 'CARE', 'ACTIVITY', name='activity_category_enum', create_type=False)
+    op.create_table(
+        'agenda_occurrences',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('pet_id', sa.Integer(), nullable=False),
+        sa.Column('category', activity_category_enum, nullable=False),
+        sa.Column('occurrence_index', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('starts_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['record_id'], ['activity_records.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('record_id', 'occurrence_index'),
+    )
+    op.create_index('ix_agenda_occurrences_user_id_starts_at', 'agenda_occurrences', ['user_id', 'starts_at'], unique=False)
+    op.create_table(
+        'agenda_windows',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('window_end', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    # Окна заполняются лениво при первом чтении повестки пользователя, backfill не нужен
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('agenda_windows')
+    op.drop_index('ix_agenda_occurrences_user_id_starts_at', table_name='agenda_occurrences')
+    op.drop_table('agenda_occurrences')
@@ -0,0 +1,28 @@
+"""add pets.records_version
+
+Revision ID: b7e3d91f5a20
+Revises: 8d2f4a6c1e93
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3d91f5a20'
+down_revision: Union[str, Sequence[str], None] = '8d2f4a6c1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pets', sa.Column('records_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('pets', 'records_version')
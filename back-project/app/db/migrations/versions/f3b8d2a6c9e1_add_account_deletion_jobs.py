@@ -0,0 +1,46 @@
+"""add account_deletion_jobs
+
+Revision ID: f3b8d2a6c9e1
+Revises: e9a1c3f7b2d4
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6c9e1'
+down_revision: Union[str, Sequence[str], None] = 'e9a1c3f7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'account_deletion_jobs',
+        sa.Column('job_id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status_token_hash', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='pending'),
+        sa.Column('deleted', sa.JSON(), nullable=False),
+        sa.Column('total_estimate', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+    )
+    op.create_index(op.f('ix_account_deletion_jobs_user_id'), 'account_deletion_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_account_deletion_jobs_status'), 'account_deletion_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_account_deletion_jobs_status'), table_name='account_deletion_jobs')
+    op.drop_index(op.f('ix_account_deletion_jobs_user_id'), table_name='account_deletion_jobs')
+    op.drop_table('account_deletion_jobs')
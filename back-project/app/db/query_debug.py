@@ -0,0 +1,125 @@
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+from app.db.query_stats import QueryStats, install_query_hooks, query_listeners
+
+logger = logging.getLogger(__name__)
+
+# Отладочный режим для разработки и staging: в продакшене не включать
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() in ("1", "true", "yes")
+# Превышение бюджета превращает ответ в 500 (для прогона тестовых скриптов против staging)
+QUERY_DEBUG_STRICT = os.getenv("QUERY_DEBUG_STRICT", "false").lower() in ("1", "true", "yes")
+QUERY_DEBUG_SLOW_MS = float(os.getenv("QUERY_DEBUG_SLOW_MS", 200))
+# Сколько одинаковых выражений за запрос считаем признаком N+1
+QUERY_DEBUG_REPEAT_THRESHOLD = int(os.getenv("QUERY_DEBUG_REPEAT_THRESHOLD", 5))
+QUERY_DEBUG_DEFAULT_BUDGET = int(os.getenv("QUERY_DEBUG_DEFAULT_BUDGET", 20))
+
+# Бюджеты SQL-выражений на запрос для горячих маршрутов ("METHOD шаблон пути").
+# get_current_user сам по себе делает один запрос; записи считаются по худшему случаю
+# (холодный кэш питомцев, напоминание и вхождения в окне повестки)
+ROUTE_QUERY_BUDGETS = {
+    "GET /pets/": 2,
+    "POST /pets/": 3,
+    "GET /records/": 3,
+    "GET /records/all-user-pets": 3,
+    "GET /records/by-date": 3,
+    "GET /records/by-date-range": 3,
+    "GET /records/calendar-summary": 4,
+    "GET /records/{record_id}": 3,
+    "POST /records/": 6,
+    "PATCH /records/{record_id}": 11,
+    "POST /auth/login": 4,
+    "POST /auth/refresh": 5,
+}
+
+# Запрос с Idempotency-Key дополнительно захватывает ключ (INSERT) и сохраняет ответ (UPDATE)
+IDEMPOTENCY_KEY_QUERIES = 2
+
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, label: str, count: int, budget: int, stats: Optional[QueryStats] = None):
+        self.label = label
+        self.count = count
+        self.budget = budget
+        self.stats = stats
+        super().__init__(f"{label}: {count} SQL statements, budget is {budget}{describe_repeats(stats)}")
+
+
+def budget_for(method: str, route: str, idempotent: bool = False) -> int:
+    budget = ROUTE_QUERY_BUDGETS.get(f"{method} {route}", QUERY_DEBUG_DEFAULT_BUDGET)
+    return budget + IDEMPOTENCY_KEY_QUERIES if idempotent else budget
+
+
+def repeated_statements(stats: Optional[QueryStats], threshold: int = QUERY_DEBUG_REPEAT_THRESHOLD):
+    """Выражения, выполненные threshold и более раз: типичный след ленивой загрузки в цикле"""
+    if not stats or not stats.statements:
+        return []
+    return [(statement, count) for statement, count in stats.statements.most_common() if count >= threshold]
+
+
+def describe_repeats(stats: Optional[QueryStats]) -> str:
+    repeats = repeated_statements(stats)
+    if not repeats:
+        return ""
+    return "; repeated: " + "; ".join(f"{count}x {' '.join(statement.split())[:200]}" for statement, count in repeats)
+
+
+def explain(conn, statement: str, parameters) -> Optional[str]:
+    """План запроса через отдельный курсор DBAPI, чтобы не вызывать хуки повторно"""
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+
+
+def log_slow_query(conn, statement, parameters, executemany, duration):
+    if duration * 1000 < QUERY_DEBUG_SLOW_MS:
+        return
+    plan = None if executemany else explain(conn, statement, parameters)
+    logger.warning(
+        "Slow query",
+        extra={"duration_ms": round(duration * 1000, 1), "statement": " ".join(statement.split()), "plan": plan}
+    )
+
+
+def install_query_debug():
+    install_query_hooks()
+    if log_slow_query not in query_listeners:
+        query_listeners.append(log_slow_query)
+
+
+@contextmanager
+def query_budget(budget: int, label: str = "block"):
+    """Для тестов: with query_budget(3): client.get("/records/") упадёт при превышении.
+    Считает все выражения процесса (TestClient выполняет приложение в другом потоке)"""
+    install_query_hooks()
+    stats = QueryStats()
+    stats.statements = Counter()
+
+    def count(conn, statement, parameters, executemany, duration):
+        stats.count += 1
+        stats.duration += duration
+        stats.statements[statement] += 1
+
+    query_listeners.append(count)
+    try:
+        yield stats
+    finally:
+        query_listeners.remove(count)
+    if stats.count > budget:
+        raise QueryBudgetExceeded(label, stats.count, budget, stats)
@@ -0,0 +1,62 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """SQL-статистика одного запроса: число выражений и суммарное время"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Счётчик одинаковых выражений; включается только отладочным режимом (поиск N+1)
+        self.statements: Optional[Counter] = None
+
+
+# Статистика текущего HTTP-запроса. Синхронные эндпоинты выполняются в threadpool,
+# куда контекст копируется, поэтому изменения объекта видны middleware
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Подписчики на каждое выполненное выражение: (conn, statement, parameters, executemany, duration_seconds)
+query_listeners: List[Callable[..., None]] = []
+
+_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+    for listener in query_listeners:
+        listener(conn, statement, parameters, executemany, duration)
+
+
+def _handle_error(context):
+    # Упавшее выражение не доходит до after_cursor_execute
+    if context.connection is not None:
+        start_times = context.connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+
+def install_query_hooks():
+    """Подписаться на события всех движков (в том числе тестовых) один раз на процесс"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
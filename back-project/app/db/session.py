@@ -9,6 +9,33 @@ DATABASE_URL = (
     f"{os.getenv('POSTGRES_DB', 'petcare')}"
 )
 
-engine = create_engine(DATABASE_URL)
+# Пул соединений на процесс: при нескольких воркерах соединений к Postgres в WEB_CONCURRENCY раз больше
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+# Сколько соединений открыть при старте воркера, до приёма трафика (0 - лениво, как раньше)
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", 0))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+Base = declarative_base() 
+
+
+def warm_up_pool(size: int = DB_POOL_WARMUP) -> int:
+    """Открыть соединения пула заранее, чтобы первые запросы воркера не ждали connect и TLS"""
+    connections = []
+    try:
+        for _ in range(min(size, DB_POOL_SIZE)):
+            connection = engine.connect()
+            connection.exec_driver_sql("SELECT 1")
+            connections.append(connection)
+    finally:
+        # Соединения возвращаются в пул, а не закрываются
+        for connection in connections:
+            connection.close()
+    return len(connections)
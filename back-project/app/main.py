@@ -1,22 +1,115 @@
+import asyncio
+import contextlib
+import logging
 import os
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+import anyio
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, pets, ai, activity_records
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from app.db.session import DB_POOL_WARMUP, warm_up_pool
+from app.db.query_debug import QUERY_DEBUG
+from app.middleware import (
+    CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware, QueryDebugMiddleware, RequestIdMiddleware
+)
+from app.routers import auth, pets, ai, activity_records, export
+from app.ai import get_agent, loaded_agent
+from app.auth.firebase import get_firebase_auth
+from app.utils.profiling import PROFILING_ENABLED
+
+from app.utils.log import setup_logging
+setup_logging()
+
+from app.services.reminder_service import REMINDER_SCHEDULER_ENABLED, ReminderScheduler
+from app.services.account_deletion_service import RESUME_INTERVAL_SECONDS, AccountDeletionResumer
+
+logger = logging.getLogger(__name__)
+
+# Задан в gunicorn.conf.py: несколько воркеров, метрики собираются из файлов всех процессов
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Firebase Admin и AI-агент грузятся при первом обращении; с этим флагом - сразу после старта в фоне,
+# чтобы первый запрос к ним не платил за импорт (на время до приёма трафика не влияет)
+PRELOAD_OPTIONAL_SUBSYSTEMS = os.getenv("PRELOAD_OPTIONAL_SUBSYSTEMS", "true").lower() in ("1", "true", "yes")
+# Периодическая компакция очищенных историй AI-сессий (0 - выключено): отложенная компакция после очистки
+# живёт в памяти процесса и теряется при перезапуске, этот проход дочищает такие сессии
+AI_HISTORY_COMPACTION_INTERVAL_SECONDS = float(os.getenv("AI_HISTORY_COMPACTION_INTERVAL_SECONDS", 3600))
+
+async def preload_optional_subsystems():
+    for name, loader in (("firebase", get_firebase_auth), ("ai", get_agent)):
+        started = time.perf_counter()
+        try:
+            await anyio.to_thread.run_sync(loader)
+            logger.info("Subsystem preloaded", extra={"subsystem": name, "seconds": round(time.perf_counter() - started, 3)})
+        except Exception:
+            # Не фатально: подсистема попробует загрузиться снова при первом обращении
+            logger.warning("Subsystem preload failed", exc_info=True, extra={"subsystem": name})
+    if DB_POOL_WARMUP and loaded_agent():
+        try:
+            await loaded_agent().session_service.warm_up()
+        except Exception:
+            logger.warning("AI session database warm-up failed", exc_info=True)
+
+async def compact_ai_histories(preload: Optional[asyncio.Task]):
+    """Первый проход - после загрузки AI (перезапуск мог оборвать компакцию), дальше - раз в интервал.
+    ADK ради этого не грузится: без загруженного агента проход пропускается. При нескольких воркерах
+    проходы могут совпасть - это безопасно, события удаляются по id"""
+    if preload:
+        await asyncio.shield(preload)
+    while True:
+        agent = loaded_agent()
+        if agent:
+            try:
+                deleted = await agent.session_service.compact_all(agent.APP_NAME)
+                if deleted:
+                    logger.info("AI session histories compacted", extra={"events": deleted})
+            except Exception:
+                logger.warning("AI session history compaction failed", exc_info=True)
+        await asyncio.sleep(AI_HISTORY_COMPACTION_INTERVAL_SECONDS)
 
-# Load environment variables from .env file manually
-def load_env_file():
-    env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-    if os.path.exists(env_path):
-        with open(env_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев пулов БД: воркер начинает принимать запросы только после startup
+    if DB_POOL_WARMUP:
+        try:
+            warmed = await anyio.to_thread.run_sync(warm_up_pool)
+            logger.info("Database pool warmed up", extra={"connections": warmed})
+        except Exception:
+            # Без БД воркер всё равно поднимается, соединения откроются при первых запросах
+            logger.warning("Database pool warm-up failed", exc_info=True)
+    preload = asyncio.create_task(preload_optional_subsystems()) if PRELOAD_OPTIONAL_SUBSYSTEMS else None
 
-load_env_file()
+    # Планировщик напоминаний включается явно: при нескольких процессах достаточно одного
+    # (параллельная работа тоже безопасна - очередь разбирается через SKIP LOCKED)
+    reminder_scheduler = ReminderScheduler() if REMINDER_SCHEDULER_ENABLED else None
+    if reminder_scheduler:
+        reminder_scheduler.start()
+    # Фоновые удаления аккаунтов, брошенные упавшим воркером, подбирает любой живой (0 - выключено)
+    deletion_resumer = AccountDeletionResumer() if RESUME_INTERVAL_SECONDS > 0 else None
+    if deletion_resumer:
+        deletion_resumer.start()
+    compaction = (
+        asyncio.create_task(compact_ai_histories(preload)) if AI_HISTORY_COMPACTION_INTERVAL_SECONDS > 0 else None
+    )
+    yield
+    if compaction:
+        # Прерывать безопасно: каждая пачка удаления - своя транзакция
+        compaction.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await compaction
+    if reminder_scheduler:
+        reminder_scheduler.stop(timeout=10)
+    if deletion_resumer:
+        deletion_resumer.stop(timeout=10)
+    if preload:
+        await preload
+    # Дождаться фоновой компакции истории AI-сессий (если AI вообще загружался)
+    agent = loaded_agent()
+    if agent:
+        await agent.session_service.flush()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS settings (adjust origins as needed)
 app.add_middleware(
@@ -27,12 +120,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip/Brotli for large JSON bodies (records lists, AI session histories)
+app.add_middleware(CompressionMiddleware)
+
+# SQL debugging for development/staging: N+1, query budgets, slow queries with EXPLAIN
+if QUERY_DEBUG:
+    app.add_middleware(QueryDebugMiddleware)
+
+# Request profiling on demand (X-Profile header) or by sampling; not installed at all when disabled
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Prometheus metrics (latency includes compression and CORS)
+app.add_middleware(MetricsMiddleware)
+
+# Request id for logs and the X-Request-ID response header (outermost)
+app.add_middleware(RequestIdMiddleware)
+
 # Register all routers (including auth with /auth/refresh)
 app.include_router(auth.router)
 app.include_router(pets.router)
 app.include_router(ai.router)
 app.include_router(activity_records.router)
+app.include_router(export.router)
+if PROFILING_ENABLED:
+    # Роутер артефактов профилирования импортируется, только если он нужен
+    from app.routers import admin
+    app.include_router(admin.router)
 
 @app.get("/")
 def root():
-    return {"message": "Petcare API is running"} 
\ No newline at end of file
+    return {"message": "Petcare API is running"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+ 
\ No newline at end of file
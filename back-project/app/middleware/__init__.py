@@ -0,0 +1,13 @@
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
+from .query_debug import QueryDebugMiddleware
+from .request_id import RequestIdMiddleware
+
+__all__ = [
+    "CompressionMiddleware",
+    "MetricsMiddleware",
+    "ProfilingMiddleware",
+    "QueryDebugMiddleware",
+    "RequestIdMiddleware",
+]
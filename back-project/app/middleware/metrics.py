@@ -0,0 +1,80 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.db.query_stats import QueryStats, current_query_stats, install_query_hooks
+
+# Запросы без найденного маршрута (404, сканеры) сводятся в одну метку
+UNMATCHED_ROUTE = "unmatched"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ["method"],
+    multiprocess_mode="livesum"
+)
+REQUEST_EXCEPTIONS = Counter(
+    "http_request_exceptions_total", "Unhandled exceptions while handling a request", ["method", "route"]
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request", ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Total SQL time per request", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+
+
+def route_template(scope) -> str:
+    """Шаблон пути (/records/{record_id}) вместо фактического, чтобы не плодить метки"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Prometheus-метрики на уровне ASGI: счётчики, латентность, in-flight и SQL на запрос"""
+
+    def __init__(self, app, excluded_paths=("/metrics",)):
+        self.app = app
+        self.excluded_paths = tuple(excluded_paths)
+        install_query_hooks()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            REQUEST_EXCEPTIONS.labels(method, route_template(scope)).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            current_query_stats.reset(token)
+            route = route_template(scope)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            DB_QUERIES.labels(method, route).observe(stats.count)
+            DB_QUERY_DURATION.labels(method, route).observe(stats.duration)
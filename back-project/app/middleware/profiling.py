@@ -0,0 +1,60 @@
+import hmac
+import random
+
+import anyio
+
+from app.db.query_stats import install_query_hooks, query_listeners
+from app.utils.profiling import (
+    PROFILING_ADMIN_TOKEN,
+    PROFILING_SAMPLE_RATE,
+    RequestProfile,
+    active_profile,
+    record_query,
+    save_profile,
+)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы: по заголовку X-Profile: <PROFILING_ADMIN_TOKEN>
+    или случайно с долей PROFILING_SAMPLE_RATE. Остальные запросы проходят без изменений"""
+
+    def __init__(self, app, admin_token: str = PROFILING_ADMIN_TOKEN, sample_rate: float = PROFILING_SAMPLE_RATE):
+        self.app = app
+        self.admin_token = admin_token.encode()
+        self.sample_rate = sample_rate
+        install_query_hooks()
+        if record_query not in query_listeners:
+            query_listeners.append(record_query)
+
+    def should_profile(self, scope) -> bool:
+        if self.admin_token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.admin_token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = active_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile.id.encode())]
+            await send(message)
+
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            active_profile.reset(token)
+            # Запись на диск не должна задерживать event loop
+            await anyio.to_thread.run_sync(save_profile, profile)
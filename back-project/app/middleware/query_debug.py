@@ -0,0 +1,81 @@
+import logging
+from collections import Counter
+
+from app.db.query_debug import (
+    QUERY_DEBUG_REPEAT_THRESHOLD,
+    QUERY_DEBUG_STRICT,
+    QueryBudgetExceeded,
+    budget_for,
+    install_query_debug,
+    repeated_statements,
+)
+from app.db.query_stats import QueryStats, current_query_stats
+from app.middleware.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+class QueryDebugMiddleware:
+    """Отладка SQL на запрос: X-Query-Count, поиск N+1, бюджеты маршрутов, медленные запросы с EXPLAIN.
+    В строгом режиме превышение бюджета отдаёт 500, чтобы тестовые прогоны падали"""
+
+    def __init__(self, app, strict: bool = QUERY_DEBUG_STRICT):
+        self.app = app
+        self.strict = strict
+        install_query_debug()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Если запрос уже считает MetricsMiddleware, используем ту же статистику
+        stats = current_query_stats.get()
+        token = None
+        if stats is None:
+            stats = QueryStats()
+            token = current_query_stats.set(stats)
+        stats.statements = Counter()
+        started_count = stats.count
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                method, route = scope["method"], route_template(scope)
+                count = stats.count - started_count
+                idempotent = any(name == b"idempotency-key" for name, _ in scope.get("headers", []))
+                budget = budget_for(method, route, idempotent)
+                for statement, repeats in repeated_statements(stats, QUERY_DEBUG_REPEAT_THRESHOLD):
+                    logger.warning(
+                        "Possible N+1",
+                        extra={"route": f"{method} {route}", "repeats": repeats, "statement": " ".join(statement.split())}
+                    )
+                if count > budget:
+                    error = QueryBudgetExceeded(f"{method} {route}", count, budget, stats)
+                    logger.warning("Query budget exceeded: %s", error)
+                    if self.strict:
+                        replaced = True
+                        body = str(error).encode()
+                        await send({
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [
+                                (b"content-type", b"text/plain; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"x-query-count", str(count).encode()),
+                            ],
+                        })
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                message["headers"] = list(message.get("headers", [])) + [(b"x-query-count", str(count).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stats.statements = None
+            if token is not None:
+                current_query_stats.reset(token)
@@ -1,4 +1,8 @@
 from .user import User
 from .pet import Pet
 from .activity_record import ActivityRecord, ActivityCategory
-from .refresh_token import RefreshToken 
\ No newline at end of file
+from .refresh_token import RefreshToken
+from .scheduled_reminder import ScheduledReminder
+from .agenda_occurrence import AgendaOccurrence, AgendaWindow
+from .idempotency_key import IdempotencyKey
+from .account_deletion_job import AccountDeletionJobRecord
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from app.db.session import Base
+
+class AccountDeletionJobRecord(Base):
+    """Фоновое удаление аккаунта. Строка переживает пользователя (без FK), поэтому
+    статус виден из любого воркера, а брошенную упавшим процессом задачу можно возобновить."""
+    __tablename__ = "account_deletion_jobs"
+
+    job_id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    status_token_hash = Column(String(64), nullable=False)  # sha256 токена, выданного вместе с job_id
+    status = Column(String(16), nullable=False, default="pending", index=True)  # pending | running | completed | failed
+    deleted = Column(JSON, nullable=False, default=dict)
+    total_estimate = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
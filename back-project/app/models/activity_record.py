@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 import enum
@@ -17,6 +17,13 @@ class RepeatType(str, enum.Enum):
 
 class ActivityRecord(Base):
     __tablename__ = "activity_records"
+    __table_args__ = (
+        # Агрегаты по питомцу и категории (SUM граммов, минут) читаются из индекса без обращения к таблице
+        Index(
+            "ix_activity_records_pet_id_category_date", "pet_id", "category", "date",
+            postgresql_include=["quantity_value", "quantity_unit", "duration_minutes"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_id = Column(Integer, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False)
@@ -36,6 +43,11 @@ class ActivityRecord(Base):
     # Специфичные поля для activity
     duration = Column(String, nullable=True)  # e.g., "30 minutes", "1 hour"
 
+    # Нормализованные значения (app.utils.measurements), заполняются при записи
+    quantity_value = Column(Float, nullable=True)
+    quantity_unit = Column(String, nullable=True)  # "g", "ml", "can", "piece", ...
+    duration_minutes = Column(Float, nullable=True)
+
     # Новые поля для повторов
     repeat_type = Column(Enum(RepeatType, name="repeat_type_enum"), default=RepeatType.NONE, nullable=False)
     repeat_interval = Column(Integer, default=1, nullable=False)  # раз в X дней/недель/месяцев/лет
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, DateTime, Enum, ForeignKey, Index, UniqueConstraint
+from app.db.session import Base
+from app.models.activity_record import ActivityCategory
+
+class AgendaOccurrence(Base):
+    """Материализованная повестка: одна строка на вхождение записи (повторы уже развёрнуты)
+    внутри окна пользователя. Чтение "сегодня"/"неделя" - один range scan по (user_id, starts_at)."""
+    __tablename__ = "agenda_occurrences"
+    __table_args__ = (
+        UniqueConstraint("record_id", "occurrence_index"),
+        Index("ix_agenda_occurrences_user_id_starts_at", "user_id", "starts_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    record_id = Column(Integer, ForeignKey("activity_records.id", ondelete="CASCADE"), nullable=False)
+    pet_id = Column(Integer, nullable=False)
+    category = Column(Enum(ActivityCategory, name="activity_category_enum"), nullable=False)
+    occurrence_index = Column(Integer, nullable=False, default=0)
+    starts_at = Column(DateTime, nullable=False)
+
+
+class AgendaWindow(Base):
+    """Границы материализованного окна пользователя [window_start, window_end).
+    Окно создаётся при первом чтении и сдвигается вперёд по мере течения времени."""
+    __tablename__ = "agenda_windows"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
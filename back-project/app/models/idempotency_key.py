@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.db.session import Base
+
+class IdempotencyKey(Base):
+    """Ответы на POST-запросы с заголовком Idempotency-Key: повтор запроса получает сохранённый ответ.
+    Пока обработчик выполняется, status_code пуст - параллельный повтор получает 409."""
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(64), primary_key=True)  # "user:<id>" или "register:<hmac email>" для регистрации
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String(64), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
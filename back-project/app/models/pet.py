@@ -20,6 +20,8 @@ class Pet(Base):
     weight = Column(Float, nullable=False)
     weight_unit = Column(String, nullable=False, default="kg")
     notes = Column(Text, nullable=True)
+    # Растёт при каждом изменении записей питомца: ключ кэша статистики
+    records_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="pets")
     activity_records = relationship("ActivityRecord", back_populates="pet", cascade="all, delete-orphan") 
\ No newline at end of file
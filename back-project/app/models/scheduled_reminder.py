@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.db.session import Base
+
+class ScheduledReminder(Base):
+    """Очередь напоминаний: одна строка на запись с notify - её ближайшее вхождение.
+    Индекс по due_at играет роль персистентной min-кучи."""
+    __tablename__ = "scheduled_reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    record_id = Column(Integer, ForeignKey("activity_records.id", ondelete="CASCADE"), nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    occurrence_index = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False, index=True)
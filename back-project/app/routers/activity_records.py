@@ -1,22 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import logging
+import tempfile
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 from app.auth.deps import get_db, get_current_user
 from app.models.user import User
 from app.schemas.activity_record import (
     ActivityRecordCreate, 
     ActivityRecordRead, 
+    ActivityRecordListItem,
     ActivityRecordUpdate,
-    ActivityCategory
+    ActivityCategory,
+    RecordFields,
+    CalendarMonthSummary,
+    AgendaItemRead,
+    ImportReport
 )
 from app.services.activity_record_service import ActivityRecordService
+from app.services.agenda_service import AgendaService
+from app.services.idempotency_service import IDEMPOTENCY_HEADER, IdempotencyService
+from app.services.import_service import IMPORT_MAX_BYTES, ImportFormat, ImportService
+from app.utils.serialization import FAST_JSON_RESPONSES, FastJSONResponse, list_response
 
 router = APIRouter(prefix="/records", tags=["activity_records"])
 
-@router.get("/all-user-pets", response_model=List[ActivityRecordRead])
+logger = logging.getLogger(__name__)
+
+@router.get("/all-user-pets", response_model=List[ActivityRecordListItem])
 def get_all_user_activity_records(
     category: Optional[ActivityCategory] = Query(None, description="Категория записи"),
+    fields: RecordFields = Query(RecordFields.FULL, description="Набор полей: full или calendar (без notes)"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
     db: Session = Depends(get_db),
@@ -28,14 +43,17 @@ def get_all_user_activity_records(
         current_user=current_user,
         category=category,
         skip=skip,
-        limit=limit
+        limit=limit,
+        as_rows=FAST_JSON_RESPONSES,
+        fields=fields
     )
-    return records
+    return list_response(records, projected=fields != RecordFields.FULL)
 
-@router.get("/by-date", response_model=List[ActivityRecordRead])
+@router.get("/by-date", response_model=List[ActivityRecordListItem])
 def get_activity_records_by_date(
     date: date = Query(..., description="Дата в формате YYYY-MM-DD"),
     category: Optional[ActivityCategory] = Query(None, description="Категория записи"),
+    fields: RecordFields = Query(RecordFields.FULL, description="Набор полей: full или calendar (без notes)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -44,15 +62,18 @@ def get_activity_records_by_date(
         db=db,
         target_date=date,
         current_user=current_user,
-        category=category
+        category=category,
+        as_rows=FAST_JSON_RESPONSES,
+        fields=fields
     )
-    return records
+    return list_response(records, projected=fields != RecordFields.FULL)
 
-@router.get("/by-date-range", response_model=List[ActivityRecordRead])
+@router.get("/by-date-range", response_model=List[ActivityRecordListItem])
 def get_activity_records_by_date_range(
     start_date: date = Query(..., description="Начальная дата в формате YYYY-MM-DD"),
     end_date: date = Query(..., description="Конечная дата в формате YYYY-MM-DD"),
     category: Optional[ActivityCategory] = Query(None, description="Категория записи"),
+    fields: RecordFields = Query(RecordFields.FULL, description="Набор полей: full или calendar (без notes)"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
     db: Session = Depends(get_db),
@@ -72,29 +93,106 @@ def get_activity_records_by_date_range(
         current_user=current_user,
         category=category,
         skip=skip,
-        limit=limit
+        limit=limit,
+        as_rows=FAST_JSON_RESPONSES,
+        fields=fields
+    )
+    return list_response(records, projected=fields != RecordFields.FULL)
+
+@router.get("/calendar-summary", response_model=CalendarMonthSummary)
+def get_calendar_summary(
+    month: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="Месяц в формате YYYY-MM"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Количество активностей по дням месяца (с учётом повторов) по категориям и питомцам"""
+    month_start = datetime.strptime(month, "%Y-%m")
+    return ActivityRecordService.get_calendar_summary(
+        db=db,
+        year=month_start.year,
+        month=month_start.month,
+        current_user=current_user
+    )
+
+@router.get("/agenda", response_model=List[AgendaItemRead])
+def get_agenda(
+    start_date: Optional[date] = Query(None, description="Первый день в формате YYYY-MM-DD (по умолчанию сегодня, UTC)"),
+    days: int = Query(1, ge=1, le=366, description="Количество дней: 1 - сегодня, 7 - неделя"),
+    category: Optional[ActivityCategory] = Query(None, description="Категория записи"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Повестка на день или неделю: вхождения записей с уже развёрнутыми повторами, по времени"""
+    items = AgendaService.get_agenda(
+        db=db,
+        user_id=current_user.id,
+        start_date=start_date or datetime.utcnow().date(),
+        days=days,
+        category=category
     )
-    return records
+    return FastJSONResponse(items) if FAST_JSON_RESPONSES else items
 
 @router.post("/", response_model=ActivityRecordRead)
 def create_activity_record(
     record: ActivityRecordCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255, description="Ключ повтора: повторный запрос с тем же ключом вернёт исходный ответ"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Создать новую запись активности"""
-    try:
-        return ActivityRecordService.create_record(db=db, record=record, current_user=current_user)
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=str(e)
-        )
+    with IdempotencyService.claim(db, idempotency_key, f"user:{current_user.id}", "records.create", record) as claim:
+        if claim.replayed:
+            return claim.replay()
+        try:
+            ActivityRecordService.create_record(
+                db=db, record=record, current_user=current_user,
+                before_commit=claim.save_as(ActivityRecordRead)
+            )
+        except LookupError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
+        except PermissionError as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e)
+            )
+        return claim.response
+
+@router.post("/import", response_model=ImportReport)
+async def import_activity_records(
+    request: Request,
+    format: ImportFormat = Query(ImportFormat.NDJSON, description="Формат тела запроса: ndjson или csv (с заголовком)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Массовый импорт записей из файла (тело запроса); дубликаты пропускаются, ошибки - по строкам"""
+    # Тело читается потоком во временный файл: в памяти до 8 МБ, дальше на диске
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Import file is larger than {IMPORT_MAX_BYTES} bytes"
+                )
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await run_in_threadpool(ImportService.import_records, db, upload, format, current_user.id)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
 
-@router.get("/", response_model=List[ActivityRecordRead])
+@router.get("/", response_model=List[ActivityRecordListItem])
 def get_activity_records(
     pet_id: int = Query(..., description="ID питомца"),
     category: Optional[ActivityCategory] = Query(None, description="Категория записи"),
+    fields: RecordFields = Query(RecordFields.FULL, description="Набор полей: full или calendar (без notes)"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(100, ge=1, le=1000, description="Максимальное количество записей"),
     db: Session = Depends(get_db),
@@ -107,9 +205,11 @@ def get_activity_records(
         current_user=current_user,
         category=category,
         skip=skip, 
-        limit=limit
+        limit=limit,
+        as_rows=FAST_JSON_RESPONSES,
+        fields=fields
     )
-    return records
+    return list_response(records, projected=fields != RecordFields.FULL)
 
 @router.patch("/disable-all-notifications")
 def disable_all_notifications(
@@ -166,9 +266,7 @@ def update_activity_record(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in update_activity_record: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error in update_activity_record", extra={"record_id": record_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error: {str(e)}"
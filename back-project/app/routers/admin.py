@@ -0,0 +1,33 @@
+import hmac
+from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.utils.profiling import PROFILING_ADMIN_TOKEN, list_profiles, load_profile
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+def require_admin_token(x_admin_token: str = Header("")):
+    """Доступ к артефактам профилирования по PROFILING_ADMIN_TOKEN"""
+    if not PROFILING_ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+@router.get("/profiles", response_model=List[str], dependencies=[Depends(require_admin_token)])
+def get_profiles():
+    """ID сохранённых профилей, новые первыми"""
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin_token)])
+def get_profile(profile_id: str):
+    """Профиль запроса: top кадров, folded-стеки и SQL-таймлайн"""
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+def get_profile_folded(profile_id: str):
+    """Стеки в формате folded для flamegraph.pl / speedscope"""
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return "\n".join(f"{stack} {count}" for stack, count in profile["samples"].items())
@@ -1,12 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from app.ai.agent import runner, session_service, APP_NAME
+from app.ai import load_agent
+from app.ai.transcript import event_text, event_timestamp
 from app.auth.deps import get_current_user, get_db
 from app.models.user import User
-from google.genai import types
 from typing import List, Optional
 import uuid
-import re
 from app.services.ai_data_service import get_user_pets, PetInfo
 from sqlalchemy.orm import Session
 from app.ai.data_api import AIAgentDataAPI
@@ -41,6 +40,8 @@ async def assist(
     db: Session = Depends(get_db)
 ):
     try:
+        # ADK и модель грузятся при первом запросе к AI
+        agent = await load_agent()
         # 1. Instantiate the data API
         data_api = AIAgentDataAPI(db)
         pets = data_api.get_user_pets(current_user.id)
@@ -63,6 +64,7 @@ async def assist(
         # 3. Enrich the prompt
         enriched_message = pet_summary + request.message
 
+        from google.genai import types
         message = types.Content(
             role="user",
             parts=[types.Part(text=enriched_message)]
@@ -70,29 +72,22 @@ async def assist(
 
         # If session_id is not provided, create a new session and use its id
         if not request.session_id:
-            session = await session_service.create_session(
-                app_name=APP_NAME,
+            session = await agent.session_service.create_session(
+                app_name=agent.APP_NAME,
                 user_id=str(current_user.id)
             )
             session_id = session.id
         else:
             session_id = request.session_id
-            # Ensure the session exists (create if not)
-            try:
-                await session_service.get_session(
-                    app_name=APP_NAME,
-                    user_id=str(current_user.id),
-                    session_id=session_id
-                )
-            except Exception:
-                await session_service.create_session(
-                    app_name=APP_NAME,
-                    user_id=str(current_user.id),
-                    session_id=session_id
-                )
+            # Ensure the session exists (create if not); историю событий загрузит только Runner
+            await agent.session_service.ensure_session(
+                app_name=agent.APP_NAME,
+                user_id=str(current_user.id),
+                session_id=session_id
+            )
 
         final_response = "No AI response"
-        async for event in runner.run_async(
+        async for event in agent.runner.run_async(
             user_id=str(current_user.id),
             session_id=session_id,
             new_message=message
@@ -108,8 +103,9 @@ async def assist(
 @router.get("/sessions", response_model=List[SessionResponse])
 async def list_ai_sessions(current_user: User = Depends(get_current_user)):
     try:
-        sessions = await session_service.list_sessions(
-            app_name=APP_NAME,
+        agent = await load_agent()
+        sessions = await agent.session_service.list_sessions(
+            app_name=agent.APP_NAME,
             user_id=str(current_user.id)
         )
         session_objs = sessions.sessions
@@ -128,50 +124,22 @@ async def list_ai_sessions(current_user: User = Depends(get_current_user)):
 @router.get("/sessions/{session_id}/messages", response_model=List[EventResponse])
 async def list_ai_session_messages(session_id: str, current_user: User = Depends(get_current_user)):
     try:
-        session = await session_service.get_session(
-            app_name=APP_NAME,
+        agent = await load_agent()
+        session = await agent.session_service.get_session(
+            app_name=agent.APP_NAME,
             user_id=str(current_user.id),
             session_id=session_id
         )
         
-        messages = []
-        for e in session.events:
-            # Extract content text properly
-            content_text = None
-            if hasattr(e, 'content') and e.content:
-                if hasattr(e.content, 'parts') and e.content.parts:
-                    content_text = e.content.parts[0].text if e.content.parts[0] else None
-                elif isinstance(e.content, str):
-                    content_text = e.content
-            
-            # Clean user messages from pet context information
-            author = getattr(e, 'author', None)
-            if content_text and author == 'user':
-                # Remove the pet summary prefix that was added for AI context
-                # Pattern to match "User's pets:\n- ... \n\n" at the beginning
-                # Updated to handle weight and improved formatting
-                pet_pattern = r"^User's pets:\n.*?\n\n"
-                content_text = re.sub(pet_pattern, '', content_text, flags=re.DOTALL)
-                
-                # Also handle case where user has no pets
-                no_pets_pattern = r"^User has no pets registered\.\n\n"
-                content_text = re.sub(no_pets_pattern, '', content_text)
-            
-            # Convert timestamp to string properly
-            timestamp_str = None
-            if hasattr(e, 'timestamp') and e.timestamp:
-                if isinstance(e.timestamp, (int, float)):
-                    from datetime import datetime
-                    timestamp_str = datetime.fromtimestamp(e.timestamp).isoformat()
-                else:
-                    timestamp_str = str(e.timestamp)
-            
-            messages.append(EventResponse(
+        messages = [
+            EventResponse(
                 id=str(e.id),
-                author=author,
-                content=content_text,
-                timestamp=timestamp_str
-            ))
+                author=getattr(e, 'author', None),
+                content=event_text(e),
+                timestamp=event_timestamp(e)
+            )
+            for e in session.events
+        ]
         
         return messages
     except Exception as e:
@@ -180,8 +148,9 @@ async def list_ai_session_messages(session_id: str, current_user: User = Depends
 @router.delete("/sessions/{session_id}")
 async def delete_ai_session(session_id: str, current_user: User = Depends(get_current_user)):
     try:
-        await session_service.delete_session(
-            app_name=APP_NAME,
+        agent = await load_agent()
+        await agent.session_service.delete_session(
+            app_name=agent.APP_NAME,
             user_id=str(current_user.id),
             session_id=session_id
         )
@@ -192,25 +161,18 @@ async def delete_ai_session(session_id: str, current_user: User = Depends(get_cu
 @router.delete("/sessions/{session_id}/messages")
 async def clear_ai_session_messages(session_id: str, current_user: User = Depends(get_current_user)):
     try:
-        # To clear messages, delete and recreate the session
-        session = await session_service.get_session(
-            app_name=APP_NAME,
+        agent = await load_agent()
+        # Старые события скрываются отметкой в состоянии сессии, физически удаляются фоном
+        cleared = await agent.session_service.clear_history(
+            app_name=agent.APP_NAME,
             user_id=str(current_user.id),
             session_id=session_id
         )
-        state = session.state
-        await session_service.delete_session(
-            app_name=APP_NAME,
-            user_id=str(current_user.id),
-            session_id=session_id
-        )
-        await session_service.create_session(
-            app_name=APP_NAME,
-            user_id=str(current_user.id),
-            session_id=session_id,
-            state=state
-        )
+        if not cleared:
+            raise HTTPException(status_code=404, detail="Session not found")
         return {"message": "Session messages cleared successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing session messages: {str(e)}")
 
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from app.auth.deps import get_db, get_current_user
@@ -6,7 +8,7 @@ from app.auth.jwt import create_access_token, create_refresh_token, hash_refresh
 from app.auth.firebase import (
     verify_firebase_token, get_firebase_user_by_uid, create_firebase_user, 
     send_email_verification_with_token, send_email_verification, check_email_verification, register_user_and_send_verification,
-    change_password_with_token, delete_firebase_user_by_email
+    change_password_with_token, delete_firebase_user_by_email, get_firebase_auth
 )
 from app.models.user import User
 from app.models.refresh_token import RefreshToken
@@ -17,14 +19,18 @@ from app.schemas.user import (
     AuthResponse, RefreshTokenRequest, RefreshTokenResponse
 )
 from app.services.user_service import UserService
-from app.services.refresh_token_service import validate_refresh_token
-from app.services.pet_service import PetService
-from app.services.activity_record_service import ActivityRecordService
+from app.services.refresh_token_service import get_user_active_tokens_count, validate_refresh_token
+from app.services.idempotency_service import IDEMPOTENCY_HEADER, IdempotencyService, registration_scope
+from app.services.account_deletion_service import (
+    AccountDeletionService, AccountDeletionJob, BACKGROUND_THRESHOLD_ROWS
+)
 from datetime import timedelta
-from typing import Optional
+from typing import Callable, Optional
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+logger = logging.getLogger(__name__)
+
 @router.get("/firebase/status")
 def firebase_status():
     """Проверка статуса Firebase инициализации"""
@@ -34,9 +40,9 @@ def firebase_status():
         api_key = os.getenv("FIREBASE_API_KEY")
         api_key_status = "configured" if api_key else "missing"
         
-        # Пытаемся получить информацию о Firebase проекте
+        # Пытаемся получить информацию о Firebase проекте (SDK инициализируется при первом обращении)
+        auth = get_firebase_auth()
         import firebase_admin
-        from firebase_admin import auth
         
         # Проверяем, что Firebase инициализирован
         if not firebase_admin._apps:
@@ -109,13 +115,56 @@ def check_email_verification_status(email: str, db: Session = Depends(get_db)):
         )
 
 @router.post("/register", response_model=AuthResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+def register(
+    user: UserCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255, description="Ключ повтора: повторный запрос с тем же ключом вернёт исходный ответ"),
+    db: Session = Depends(get_db)
+):
     """Регистрация пользователя с созданием в Firebase и отправкой email верификации"""
-    print(f"🔄 Registration attempt for email: {user.email}, username: {user.username}")
+    with IdempotencyService.claim(db, idempotency_key, registration_scope(user.email), "auth.register", user) as claim:
+        if claim.replayed:
+            return replay_registration(db, claim.stored_json(), user.password)
+        # Под ключом хранится только пользователь (в той же транзакции, что и INSERT):
+        # токены в открытом виде в БД не пишем, повтор получает новые
+        return register_user(user, db, before_commit=claim.save_as(UserSchema))
+
+def replay_registration(db: Session, stored_user: dict, password: str) -> AuthResponse:
+    """Повтор уже выполненной регистрации: без Firebase, только новые токены для созданного пользователя.
+    Повтор выдаёт токены, только пока учётные данные те же, что при регистрации: пароль подходит
+    и пользователь не отозвал все refresh-токены (выход со всех устройств, смена пароля)"""
+    db_user = UserService.get_user_by_id(db, stored_user["id"])
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    # Аккаунт удалён или деактивирован после регистрации: повтор не должен выдавать ему токены
+    if not db_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
+    if (not UserService.verify_password(password, db_user.hashed_password)
+            or get_user_active_tokens_count(db, db_user.id) == 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credentials changed since registration, please log in",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(data={"sub": db_user.username})
+    refresh_token_record = UserService.create_refresh_token(db, db_user)
+    return AuthResponse(
+        access_token=access_token,
+        refresh_token=refresh_token_record.token,
+        user=UserSchema.from_orm(db_user)
+    )
+
+def register_user(user: UserCreate, db: Session, before_commit: Optional[Callable[[User], None]] = None) -> AuthResponse:
+    logger.info("Registration attempt", extra={"email": user.email, "username": user.username})
     
     # Проверяем, существует ли пользователь с таким email
     if UserService.get_user_by_email(db, user.email):
-        print(f"❌ Email already registered: {user.email}")
+        logger.info("Registration rejected: email already registered", extra={"email": user.email})
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -123,28 +172,24 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     
     # Проверяем, существует ли пользователь с таким username
     if UserService.get_user_by_username(db, user.username):
-        print(f"❌ Username already taken: {user.username}")
+        logger.info("Registration rejected: username already taken", extra={"username": user.username})
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
     try:
-        print(f"🔥 Creating Firebase user for: {user.email}")
         # 1. Создаем пользователя в Firebase и отправляем верификационное письмо
         firebase_user = register_user_and_send_verification(user.email, user.password, user.username)
-        print(f"✅ Firebase user created with UID: {firebase_user['uid']}")
+        logger.debug("Firebase user created", extra={"email": user.email, "firebase_uid": firebase_user["uid"]})
         
-        print(f"💾 Creating user in local DB for: {user.email}")
         # 2. Создаем пользователя в вашей БД с Firebase UID
-        db_user = UserService.create_user_with_firebase(db, user, firebase_user["uid"])
-        print(f"✅ User created in DB with ID: {db_user.id}")
+        db_user = UserService.create_user_with_firebase(db, user, firebase_user["uid"], before_commit=before_commit)
         
-        print(f"🔑 Creating tokens for user: {db_user.id}")
         # 3. Создаем токены
         access_token = create_access_token(data={"sub": db_user.username})
         refresh_token_record = UserService.create_refresh_token(db, db_user)
-        print(f"✅ Registration completed successfully for: {user.email}")
+        logger.info("Registration completed", extra={"email": user.email, "user_id": db_user.id})
         
         return AuthResponse(
             access_token=access_token,
@@ -154,12 +199,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         
     except HTTPException:
         # Если Firebase создание не удалось, не создаем пользователя в БД
-        print(f"❌ Firebase creation failed for: {user.email}")
+        logger.warning("Registration failed: Firebase user was not created", extra={"email": user.email})
         raise
     except Exception as e:
-        print(f"❌ Registration failed for {user.email}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Registration failed", extra={"email": user.email})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -306,8 +349,7 @@ def resend_verification_email(current_user: User = Depends(get_current_user), db
         # Отправляем email верификации
         try:
             # Для повторной отправки используем Firebase Admin SDK
-            import firebase_admin
-            from firebase_admin import auth
+            auth = get_firebase_auth()
             
             # Получаем пользователя из Firebase по email
             firebase_user = auth.get_user_by_email(current_user.email)
@@ -418,11 +460,10 @@ def resend_verification_email_with_email(email: str, db: Session = Depends(get_d
         
         # Отправляем email верификации
         try:
-            print(f"Attempting to send verification email to: {email}")
             send_email_verification(email)
-            print(f"Verification email sent successfully to: {email}")
+            logger.info("Verification email sent", extra={"email": email})
         except Exception as e:
-            print(f"Error sending verification email to {email}: {str(e)}")
+            logger.exception("Failed to send verification email", extra={"email": email})
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to send verification email: {str(e)}"
@@ -492,6 +533,7 @@ def change_password(
 @router.delete("/delete-account")
 def delete_account(
     request: DeleteAccountRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -511,32 +553,54 @@ def delete_account(
                 detail="Incorrect password"
             )
         
+        user_id = current_user.id
+        email = current_user.email
+        firebase_uid = current_user.firebase_uid
+
         # Начинаем транзакцию для каскадного удаления
         try:
-            # 1. Удаляем все записи активности пользователя
-            ActivityRecordService.delete_all_user_activities(db, current_user.id)
-            
-            # 2. Удаляем всех питомцев пользователя
-            PetService.delete_all_user_pets(db, current_user.id)
-            
-            # 3. Удаляем все refresh токены пользователя
-            UserService.delete_all_refresh_tokens(db, current_user.id)
-            
-            # 4. Если у пользователя есть Firebase UID, удаляем из Firebase
-            if current_user.firebase_uid:
-                try:
-                    delete_firebase_user_by_email(current_user.email)
-                except Exception as e:
-                    # Логируем ошибку, но продолжаем удаление из локальной БД
-                    print(f"Warning: Failed to delete Firebase user: {e}")
-            
-            # 5. Удаляем пользователя из локальной БД
-            UserService.delete_user(db, current_user.id)
-            
+            def delete_from_firebase():
+                # Если у пользователя есть Firebase UID, удаляем из Firebase
+                if firebase_uid:
+                    try:
+                        delete_firebase_user_by_email(email)
+                    except Exception as e:
+                        # Логируем ошибку, но продолжаем удаление из локальной БД
+                        logger.warning("Failed to delete Firebase user: %s", e, extra={"user_id": user_id})
+
+            # 1. Большие аккаунты удаляем в фоне: сразу блокируем вход и отзываем токены
+            total_estimate = AccountDeletionService.estimate_rows(db, user_id)
+            if total_estimate > BACKGROUND_THRESHOLD_ROWS:
+                UserService.delete_all_refresh_tokens(db, user_id)
+                current_user.is_active = False
+                # Задача сохраняется в той же транзакции: если воркер упадёт, её подберёт AccountDeletionResumer
+                job, status_token = AccountDeletionService.start_background_deletion(db, user_id, total_estimate)
+                db.commit()
+                delete_from_firebase()
+                background_tasks.add_task(AccountDeletionService.run_background_deletion, job.job_id)
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={
+                        "message": "Account deletion started",
+                        "user_id": user_id,
+                        "email": email,
+                        "job_id": job.job_id,
+                        "status_url": f"/auth/delete-account/status/{job.job_id}",
+                        # Передаётся в заголовке X-Deletion-Token; показывается один раз
+                        "status_token": status_token
+                    }
+                )
+
+            # 2. Питомцы, записи, токены, AI-сессии и пользователь - одной транзакцией
+            AccountDeletionService.delete_account(db, user_id)
+
+            # 3. Удаляем из Firebase после успешного удаления из локальной БД
+            delete_from_firebase()
+
             return {
                 "message": "Account and all associated data deleted successfully",
-                "user_id": current_user.id,
-                "email": current_user.email
+                "user_id": user_id,
+                "email": email
             }
             
         except Exception as e:
@@ -553,4 +617,19 @@ def delete_account(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete account: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.get("/delete-account/status/{job_id}", response_model=AccountDeletionJob)
+def delete_account_status(
+    job_id: str,
+    status_token: str = Header(..., alias="X-Deletion-Token", description="status_token из ответа DELETE /auth/delete-account"),
+    db: Session = Depends(get_db)
+):
+    """Прогресс фонового удаления аккаунта: аккаунт уже заблокирован, доступ - по токену задачи"""
+    job = AccountDeletionService.get_job(db, job_id, status_token)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    return job
\ No newline at end of file
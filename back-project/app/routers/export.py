@@ -0,0 +1,43 @@
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.ai import load_agent
+from app.auth.deps import get_current_user
+from app.models.user import User
+from app.services.export_service import MEDIA_TYPES, ExportDataset, ExportFormat, ExportService
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+logger = logging.getLogger(__name__)
+
+@router.get("")
+async def export_user_data(
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="ndjson - все наборы в одном потоке, csv - один набор"),
+    dataset: ExportDataset = Query(ExportDataset.RECORDS, description="Набор данных для csv: pets, records или ai_messages"),
+    include_ai: bool = Query(False, description="Добавить в ndjson переписку с AI-ассистентом"),
+    current_user: User = Depends(get_current_user)
+):
+    """Выгрузка питомцев, записей и (по желанию) переписки с AI потоком, без загрузки всего в память"""
+    if format == ExportFormat.NDJSON:
+        datasets = [ExportDataset.PETS, ExportDataset.RECORDS] + ([ExportDataset.AI_MESSAGES] if include_ai else [])
+    else:
+        datasets = [dataset]
+
+    agent = None
+    if ExportDataset.AI_MESSAGES in datasets:
+        # Ошибку загрузки агента нужно вернуть до начала потока, пока можно отдать статус
+        try:
+            agent = await load_agent()
+        except Exception:
+            logger.exception("AI agent unavailable for export", extra={"user_id": current_user.id})
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="AI transcripts are unavailable")
+
+    name = "-".join(item.value for item in datasets) if format == ExportFormat.CSV else "petcare"
+    filename = f"{name}-export-{datetime.utcnow():%Y%m%d}.{format.value}"
+    logger.info("Export started", extra={"user_id": current_user.id, "format": format.value, "datasets": [d.value for d in datasets]})
+    return StreamingResponse(
+        ExportService.stream(current_user.id, format, datasets, agent=agent),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
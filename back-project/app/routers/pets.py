@@ -1,20 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.auth.deps import get_db, get_current_user
 from app.models.user import User
-from app.schemas.pet import PetCreate, PetRead, PetUpdate
+from app.schemas.pet import PetCreate, PetRead, PetStats, PetUpdate, StatsBucket
+from app.services.idempotency_service import IDEMPOTENCY_HEADER, IdempotencyService
 from app.services.pet_service import PetService
+from app.services.pet_stats_service import PetStatsService
+from app.utils.serialization import FAST_JSON_RESPONSES, list_response
 
 router = APIRouter(prefix="/pets", tags=["pets"])
 
 @router.get("/", response_model=List[PetRead])
 def list_pets(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return PetService.get_pets_for_user(db, current_user.id)
+    pets = PetService.get_pets_for_user(db, current_user.id, as_rows=FAST_JSON_RESPONSES)
+    return list_response(pets)
 
 @router.post("/", response_model=PetRead)
-def add_pet(pet_in: PetCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return PetService.create_pet(db, pet_in, current_user.id)
+def add_pet(
+    pet_in: PetCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255, description="Ключ повтора: повторный запрос с тем же ключом вернёт исходный ответ"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    with IdempotencyService.claim(db, idempotency_key, f"user:{current_user.id}", "pets.create", pet_in) as claim:
+        if claim.replayed:
+            return claim.replay()
+        PetService.create_pet(db, pet_in, current_user.id, before_commit=claim.save_as(PetRead))
+        return claim.response
+
+@router.get("/{pet_id}/stats", response_model=PetStats)
+def get_pet_stats(
+    pet_id: int,
+    bucket: StatsBucket = Query(StatsBucket.MONTH, description="Период группировки: day, week или month"),
+    start_date: Optional[date] = Query(None, description="Начальная дата YYYY-MM-DD (по умолчанию - вся история)"),
+    end_date: Optional[date] = Query(None, description="Конечная дата YYYY-MM-DD (по умолчанию сегодня, UTC)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Счётчики записей по периодам и категориям, серии дней подряд и соблюдение расписания"""
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Start date must be before or equal to end date")
+    stats = PetStatsService.get_stats(db, pet_id, current_user.id, bucket, start_date, end_date)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Pet not found")
+    return stats
 
 @router.put("/{pet_id}", response_model=PetRead)
 def update_pet(pet_id: int, pet_in: PetUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
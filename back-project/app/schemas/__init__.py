@@ -1,3 +1,3 @@
 from .user import UserCreate, User, UserLogin
 from .pet import PetCreate, PetRead, PetUpdate
-from .activity_record import ActivityRecordCreate, ActivityRecordRead, ActivityRecordUpdate, ActivityCategory 
\ No newline at end of file
+from .activity_record import ActivityRecordCreate, ActivityRecordRead, ActivityRecordUpdate, ActivityRecordCalendarRead, ActivityCategory, RecordFields, CalendarDaySummary, CalendarMonthSummary 
\ No newline at end of file
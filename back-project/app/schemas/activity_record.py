@@ -1,8 +1,13 @@
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Union
+from datetime import date as date_type, datetime
+import enum
 from app.models.activity_record import ActivityCategory, RepeatType
 
+class RecordFields(str, enum.Enum):
+    FULL = "full"
+    CALENDAR = "calendar"
+
 class ActivityRecordBase(BaseModel):
     category: ActivityCategory
     title: str
@@ -40,6 +45,65 @@ class ActivityRecordUpdate(BaseModel):
 class ActivityRecordRead(ActivityRecordBase):
     id: int
     pet_id: int
+    # Нормализованные quantity и duration (только чтение)
+    quantity_value: Optional[float] = None
+    quantity_unit: Optional[str] = None
+    duration_minutes: Optional[float] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class ActivityRecordCalendarRead(BaseModel):
+    """Облегчённая проекция для календаря (без notes и полей категорий)"""
+    id: int
+    pet_id: int
+    category: ActivityCategory
+    title: str
+    date: datetime
+    time: datetime
+    notify: bool
+    repeat_type: RepeatType
+    repeat_interval: int
+    repeat_end_date: Optional[datetime] = None
+    repeat_count: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# Элемент списка записей: полная запись или проекция fields=calendar
+ActivityRecordListItem = Union[ActivityRecordRead, ActivityRecordCalendarRead]
+
+
+class CalendarDaySummary(BaseModel):
+    """Количество активностей за день (с учётом повторов) по категориям и питомцам"""
+    date: date_type
+    total: int
+    by_category: Dict[ActivityCategory, int]
+    by_pet: Dict[int, int]
+
+class CalendarMonthSummary(BaseModel):
+    month: str  # YYYY-MM
+    days: List[CalendarDaySummary]
+
+class AgendaItemRead(ActivityRecordRead):
+    """Вхождение записи в повестку: повторы уже развёрнуты, starts_at - дата и время вхождения"""
+    occurrence_index: int
+    starts_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ImportRowError(BaseModel):
+    row: int  # NDJSON - номер строки файла, CSV - номер записи после заголовка (с 1)
+    errors: List[str]
+
+class ImportReport(BaseModel):
+    """Итог импорта: дубликаты (по pet_id, category, date, time, title) пропускаются, ошибочные строки не загружаются"""
+    total_rows: int
+    imported: int
+    duplicates: int
+    failed: int
+    duplicate_rows: List[int]
+    errors: List[ImportRowError]
+    # Отчёт ограничен IMPORT_MAX_REPORTED_ROWS строками каждого вида
+    truncated: bool = False
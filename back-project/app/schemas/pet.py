@@ -1,6 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
+import enum
+from app.models.activity_record import ActivityCategory
 from app.models.pet import PetGender
 
 class PetBase(BaseModel):
@@ -24,4 +26,49 @@ class PetRead(PetBase):
     user_id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class StatsBucket(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class StatsBucketCount(BaseModel):
+    """Количество записей категории за период (начало периода - как date_trunc)"""
+    bucket: date
+    category: ActivityCategory
+    count: int
+    # Суммы нормализованных quantity/duration (None, если разобранных значений нет)
+    quantity_g: Optional[float] = None
+    quantity_ml: Optional[float] = None
+    duration_minutes: Optional[float] = None
+
+class CategoryTotals(BaseModel):
+    category: ActivityCategory
+    total: int
+    per_day: float
+
+class CategoryStreak(BaseModel):
+    """Серии подряд идущих дней хотя бы с одной записью категории"""
+    category: ActivityCategory
+    current_days: int
+    longest_days: int
+    last_day: date
+
+class CategoryAdherence(BaseModel):
+    """Запланировано повторяющимися сериями против отмечено разовыми записями, по дням"""
+    category: ActivityCategory
+    scheduled_days: int
+    logged_days: int
+    rate: float
+
+class PetStats(BaseModel):
+    pet_id: int
+    bucket: StatsBucket
+    start_date: Optional[date] = None
+    end_date: date
+    buckets: List[StatsBucketCount]
+    totals: List[CategoryTotals]
+    streaks: List[CategoryStreak]
+    adherence: List[CategoryAdherence]
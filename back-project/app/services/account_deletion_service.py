@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from sqlalchemy import delete, func, inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+from app.db.session import SessionLocal
+from app.models.account_deletion_job import AccountDeletionJobRecord
+from app.models.activity_record import ActivityRecord
+from app.models.idempotency_key import IdempotencyKey
+from app.models.pet import Pet
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.services.idempotency_service import registration_scope
+
+logger = logging.getLogger(__name__)
+
+# Аккаунты с большим числом строк удаляются в фоне, чтобы запрос не упирался в таймаут
+BACKGROUND_THRESHOLD_ROWS = int(os.getenv("ACCOUNT_DELETION_BACKGROUND_THRESHOLD", 50000))
+BATCH_SIZE = int(os.getenv("ACCOUNT_DELETION_BATCH_SIZE", 5000))
+# Задача в статусе running без отметки прогресса дольше этого срока считается брошенной (процесс упал)
+STALE_JOB_SECONDS = int(os.getenv("ACCOUNT_DELETION_STALE_SECONDS", 300))
+# Сколько раз повторять задачу, завершившуюся ошибкой, и как часто искать такие задачи
+MAX_ATTEMPTS = int(os.getenv("ACCOUNT_DELETION_MAX_ATTEMPTS", 3))
+RESUME_INTERVAL_SECONDS = float(os.getenv("ACCOUNT_DELETION_RESUME_INTERVAL_SECONDS", 60))
+
+# Таблицы google-adk DatabaseSessionService (та же БД, user_id хранится строкой)
+ADK_EVENTS_TABLE = "events"
+ADK_SESSIONS_TABLE = "sessions"
+ADK_USER_STATES_TABLE = "user_states"
+
+
+class AccountDeletionJob(BaseModel):
+    job_id: str
+    user_id: int
+    status: str = "pending"  # pending | running | completed | failed
+    deleted: Dict[str, int] = {}
+    total_estimate: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Таблицы ADK создаются при старте AI-модуля, поэтому запоминаем только найденные
+_known_tables = set()
+
+
+def runnable_jobs(now: datetime):
+    """Условие задач, которые можно забрать: новые, брошенные упавшим процессом, упавшие с ошибкой"""
+    return or_(
+        AccountDeletionJobRecord.status == "pending",
+        (AccountDeletionJobRecord.status == "running")
+        & (AccountDeletionJobRecord.heartbeat_at < now - timedelta(seconds=STALE_JOB_SECONDS)),
+        (AccountDeletionJobRecord.status == "failed") & (AccountDeletionJobRecord.attempts < MAX_ATTEMPTS),
+    )
+
+
+class AccountDeletionService:
+    @staticmethod
+    def estimate_rows(db: Session, user_id: int) -> int:
+        """Грубая оценка объёма удаления: записи активности + события AI-сессий"""
+        records = db.scalar(
+            select(func.count(ActivityRecord.id)).where(
+                ActivityRecord.pet_id.in_(select(Pet.id).where(Pet.user_id == user_id))
+            )
+        ) or 0
+        events = 0
+        if AccountDeletionService._has_table(db, ADK_EVENTS_TABLE):
+            events = db.scalar(
+                text(f"SELECT count(*) FROM {ADK_EVENTS_TABLE} WHERE user_id = :user_id"),
+                {"user_id": str(user_id)}
+            ) or 0
+        return records + events
+
+    @staticmethod
+    def delete_account(
+        db: Session,
+        user_id: int,
+        progress: Optional[Callable[[str, int], None]] = None,
+        commit_batches: bool = False
+    ) -> Dict[str, int]:
+        """Удалить пользователя и все его данные в порядке FK-каскадов. По умолчанию - одной транзакцией;
+        commit_batches=True (фоновая задача) коммитит каждую пачку, чтобы не держать блокировки строк
+        всё удаление: после сбоя повторный вызов продолжит с оставшихся строк"""
+        deleted: Dict[str, int] = {}
+
+        def report(table: str, count: int):
+            if commit_batches:
+                db.commit()
+            deleted[table] = deleted.get(table, 0) + count
+            if progress:
+                progress(table, deleted[table])
+
+        try:
+            # AI-сессии: события пачками, затем сессии и состояние пользователя
+            if AccountDeletionService._has_table(db, ADK_EVENTS_TABLE):
+                while True:
+                    count = db.execute(
+                        AccountDeletionService._adk_events_batch(db),
+                        {"user_id": str(user_id), "batch": BATCH_SIZE}
+                    ).rowcount
+                    report(ADK_EVENTS_TABLE, count)
+                    if count < BATCH_SIZE:
+                        break
+            for table in (ADK_SESSIONS_TABLE, ADK_USER_STATES_TABLE):
+                if AccountDeletionService._has_table(db, table):
+                    report(table, db.execute(
+                        text(f"DELETE FROM {table} WHERE user_id = :user_id"),
+                        {"user_id": str(user_id)}
+                    ).rowcount)
+
+            # Записи активности пачками, затем питомцы, токены и сам пользователь
+            email = db.scalar(select(User.email).where(User.id == user_id))
+            idempotency_scopes = [f"user:{user_id}"] + ([registration_scope(email)] if email else [])
+            pet_ids = select(Pet.id).where(Pet.user_id == user_id)
+            while True:
+                batch = select(ActivityRecord.id).where(ActivityRecord.pet_id.in_(pet_ids)).limit(BATCH_SIZE)
+                count = db.execute(
+                    delete(ActivityRecord).where(ActivityRecord.id.in_(batch)),
+                    execution_options={"synchronize_session": False}
+                ).rowcount
+                report(ActivityRecord.__tablename__, count)
+                if count < BATCH_SIZE:
+                    break
+
+            for model, condition in (
+                (Pet, Pet.user_id == user_id),
+                (RefreshToken, RefreshToken.user_id == user_id),
+                # Сохранённые ответы POST-запросов и регистрации (без FK на users)
+                (IdempotencyKey, IdempotencyKey.scope.in_(idempotency_scopes)),
+                (User, User.id == user_id),
+            ):
+                report(model.__tablename__, db.execute(
+                    delete(model).where(condition),
+                    execution_options={"synchronize_session": False}
+                ).rowcount)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return deleted
+
+    @staticmethod
+    def start_background_deletion(db: Session, user_id: int, total_estimate: int) -> Tuple[AccountDeletionJob, str]:
+        """Поставить задачу в текущей транзакции (без commit): вместе с блокировкой аккаунта
+        она либо сохранится, либо нет - заблокированный аккаунт без задачи не останется.
+        Возвращает задачу и токен статуса: войти в заблокированный аккаунт уже нельзя,
+        поэтому прогресс доступен только по этому токену (в БД хранится его хэш)."""
+        status_token = secrets.token_urlsafe(32)
+        record = AccountDeletionJobRecord(
+            job_id=uuid.uuid4().hex,
+            user_id=user_id,
+            status_token_hash=hashlib.sha256(status_token.encode("utf-8")).hexdigest(),
+            status="pending",
+            deleted={},
+            total_estimate=total_estimate,
+            attempts=0,
+            created_at=datetime.utcnow()
+        )
+        db.add(record)
+        db.flush()
+        return AccountDeletionJob.model_validate(record), status_token
+
+    @staticmethod
+    def claim_job(db: Session, job_id: Optional[str] = None, exclude: Optional[List[str]] = None,
+                  now: Optional[datetime] = None) -> Optional[str]:
+        """Забрать задачу (конкретную или самую старую из доступных) и перевести в running.
+        SKIP LOCKED и условный UPDATE не дают двум воркерам выполнять одну задачу."""
+        now = now or datetime.utcnow()
+        query = select(AccountDeletionJobRecord.job_id).where(runnable_jobs(now))
+        if job_id:
+            query = query.where(AccountDeletionJobRecord.job_id == job_id)
+        if exclude:
+            query = query.where(AccountDeletionJobRecord.job_id.notin_(exclude))
+        candidate = db.scalar(
+            query.order_by(AccountDeletionJobRecord.created_at).limit(1).with_for_update(skip_locked=True)
+        )
+        if candidate is None:
+            db.rollback()
+            return None
+        claimed = db.execute(
+            update(AccountDeletionJobRecord)
+            .where(AccountDeletionJobRecord.job_id == candidate, runnable_jobs(now))
+            .values(status="running", attempts=AccountDeletionJobRecord.attempts + 1, heartbeat_at=now, error=None)
+        ).rowcount
+        db.commit()
+        return candidate if claimed else None
+
+    @staticmethod
+    def run_background_deletion(job_id: Optional[str] = None, session_factory=SessionLocal,
+                                exclude: Optional[List[str]] = None) -> Optional[str]:
+        """Выполнить задачу с собственными сессиями БД (BackgroundTasks или AccountDeletionResumer).
+        Каждая пачка коммитится отдельно: если процесс упадёт, удалённое останется удалённым,
+        а повтор задачи продолжит с оставшихся строк (аккаунт уже заблокирован, токены отозваны)."""
+        jobs_db = session_factory()
+        db = session_factory()
+        try:
+            job_id = AccountDeletionService.claim_job(jobs_db, job_id, exclude)
+            if job_id is None:
+                return None
+            user_id, previous = jobs_db.execute(
+                select(AccountDeletionJobRecord.user_id, AccountDeletionJobRecord.deleted)
+                .where(AccountDeletionJobRecord.job_id == job_id)
+            ).one()
+            # Счётчики прошлых попыток: их пачки уже закоммичены
+            previous = dict(previous or {})
+            deleted: Dict[str, int] = dict(previous)
+
+            def record(**values):
+                jobs_db.execute(
+                    update(AccountDeletionJobRecord).where(AccountDeletionJobRecord.job_id == job_id).values(**values)
+                )
+                jobs_db.commit()
+
+            def progress(table: str, count: int):
+                deleted[table] = previous.get(table, 0) + count
+                record(deleted=dict(deleted), heartbeat_at=datetime.utcnow())
+
+            try:
+                AccountDeletionService.delete_account(db, user_id, progress=progress, commit_batches=True)
+                record(status="completed", deleted=dict(deleted), finished_at=datetime.utcnow())
+            except Exception as e:
+                record(status="failed", deleted=dict(deleted), error=str(e), finished_at=datetime.utcnow())
+                logger.exception("Background account deletion failed", extra={"user_id": user_id, "job_id": job_id})
+            return job_id
+        finally:
+            db.close()
+            jobs_db.close()
+
+    @staticmethod
+    def resume_jobs(session_factory=SessionLocal) -> int:
+        """Выполнить все доступные задачи; каждая - не больше одного раза за проход"""
+        processed: List[str] = []
+        while True:
+            job_id = AccountDeletionService.run_background_deletion(session_factory=session_factory, exclude=processed)
+            if job_id is None:
+                return len(processed)
+            processed.append(job_id)
+
+    @staticmethod
+    def get_job(db: Session, job_id: str, status_token: str) -> Optional[AccountDeletionJob]:
+        """Задача по job_id и токену статуса; None и для неизвестной задачи, и для неверного токена"""
+        record = db.get(AccountDeletionJobRecord, job_id)
+        token_hash = hashlib.sha256(status_token.encode("utf-8")).hexdigest()
+        if record is None or not hmac.compare_digest(record.status_token_hash, token_hash):
+            return None
+        return AccountDeletionJob.model_validate(record)
+
+    @staticmethod
+    def _adk_events_batch(db: Session):
+        """DELETE одной пачки событий AI-сессий пользователя (:user_id, :batch).
+        Первичный ключ events в ADK составной, поэтому в Postgres строки пачки выбираются по ctid
+        (физический адрес строки); в остальных СУБД - по id события внутри того же user_id"""
+        if db.get_bind().dialect.name == "postgresql":
+            return text(
+                f"DELETE FROM {ADK_EVENTS_TABLE} WHERE ctid IN ("
+                f"SELECT ctid FROM {ADK_EVENTS_TABLE} WHERE user_id = :user_id LIMIT :batch)"
+            )
+        return text(
+            f"DELETE FROM {ADK_EVENTS_TABLE} WHERE user_id = :user_id AND id IN ("
+            f"SELECT id FROM {ADK_EVENTS_TABLE} WHERE user_id = :user_id LIMIT :batch)"
+        )
+
+    @staticmethod
+    def _has_table(db: Session, table: str) -> bool:
+        if table not in _known_tables and inspect(db.get_bind()).has_table(table):
+            _known_tables.add(table)
+        return table in _known_tables
+
+
+class AccountDeletionResumer:
+    """Фоновый поток: подбирает задачи, брошенные упавшим воркером или завершившиеся ошибкой"""
+
+    def __init__(self, session_factory=SessionLocal, interval_seconds: float = RESUME_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="account-deletion-resumer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                resumed = AccountDeletionService.resume_jobs(self.session_factory)
+                if resumed:
+                    logger.info("Account deletion jobs resumed", extra={"jobs": resumed})
+            except Exception:
+                logger.exception("Account deletion resumer error")
+            self._stop.wait(self.interval_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фоновое удаление аккаунтов")
+    parser.add_argument("--resume", action="store_true", help="выполнить новые, брошенные и упавшие задачи")
+    args = parser.parse_args()
+
+    if args.resume:
+        print(f"Processed {AccountDeletionService.resume_jobs()} account deletion jobs")
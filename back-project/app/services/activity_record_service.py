@@ -1,38 +1,80 @@
+import logging
+from sqlalchemy import Date, func, insert, literal, or_, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, List, Optional
 from datetime import date, datetime
-from app.models.activity_record import ActivityRecord, ActivityCategory
+from app.models.activity_record import ActivityRecord, ActivityCategory, RepeatType
 from app.models.pet import Pet
 from app.models.user import User
-from app.schemas.activity_record import ActivityRecordCreate, ActivityRecordUpdate
+from app.services.agenda_service import AGENDA_FIELDS, AgendaService
+from app.services.pet_service import PetService
+from app.services.reminder_service import REMINDER_SCHEDULE_FIELDS, ReminderService
+from app.schemas.activity_record import (
+    ActivityRecordCreate, ActivityRecordUpdate, ActivityRecordCalendarRead, RecordFields,
+    CalendarDaySummary, CalendarMonthSummary
+)
+from app.utils.measurements import measurement_columns
+from app.utils.recurrence import add_months, iter_occurrences
+
+logger = logging.getLogger(__name__)
+
+# Колонки ActivityRecordRead для выборки Core-строк без гидрации ORM-объектов
+RECORD_READ_COLUMNS = tuple(getattr(ActivityRecord, column.key) for column in ActivityRecord.__table__.columns)
+# Проекция для календаря: только поля ActivityRecordCalendarRead
+RECORD_CALENDAR_COLUMNS = tuple(getattr(ActivityRecord, field) for field in ActivityRecordCalendarRead.model_fields)
 
 class ActivityRecordService:
     @staticmethod
-    def create_record(db: Session, record: ActivityRecordCreate, current_user: User) -> ActivityRecord:
-        # Проверяем, что питомец принадлежит текущему пользователю
-        pet = db.query(Pet).filter(Pet.id == record.pet_id, Pet.user_id == current_user.id).first()
-        if not pet:
-            raise ValueError("Pet not found or access denied")
-        
-        db_record = ActivityRecord(
-            pet_id=record.pet_id,
-            category=record.category,
-            title=record.title,
-            date=record.date,
-            time=record.time,
-            notify=record.notify if record.notify is not None else True,
-            notes=record.notes,
-            food_type=record.food_type,
-            quantity=record.quantity,
-            duration=record.duration,
-            repeat_type=record.repeat_type,
-            repeat_interval=record.repeat_interval,
-            repeat_end_date=record.repeat_end_date,
-            repeat_count=record.repeat_count,
-        )
-        db.add(db_record)
+    def _records_query(db: Session, as_rows: bool = False, fields: RecordFields = RecordFields.FULL):
+        """Запрос записей: ORM-сущности или Core-строки (as_rows=True / проекция) без identity map"""
+        if fields == RecordFields.CALENDAR:
+            return db.query(*RECORD_CALENDAR_COLUMNS)
+        if as_rows:
+            return db.query(*RECORD_READ_COLUMNS)
+        return db.query(ActivityRecord)
+
+    @staticmethod
+    def create_record(db: Session, record: ActivityRecordCreate, current_user: User,
+                      before_commit: Optional[Callable[[ActivityRecord], None]] = None) -> ActivityRecord:
+        # Проверка владельца выполняется в том же INSERT ... SELECT FROM pets
+        values = {
+            "pet_id": record.pet_id,
+            "category": record.category,
+            "title": record.title,
+            "date": record.date,
+            "time": record.time,
+            "notify": record.notify if record.notify is not None else True,
+            "notes": record.notes,
+            "food_type": record.food_type,
+            "quantity": record.quantity,
+            "duration": record.duration,
+            "repeat_type": record.repeat_type,
+            "repeat_interval": record.repeat_interval,
+            "repeat_end_date": record.repeat_end_date,
+            "repeat_count": record.repeat_count,
+            **measurement_columns(record.quantity, record.duration),
+        }
+        columns = ActivityRecord.__table__.c
+        owned_pet_row = select(
+            *[literal(value, type_=columns[name].type) for name, value in values.items()]
+        ).where(Pet.id == record.pet_id, Pet.user_id == current_user.id)
+
+        db_record = db.scalars(
+            insert(ActivityRecord).from_select(list(values), owned_pet_row).returning(ActivityRecord)
+        ).first()
+        if db_record is None:
+            db.rollback()
+            # Строка не вставлена: только на этом пути выясняем, нет питомца (404) или он чужой (403)
+            if db.scalar(select(Pet.id).where(Pet.id == record.pet_id)) is None:
+                raise LookupError("Pet not found")
+            raise PermissionError("Access denied to this pet")
+
+        ReminderService.sync_record(db, db_record, current_user.id, is_new=True)
+        AgendaService.sync_record(db, db_record, current_user.id, is_new=True)
+        PetService.bump_records_version(db, db_record.pet_id)
+        if before_commit:
+            before_commit(db_record)
         db.commit()
-        db.refresh(db_record)
         return db_record
 
     @staticmethod
@@ -42,14 +84,15 @@ class ActivityRecordService:
         current_user: User,
         category: Optional[ActivityCategory] = None,
         skip: int = 0, 
-        limit: int = 100
+        limit: int = 100,
+        as_rows: bool = False,
+        fields: RecordFields = RecordFields.FULL
     ) -> List[ActivityRecord]:
-        # Проверяем, что питомец принадлежит текущему пользователю
-        pet = db.query(Pet).filter(Pet.id == pet_id, Pet.user_id == current_user.id).first()
-        if not pet:
-            return []
-        
-        query = db.query(ActivityRecord).filter(ActivityRecord.pet_id == pet_id)
+        # Владелец проверяется в том же запросе, без отдельного SELECT питомца
+        query = ActivityRecordService._records_query(db, as_rows, fields).filter(
+            ActivityRecord.pet_id == pet_id,
+            ActivityRecord.pet_id.in_(PetService.owned_pet_ids_query(current_user.id))
+        )
         
         if category:
             query = query.filter(ActivityRecord.category == category)
@@ -62,11 +105,15 @@ class ActivityRecordService:
         current_user: User,
         category: Optional[ActivityCategory] = None,
         skip: int = 0,
-        limit: int = 1000
+        limit: int = 1000,
+        as_rows: bool = False,
+        fields: RecordFields = RecordFields.FULL
     ) -> List[ActivityRecord]:
         """Получить все записи активности для всех питомцев пользователя"""
-        # Получаем все записи через JOIN с таблицей pets для проверки владельца
-        query = db.query(ActivityRecord).join(Pet).filter(Pet.user_id == current_user.id)
+        # Фильтр pet_id IN (SELECT id FROM pets ...) вместо JOIN: владение проверяется в том же запросе
+        pet_ids = PetService.owned_pet_ids_query(current_user.id)
+
+        query = ActivityRecordService._records_query(db, as_rows, fields).filter(ActivityRecord.pet_id.in_(pet_ids))
         
         if category:
             query = query.filter(ActivityRecord.category == category)
@@ -81,16 +128,20 @@ class ActivityRecordService:
         db: Session,
         target_date: date,
         current_user: User,
-        category: Optional[ActivityCategory] = None
+        category: Optional[ActivityCategory] = None,
+        as_rows: bool = False,
+        fields: RecordFields = RecordFields.FULL
     ) -> List[ActivityRecord]:
         """Получить все записи активности на конкретную дату для всех питомцев пользователя"""
-        # Получаем записи через JOIN с таблицей pets для проверки владельца
+        # Фильтр pet_id IN (SELECT id FROM pets ...) вместо JOIN: владение проверяется в том же запросе
+        pet_ids = PetService.owned_pet_ids_query(current_user.id)
+
         # Create datetime range for the target date
         start_datetime = datetime.combine(target_date, datetime.min.time())
         end_datetime = datetime.combine(target_date, datetime.max.time())
         
-        query = db.query(ActivityRecord).join(Pet).filter(
-            Pet.user_id == current_user.id,
+        query = ActivityRecordService._records_query(db, as_rows, fields).filter(
+            ActivityRecord.pet_id.in_(pet_ids),
             ActivityRecord.date >= start_datetime,
             ActivityRecord.date <= end_datetime
         )
@@ -111,16 +162,20 @@ class ActivityRecordService:
         current_user: User,
         category: Optional[ActivityCategory] = None,
         skip: int = 0,
-        limit: int = 1000
+        limit: int = 1000,
+        as_rows: bool = False,
+        fields: RecordFields = RecordFields.FULL
     ) -> List[ActivityRecord]:
         """Получить записи активности в диапазоне дат для всех питомцев пользователя"""
-        # Получаем записи через JOIN с таблицей pets для проверки владельца
+        # Фильтр pet_id IN (SELECT id FROM pets ...) вместо JOIN: владение проверяется в том же запросе
+        pet_ids = PetService.owned_pet_ids_query(current_user.id)
+
         # Create datetime range for the date range
         start_datetime = datetime.combine(start_date, datetime.min.time())
         end_datetime = datetime.combine(end_date, datetime.max.time())
         
-        query = db.query(ActivityRecord).join(Pet).filter(
-            Pet.user_id == current_user.id,
+        query = ActivityRecordService._records_query(db, as_rows, fields).filter(
+            ActivityRecord.pet_id.in_(pet_ids),
             ActivityRecord.date >= start_datetime,
             ActivityRecord.date <= end_datetime
         )
@@ -133,14 +188,69 @@ class ActivityRecordService:
         
         return query.offset(skip).limit(limit).all()
 
+    @staticmethod
+    def get_calendar_summary(db: Session, year: int, month: int, current_user: User) -> CalendarMonthSummary:
+        """Сводка по дням месяца: одиночные записи через GROUP BY, повторы разворачиваются по месяцу"""
+        month_start = datetime(year, month, 1)
+        month_end = add_months(month_start, 1)
+        days = {}
+        pet_ids = PetService.owned_pet_ids_query(current_user.id)
+
+        def bump(day: date, pet_id: int, category: ActivityCategory, count: int):
+            summary = days.setdefault(day, {"total": 0, "by_category": {}, "by_pet": {}})
+            summary["total"] += count
+            summary["by_category"][category] = summary["by_category"].get(category, 0) + count
+            summary["by_pet"][pet_id] = summary["by_pet"].get(pet_id, 0) + count
+
+        # Одиночные записи считаются в БД
+        day_column = func.date(ActivityRecord.date, type_=Date).label("day")
+        grouped = db.query(
+            day_column, ActivityRecord.pet_id, ActivityRecord.category, func.count(ActivityRecord.id)
+        ).filter(
+            ActivityRecord.pet_id.in_(pet_ids),
+            ActivityRecord.repeat_type == RepeatType.NONE,
+            ActivityRecord.date >= month_start,
+            ActivityRecord.date < month_end
+        ).group_by(day_column, ActivityRecord.pet_id, ActivityRecord.category).all()
+
+        for day, pet_id, category, count in grouped:
+            bump(day, pet_id, category, count)
+
+        # Повторяющиеся серии, пересекающие месяц, разворачиваются только в его пределах
+        series = db.query(
+            ActivityRecord.pet_id,
+            ActivityRecord.category,
+            ActivityRecord.date,
+            ActivityRecord.repeat_type,
+            ActivityRecord.repeat_interval,
+            ActivityRecord.repeat_end_date,
+            ActivityRecord.repeat_count
+        ).filter(
+            ActivityRecord.pet_id.in_(pet_ids),
+            ActivityRecord.repeat_type != RepeatType.NONE,
+            ActivityRecord.date < month_end,
+            or_(ActivityRecord.repeat_end_date.is_(None), ActivityRecord.repeat_end_date >= month_start)
+        ).all()
+
+        for pet_id, category, start, repeat_type, repeat_interval, repeat_end_date, repeat_count in series:
+            for occurrence in iter_occurrences(
+                start, repeat_type, repeat_interval, repeat_end_date, repeat_count,
+                window_start=month_start, window_end=month_end
+            ):
+                bump(occurrence.date(), pet_id, category, 1)
+
+        return CalendarMonthSummary(
+            month=f"{year:04d}-{month:02d}",
+            days=[CalendarDaySummary(date=day, **summary) for day, summary in sorted(days.items())]
+        )
+
     @staticmethod
     def get_record_by_id(db: Session, record_id: int, current_user: User) -> Optional[ActivityRecord]:
-        # Получаем запись с проверкой владельца
-        record = db.query(ActivityRecord).join(Pet).filter(
+        # Запись по первичному ключу; владелец проверяется подзапросом в том же SELECT, как и в списках
+        return db.query(ActivityRecord).filter(
             ActivityRecord.id == record_id,
-            Pet.user_id == current_user.id
+            ActivityRecord.pet_id.in_(PetService.owned_pet_ids_query(current_user.id))
         ).first()
-        return record
 
     @staticmethod
     def update_record(
@@ -160,6 +270,17 @@ class ActivityRecordService:
         for field, value in update_data.items():
             if hasattr(db_record, field):
                 setattr(db_record, field, value)
+
+        if "quantity" in update_data or "duration" in update_data:
+            for field, value in measurement_columns(db_record.quantity, db_record.duration).items():
+                setattr(db_record, field, value)
+
+        # Очередь напоминаний пересчитываем только при изменении расписания
+        if REMINDER_SCHEDULE_FIELDS.intersection(update_data):
+            ReminderService.sync_record(db, db_record, current_user.id)
+        if AGENDA_FIELDS.intersection(update_data):
+            AgendaService.sync_record(db, db_record, current_user.id)
+        PetService.bump_records_version(db, db_record.pet_id)
         
         db.commit()
         db.refresh(db_record)
@@ -172,7 +293,9 @@ class ActivityRecordService:
         if not db_record:
             return False
         
+        # Вхождения в повестке и напоминание удаляются каскадом по внешнему ключу
         db.delete(db_record)
+        PetService.bump_records_version(db, db_record.pet_id)
         db.commit()
         return True
 
@@ -180,25 +303,18 @@ class ActivityRecordService:
     def disable_all_notifications(db: Session, current_user: User) -> bool:
         """Отключить уведомления для всех активностей пользователя"""
         try:
-            # Получаем все активности пользователя через его питомцев
-            user_pets = db.query(Pet).filter(Pet.user_id == current_user.id).all()
-            pet_ids = [pet.id for pet in user_pets]
-            
-            if not pet_ids:
-                # У пользователя нет питомцев, считаем операцию успешной
-                return True
-            
-            # Обновляем все активности пользователя
+            # Обновляем все активности пользователя (питомцы - подзапросом в том же UPDATE)
             updated_count = db.query(ActivityRecord).filter(
-                ActivityRecord.pet_id.in_(pet_ids)
-            ).update({"notify": False})
+                ActivityRecord.pet_id.in_(PetService.owned_pet_ids_query(current_user.id))
+            ).update({"notify": False}, synchronize_session=False)
+            ReminderService.remove_for_user(db, current_user.id)
             
             db.commit()
-            print(f"Disabled notifications for {updated_count} activities for user {current_user.id}")
+            logger.info("Disabled notifications", extra={"user_id": current_user.id, "records": updated_count})
             return True
-        except Exception as e:
+        except Exception:
             db.rollback()
-            print(f"Error disabling notifications for user {current_user.id}: {e}")
+            logger.exception("Error disabling notifications", extra={"user_id": current_user.id})
             return False
 
     @staticmethod
@@ -206,8 +322,7 @@ class ActivityRecordService:
         """Удаление всех записей активности пользователя"""
         try:
             # Получаем все питомцы пользователя
-            user_pets = db.query(Pet).filter(Pet.user_id == user_id).all()
-            pet_ids = [pet.id for pet in user_pets]
+            pet_ids = PetService.get_owned_pet_ids(db, user_id)
             
             if not pet_ids:
                 # У пользователя нет питомцев, считаем операцию успешной
@@ -217,11 +332,12 @@ class ActivityRecordService:
             deleted_count = db.query(ActivityRecord).filter(
                 ActivityRecord.pet_id.in_(pet_ids)
             ).delete()
+            PetService.bump_records_version(db, *pet_ids)
             
             db.commit()
-            print(f"Deleted {deleted_count} activities for user {user_id}")
+            logger.info("Deleted user activities", extra={"user_id": user_id, "records": deleted_count})
             return True
-        except Exception as e:
+        except Exception:
             db.rollback()
-            print(f"Error deleting user activities: {e}")
+            logger.exception("Error deleting user activities", extra={"user_id": user_id})
             return False 
\ No newline at end of file
@@ -0,0 +1,212 @@
+import argparse
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.activity_record import ActivityRecord, ActivityCategory, RepeatType
+from app.models.agenda_occurrence import AgendaOccurrence, AgendaWindow
+from app.models.pet import Pet
+from app.utils.recurrence import first_index_from, iter_occurrences
+
+logger = logging.getLogger(__name__)
+
+# Окно повестки: столько дней назад и вперёд от текущего дня вхождения лежат в agenda_occurrences
+AGENDA_HISTORY_DAYS = int(os.getenv("AGENDA_HISTORY_DAYS", 31))
+AGENDA_HORIZON_DAYS = int(os.getenv("AGENDA_HORIZON_DAYS", 62))
+# Окно сдвигается, когда до его края остаётся меньше этого запаса, а не каждый день
+AGENDA_ROLL_DAYS = int(os.getenv("AGENDA_ROLL_DAYS", 7))
+
+# Поля записи, от которых зависят её вхождения в повестке (остальные поля читаются JOIN-ом)
+AGENDA_FIELDS = frozenset({
+    "pet_id", "category", "date", "time", "repeat_type", "repeat_interval", "repeat_end_date", "repeat_count"
+})
+
+RECORD_READ_COLUMNS = tuple(getattr(ActivityRecord, column.key) for column in ActivityRecord.__table__.columns)
+# Колонки, нужные для разворачивания серии
+SERIES_COLUMNS = (
+    ActivityRecord.id, ActivityRecord.pet_id, ActivityRecord.category, ActivityRecord.date, ActivityRecord.time,
+    ActivityRecord.repeat_type, ActivityRecord.repeat_interval, ActivityRecord.repeat_end_date, ActivityRecord.repeat_count
+)
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def target_window(today: date):
+    return day_start(today - timedelta(days=AGENDA_HISTORY_DAYS)), day_start(today + timedelta(days=AGENDA_HORIZON_DAYS))
+
+
+def expand_record(record, window_start: datetime, window_end: datetime) -> Iterator[tuple]:
+    """(occurrence_index, starts_at) вхождений записи внутри [window_start, window_end)"""
+    start = datetime.combine(record.date.date(), record.time.time())
+    first_index = first_index_from(start, record.repeat_type, record.repeat_interval, window_start)
+    occurrences = iter_occurrences(
+        start, record.repeat_type, record.repeat_interval, record.repeat_end_date, record.repeat_count,
+        window_start=window_start, window_end=window_end
+    )
+    for offset, starts_at in enumerate(occurrences):
+        yield first_index + offset, starts_at
+
+
+def series_filter(window_start: datetime, window_end: datetime):
+    """Записи, у которых могут быть вхождения в окне (точная проверка - в expand_record)"""
+    return (
+        ActivityRecord.date < window_end,
+        or_(
+            ActivityRecord.date >= window_start,
+            (ActivityRecord.repeat_type != RepeatType.NONE)
+            & or_(ActivityRecord.repeat_end_date.is_(None), ActivityRecord.repeat_end_date >= window_start)
+        )
+    )
+
+
+class AgendaService:
+    @staticmethod
+    def _materialize(db: Session, user_id: int, records, window_start: datetime, window_end: datetime) -> int:
+        entries = [
+            {
+                "user_id": user_id,
+                "record_id": record.id,
+                "pet_id": record.pet_id,
+                "category": record.category,
+                "occurrence_index": index,
+                "starts_at": starts_at,
+            }
+            for record in records
+            for index, starts_at in expand_record(record, window_start, window_end)
+        ]
+        if entries:
+            db.execute(AgendaOccurrence.__table__.insert(), entries)
+        return len(entries)
+
+    @staticmethod
+    def _user_series(db: Session, user_id: int, window_start: datetime, window_end: datetime):
+        return db.execute(
+            select(*SERIES_COLUMNS).join(Pet).where(Pet.user_id == user_id, *series_filter(window_start, window_end))
+        ).all()
+
+    @staticmethod
+    def sync_record(db: Session, record: ActivityRecord, user_id: int, is_new: bool = False):
+        """Пересчитать вхождения записи в окне пользователя (в текущей транзакции, без commit).
+        Пока окна нет, делать нечего: оно построится целиком при первом чтении."""
+        window = db.get(AgendaWindow, user_id)
+        if window is None:
+            return
+        if not is_new:
+            db.execute(delete(AgendaOccurrence).where(AgendaOccurrence.record_id == record.id))
+        AgendaService._materialize(db, user_id, [record], window.window_start, window.window_end)
+
+    @staticmethod
+    def add_records(db: Session, records, user_id: int) -> int:
+        """Вхождения пачки новых записей (импорт): окно читается один раз, вставка одним INSERT"""
+        window = db.get(AgendaWindow, user_id)
+        if window is None:
+            return 0
+        return AgendaService._materialize(db, user_id, records, window.window_start, window.window_end)
+
+    @staticmethod
+    def ensure_window(db: Session, user_id: int, today: Optional[date] = None) -> AgendaWindow:
+        """Построить окно пользователя или сдвинуть его вперёд: достраивается только новый хвост,
+        вхождения, выпавшие из истории, удаляются. Строка окна блокируется на время сдвига."""
+        window_start, window_end = target_window(today or datetime.utcnow().date())
+        roll_before = window_end - timedelta(days=AGENDA_ROLL_DAYS)
+        window = db.get(AgendaWindow, user_id)
+        if window is not None and window.window_end >= roll_before:
+            return window
+        if window is not None:
+            window = db.get(AgendaWindow, user_id, with_for_update=True, populate_existing=True)
+            # Пока ждали блокировку, окно мог сдвинуть другой запрос
+            if window.window_end >= roll_before:
+                return window
+
+        if window is None:
+            materialize_from = window_start
+            window = AgendaWindow(user_id=user_id, window_start=window_start, window_end=window_end)
+            db.add(window)
+        else:
+            materialize_from = max(window.window_end, window_start)
+            db.execute(delete(AgendaOccurrence).where(
+                AgendaOccurrence.user_id == user_id,
+                or_(AgendaOccurrence.starts_at < window_start, AgendaOccurrence.starts_at >= materialize_from)
+            ))
+            window.window_start = window_start
+            window.window_end = window_end
+
+        records = AgendaService._user_series(db, user_id, materialize_from, window_end)
+        added = AgendaService._materialize(db, user_id, records, materialize_from, window_end)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Окно параллельно построил другой запрос
+            db.rollback()
+            return db.get(AgendaWindow, user_id)
+        logger.info("Agenda window materialized", extra={"user_id": user_id, "occurrences": added})
+        return window
+
+    @staticmethod
+    def get_agenda(
+        db: Session,
+        user_id: int,
+        start_date: date,
+        days: int = 1,
+        category: Optional[ActivityCategory] = None
+    ) -> List[dict]:
+        """Вхождения записей пользователя за [start_date, start_date + days), по времени.
+        Внутри окна - range scan по (user_id, starts_at); вне его серии разворачиваются на лету."""
+        range_start = day_start(start_date)
+        range_end = day_start(start_date + timedelta(days=days))
+        window = AgendaService.ensure_window(db, user_id)
+
+        if window.window_start <= range_start and range_end <= window.window_end:
+            query = select(AgendaOccurrence.occurrence_index, AgendaOccurrence.starts_at, *RECORD_READ_COLUMNS).join(
+                ActivityRecord, ActivityRecord.id == AgendaOccurrence.record_id
+            ).where(
+                AgendaOccurrence.user_id == user_id,
+                AgendaOccurrence.starts_at >= range_start,
+                AgendaOccurrence.starts_at < range_end
+            )
+            if category:
+                query = query.where(AgendaOccurrence.category == category)
+            rows = db.execute(query.order_by(AgendaOccurrence.starts_at, AgendaOccurrence.record_id)).all()
+            return [dict(row._mapping) for row in rows]
+
+        query = select(*RECORD_READ_COLUMNS).join(Pet).where(
+            Pet.user_id == user_id, *series_filter(range_start, range_end)
+        )
+        if category:
+            query = query.where(ActivityRecord.category == category)
+        items = [
+            {"occurrence_index": index, "starts_at": starts_at, **row._mapping}
+            for row in db.execute(query).all()
+            for index, starts_at in expand_record(row, range_start, range_end)
+        ]
+        items.sort(key=lambda item: (item["starts_at"], item["id"]))
+        return items
+
+    @staticmethod
+    def reset(db: Session) -> int:
+        """Сбросить все окна (после массовых изменений в обход сервиса): повестки построятся заново при чтении"""
+        db.execute(delete(AgendaOccurrence))
+        dropped = db.execute(delete(AgendaWindow)).rowcount
+        db.commit()
+        return dropped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Материализованная повестка пользователей")
+    parser.add_argument("--reset", action="store_true", help="сбросить окна, повестки построятся заново при чтении")
+    args = parser.parse_args()
+
+    if args.reset:
+        session = SessionLocal()
+        try:
+            print(f"Dropped {AgendaService.reset(session)} agenda windows")
+        finally:
+            session.close()
@@ -0,0 +1,164 @@
+import csv
+import enum
+import io
+import logging
+import os
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, Iterator, Optional, Sequence
+
+import anyio
+from sqlalchemy import select
+from starlette.concurrency import iterate_in_threadpool
+
+from app.ai.transcript import event_text, event_timestamp
+from app.db.session import SessionLocal
+from app.models.activity_record import ActivityRecord
+from app.models.pet import Pet
+from app.services.pet_service import PET_READ_COLUMNS
+from app.utils.serialization import json_bytes
+
+logger = logging.getLogger(__name__)
+
+# Строк на один fetch серверного курсора и на один отправляемый кусок ответа
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+RECORD_EXPORT_COLUMNS = tuple(getattr(ActivityRecord, column.key) for column in ActivityRecord.__table__.columns)
+AI_MESSAGE_FIELDS = ("session_id", "id", "author", "content", "timestamp")
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ExportDataset(str, enum.Enum):
+    PETS = "pets"
+    RECORDS = "records"
+    AI_MESSAGES = "ai_messages"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+# Ячейка, начинающаяся с этих символов, в Excel/LibreOffice/Google Sheets исполняется как формула
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # Свободный текст пользователя (title, notes, переписка): апостроф делает ячейку текстом
+        return "'" + value
+    return value
+
+
+class ChunkEncoder:
+    """Кодирует пачку строк одного набора данных в один кусок ответа"""
+
+    def __init__(self, export_format: ExportFormat, dataset: ExportDataset, fields: Sequence[str]):
+        self.export_format = export_format
+        self.dataset = dataset
+        self.fields = fields
+        self._header_sent = False
+
+    def encode(self, items: Iterable[dict]) -> bytes:
+        if self.export_format == ExportFormat.NDJSON:
+            return b"".join(json_bytes({"type": self.dataset.value, **item}) + b"\n" for item in items)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(self.fields)
+            self._header_sent = True
+        writer.writerows([csv_value(item.get(field)) for field in self.fields] for item in items)
+        return buffer.getvalue().encode("utf-8")
+
+
+class ExportService:
+    @staticmethod
+    def table_chunks(
+        user_id: int,
+        dataset: ExportDataset,
+        export_format: ExportFormat,
+        session_factory=SessionLocal,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> Iterator[bytes]:
+        """Питомцы или записи пользователя кусками по batch_size строк.
+        yield_per включает серверный курсор (stream_results): в памяти только текущая пачка."""
+        if dataset == ExportDataset.PETS:
+            columns = PET_READ_COLUMNS
+            query = select(*columns).where(Pet.user_id == user_id).order_by(Pet.id)
+        else:
+            columns = RECORD_EXPORT_COLUMNS
+            query = select(*columns).join(Pet).where(Pet.user_id == user_id).order_by(ActivityRecord.id)
+        encoder = ChunkEncoder(export_format, dataset, [column.key for column in columns])
+
+        db = session_factory()
+        try:
+            result = db.execute(query.execution_options(yield_per=batch_size))
+            sent = False
+            for partition in result.partitions():
+                sent = True
+                yield encoder.encode(row._asdict() for row in partition)
+            if not sent and export_format == ExportFormat.CSV:
+                yield encoder.encode([])
+        finally:
+            db.close()
+
+    @staticmethod
+    async def ai_message_chunks(user_id: int, agent, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        """Переписка с AI по одной сессии за кусок: в памяти не больше одной сессии"""
+        encoder = ChunkEncoder(export_format, ExportDataset.AI_MESSAGES, AI_MESSAGE_FIELDS)
+        response = await agent.session_service.list_sessions(app_name=agent.APP_NAME, user_id=str(user_id))
+        sent = False
+        for listed in response.sessions:
+            session = await agent.session_service.get_session(
+                app_name=agent.APP_NAME, user_id=str(user_id), session_id=listed.id
+            )
+            if session is None:
+                continue
+            sent = True
+            yield encoder.encode(
+                {
+                    "session_id": session.id,
+                    "id": str(event.id),
+                    "author": getattr(event, "author", None),
+                    "content": event_text(event),
+                    "timestamp": event_timestamp(event),
+                }
+                for event in session.events
+            )
+        if not sent and export_format == ExportFormat.CSV:
+            yield encoder.encode([])
+
+    @staticmethod
+    async def stream(
+        user_id: int,
+        export_format: ExportFormat,
+        datasets: Sequence[ExportDataset],
+        agent=None,
+        session_factory=SessionLocal
+    ) -> AsyncIterator[bytes]:
+        """Тело ответа /export: наборы данных по очереди; SQL-часть выполняется в threadpool"""
+        for dataset in datasets:
+            if dataset == ExportDataset.AI_MESSAGES:
+                async for chunk in ExportService.ai_message_chunks(user_id, agent, export_format):
+                    yield chunk
+                continue
+
+            chunks = ExportService.table_chunks(user_id, dataset, export_format, session_factory)
+            try:
+                async for chunk in iterate_in_threadpool(chunks):
+                    yield chunk
+            finally:
+                # Клиент мог оборвать загрузку: закрыть курсор и вернуть соединение в пул сразу
+                with anyio.CancelScope(shield=True):
+                    await anyio.to_thread.run_sync(chunks.close)
@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, NamedTuple, Optional, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.auth.jwt import SECRET_KEY
+from app.db.session import SessionLocal
+from app.models.idempotency_key import IdempotencyKey
+from app.utils.cache import TTLCache
+from app.utils.serialization import json_bytes
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранится ответ по ключу и через сколько незавершённый запрос (упавший воркер) можно выполнить заново
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+# LRU перед таблицей: повтор, попавший в тот же процесс, не ходит в БД
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", 10000))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+idempotency_cache = TTLCache(ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_entries=IDEMPOTENCY_CACHE_MAX_ENTRIES)
+
+
+class StoredResponse(NamedTuple):
+    endpoint: str
+    request_hash: str
+    status_code: int
+    body: str
+    expires_at: datetime
+
+
+def request_hash(endpoint: str, payload: BaseModel) -> str:
+    """HMAC тела запроса: в таблице не должно быть ничего, по чему можно подобрать пароль из /auth/register"""
+    message = endpoint.encode("utf-8") + b"\n" + json_bytes(payload.model_dump(mode="json"))
+    return hmac.new(SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def registration_scope(email: str) -> str:
+    """Область ключей /auth/register: свой для каждого email (HMAC, чтобы в таблице не было адресов).
+    Общая область для всех анонимных запросов давала 422 чужим клиентам с совпавшим ключом"""
+    normalized = email.strip().lower().encode("utf-8")
+    return "register:" + hmac.new(SECRET_KEY.encode("utf-8"), normalized, hashlib.sha256).hexdigest()[:48]
+
+
+class IdempotencyClaim:
+    """Результат захвата ключа: либо сохранённый ответ (replayed), либо право выполнить обработчик.
+    Без заголовка ключ None и claim ничего не делает."""
+
+    def __init__(self, db: Session, scope: str, key: Optional[str], endpoint: str, digest: Optional[str],
+                 created_at: Optional[datetime] = None, stored: Optional[StoredResponse] = None):
+        self.db = db
+        self.scope = scope
+        self.key = key
+        self.endpoint = endpoint
+        self.digest = digest
+        self.created_at = created_at
+        self.stored = stored
+        self.response: Optional[BaseModel] = None
+        self._staged: Optional[StoredResponse] = None
+
+    @property
+    def replayed(self) -> bool:
+        return self.stored is not None
+
+    @property
+    def pending(self) -> bool:
+        return self.key is not None and self.stored is None and self.created_at is not None
+
+    def stored_json(self) -> dict:
+        return json.loads(self.stored.body)
+
+    def replay(self) -> Response:
+        return Response(
+            content=self.stored.body,
+            status_code=self.stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"}
+        )
+
+    def save(self, payload: BaseModel, status_code: int = status.HTTP_200_OK) -> BaseModel:
+        """Записать ответ обработчика в строку ключа, не фиксируя транзакцию: ответ коммитится
+        тем же commit, что и данные, поэтому после падения не бывает ни данных без ответа, ни ответа без данных.
+        Возвращает payload без изменений"""
+        self.response = payload
+        if not self.pending:
+            return payload
+        body = json_bytes(payload.model_dump(mode="json")).decode("utf-8")
+        expires_at = self.created_at + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+        saved = self.db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == self.scope, IdempotencyKey.key == self.key, IdempotencyKey.created_at == self.created_at)
+            .values(status_code=status_code, response_body=body)
+        ).rowcount
+        if not saved:
+            # Захват перехватили (обработчик шёл дольше IDEMPOTENCY_LOCK_SECONDS): не коммитим данные второй раз
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        self._staged = StoredResponse(self.endpoint, self.digest, status_code, body, expires_at)
+        return payload
+
+    def save_as(self, schema: Type[BaseModel], status_code: int = status.HTTP_200_OK) -> Callable[[Any], None]:
+        """Колбэк before_commit для сервисов: сериализует созданный объект и сохраняет ответ до commit"""
+        return lambda obj: self.save(schema.model_validate(obj), status_code)
+
+    def finish(self):
+        """Блок завершился успешно: зафиксировать ответ, если обработчик не сделал commit после save"""
+        if self._staged is None:
+            return
+        self.db.commit()
+        self.stored, self._staged = self._staged, None
+        idempotency_cache.set((self.scope, self.key), self.stored)
+
+    def release(self):
+        """Обработчик упал: снять захват, чтобы повтор выполнился заново.
+        Уже закоммиченный ответ не трогаем - данные созданы, повтор должен его получить"""
+        self._staged = None
+        if not self.pending:
+            return
+        self.db.rollback()
+        self.db.execute(
+            delete(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == self.scope, IdempotencyKey.key == self.key,
+                IdempotencyKey.created_at == self.created_at, IdempotencyKey.status_code.is_(None)
+            )
+        )
+        self.db.commit()
+        self.created_at = None
+
+
+class IdempotencyService:
+    @staticmethod
+    @contextmanager
+    def claim(db: Session, key: Optional[str], scope: str, endpoint: str, payload: BaseModel) -> Iterator[IdempotencyClaim]:
+        """Выполнить обработчик не больше одного раза на ключ:
+
+            with IdempotencyService.claim(db, key, f"user:{user.id}", "pets.create", pet_in) as claim:
+                if claim.replayed:
+                    return claim.replay()
+                PetService.create_pet(db, pet_in, user.id, before_commit=claim.save_as(PetRead))
+                return claim.response
+
+        Ответ пишется в строку ключа в той же транзакции, что и созданные данные.
+        Сохраняются только успешные ответы; исключение внутри блока освобождает ключ."""
+        claim = IdempotencyService._acquire(db, key, scope, endpoint, payload)
+        try:
+            yield claim
+            claim.finish()
+        finally:
+            claim.release()
+
+    @staticmethod
+    def _acquire(db: Session, key: Optional[str], scope: str, endpoint: str, payload: BaseModel) -> IdempotencyClaim:
+        if key is None:
+            return IdempotencyClaim(db, scope, None, endpoint, None)
+
+        digest = request_hash(endpoint, payload)
+        stored = idempotency_cache.get((scope, key))
+        if stored is not None and stored.expires_at > datetime.utcnow():
+            return IdempotencyService._replay(db, scope, key, endpoint, digest, stored)
+
+        for _ in range(3):
+            now = datetime.utcnow()
+            db.add(IdempotencyKey(
+                scope=scope, key=key, endpoint=endpoint, request_hash=digest,
+                created_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            ))
+            try:
+                db.commit()
+                return IdempotencyClaim(db, scope, key, endpoint, digest, created_at=now)
+            except IntegrityError:
+                db.rollback()
+
+            existing = db.execute(
+                select(
+                    IdempotencyKey.endpoint, IdempotencyKey.request_hash, IdempotencyKey.status_code,
+                    IdempotencyKey.response_body, IdempotencyKey.created_at, IdempotencyKey.expires_at
+                ).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            ).first()
+            if existing is None:
+                continue  # запись удалили между INSERT и SELECT
+
+            abandoned = existing.status_code is None and existing.created_at <= now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+            if existing.expires_at <= now or abandoned:
+                # Просроченный ключ или брошенный захват - перехватываем, если его не перехватил кто-то другой
+                taken = db.execute(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.created_at == existing.created_at)
+                    .values(
+                        endpoint=endpoint, request_hash=digest, status_code=None, response_body=None,
+                        created_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+                    )
+                ).rowcount
+                db.commit()
+                if taken:
+                    return IdempotencyClaim(db, scope, key, endpoint, digest, created_at=now)
+                continue
+
+            if existing.status_code is None:
+                IdempotencyService._check_request(existing.endpoint, existing.request_hash, endpoint, digest)
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            stored = StoredResponse(
+                existing.endpoint, existing.request_hash, existing.status_code, existing.response_body, existing.expires_at
+            )
+            idempotency_cache.set((scope, key), stored)
+            return IdempotencyService._replay(db, scope, key, endpoint, digest, stored)
+
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed"
+        )
+
+    @staticmethod
+    def _check_request(stored_endpoint: str, stored_hash: str, endpoint: str, digest: str):
+        if stored_endpoint != endpoint or not hmac.compare_digest(stored_hash, digest):
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key has already been used with a different request"
+            )
+
+    @staticmethod
+    def _replay(db: Session, scope: str, key: str, endpoint: str, digest: str, stored: StoredResponse) -> IdempotencyClaim:
+        IdempotencyService._check_request(stored.endpoint, stored.request_hash, endpoint, digest)
+        logger.info("Idempotent request replayed", extra={"scope": scope, "endpoint": endpoint})
+        return IdempotencyClaim(db, scope, key, endpoint, digest, stored=stored)
+
+    @staticmethod
+    def purge_expired(db: Session, now: Optional[datetime] = None) -> int:
+        """Удалить просроченные ключи (повторно использованный ключ перезаписывается и без этого)"""
+        deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))).rowcount
+        db.commit()
+        return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ключи идемпотентности POST-запросов")
+    parser.add_argument("--purge-expired", action="store_true", help="удалить просроченные ключи")
+    args = parser.parse_args()
+
+    if args.purge_expired:
+        session = SessionLocal()
+        try:
+            print(f"Deleted {IdempotencyService.purge_expired(session)} expired idempotency keys")
+        finally:
+            session.close()
@@ -0,0 +1,281 @@
+import csv
+import enum
+import io
+import json
+import logging
+import os
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table, cast, exists, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.activity_record import ActivityRecord
+from app.schemas.activity_record import ActivityRecordCreate, ImportReport, ImportRowError
+from app.services.agenda_service import AgendaService
+from app.services.pet_service import PetService
+from app.services.reminder_service import ReminderService
+from app.utils.measurements import measurement_columns
+
+logger = logging.getLogger(__name__)
+
+# Строк на одну проверку и один COPY в staging-таблицу
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+# Ограничения загрузки: размер тела и сколько строк каждого вида попадает в отчёт
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 50 * 1024 * 1024))
+IMPORT_MAX_REPORTED_ROWS = int(os.getenv("IMPORT_MAX_REPORTED_ROWS", 1000))
+
+# Колонки activity_records, которые заполняет импорт (включая нормализованные quantity/duration)
+IMPORT_COLUMNS = (
+    "pet_id", "category", "title", "date", "time", "notify", "notes", "food_type", "quantity", "duration",
+    "repeat_type", "repeat_interval", "repeat_end_date", "repeat_count",
+    "quantity_value", "quantity_unit", "duration_minutes",
+)
+# Ключ, по которому строка считается уже импортированной
+DEDUPE_KEY = ("pet_id", "category", "date", "time", "title")
+
+
+class ImportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def staging_table() -> Table:
+    """Временная таблица сессии: enum-колонки - текст, приводятся к типам activity_records при слиянии"""
+    columns = ActivityRecord.__table__.c
+    return Table(
+        "activity_records_import",
+        MetaData(),
+        Column("row_number", Integer, primary_key=True, autoincrement=False),
+        *(
+            Column(name, String if name in ("category", "repeat_type") else columns[name].type.__class__)
+            for name in IMPORT_COLUMNS
+        ),
+        Column("duplicate", Boolean, nullable=False, default=False),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+
+
+def parse_rows(text: io.TextIOBase, import_format: ImportFormat) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(номер строки, данные, ошибка разбора): для NDJSON номер строки файла, для CSV - записи после заголовка.
+    Файл, который нельзя разобрать целиком (не UTF-8, битый заголовок CSV), - ValueError"""
+    if import_format == ImportFormat.CSV:
+        reader = csv.DictReader(text)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            raise ValueError(f"Invalid CSV header: {e}") from e
+        row_number = 0
+        while True:
+            row_number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # Битая запись (NUL-байт, слишком длинное поле) - ошибка строки, разбор идёт дальше
+                yield row_number, None, f"Invalid CSV: {e}"
+                continue
+            yield checked_row(row_number, {key: value if value != "" else None for key, value in row.items() if key})
+
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(payload, dict):
+            yield row_number, None, "Expected a JSON object"
+        # Файл /export содержит и питомцев, и переписку с AI - импортируются только записи
+        elif payload.get("type", "records") == "records":
+            yield checked_row(row_number, payload)
+
+
+def checked_row(row_number: int, payload: dict) -> Tuple[int, Optional[dict], Optional[str]]:
+    # Postgres не хранит NUL в текстовых колонках: такая строка уронила бы весь импорт
+    if any(isinstance(value, str) and "\x00" in value for value in payload.values()):
+        return row_number, None, "NUL characters are not allowed"
+    return row_number, payload, None
+
+
+def validation_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors()]
+
+
+def staging_row(row_number: int, record: ActivityRecordCreate) -> dict:
+    return {
+        "row_number": row_number,
+        "pet_id": record.pet_id,
+        "category": record.category.name,
+        "title": record.title,
+        "date": record.date,
+        "time": record.time,
+        "notify": record.notify if record.notify is not None else True,
+        "notes": record.notes,
+        "food_type": record.food_type,
+        "quantity": record.quantity,
+        "duration": record.duration,
+        "repeat_type": record.repeat_type.name,
+        "repeat_interval": record.repeat_interval,
+        "repeat_end_date": record.repeat_end_date,
+        "repeat_count": record.repeat_count,
+        **measurement_columns(record.quantity, record.duration),
+        "duplicate": False,
+    }
+
+
+def copy_rows(db: Session, staging: Table, rows: List[dict]):
+    """Загрузка пачки в staging: COPY FROM STDIN в Postgres, executemany в остальных БД"""
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        connection.execute(staging.insert(), rows)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    names = [column.name for column in staging.columns]
+    for row in rows:
+        writer.writerow(["" if row[name] is None else row[name] for name in names])
+    buffer.seek(0)
+    statement = f"COPY {staging.name} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = connection.connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(statement, buffer)
+        else:  # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+class ImportService:
+    @staticmethod
+    def import_records(db: Session, upload: BinaryIO, import_format: ImportFormat, user_id: int) -> ImportReport:
+        """Проверка пачками по ActivityRecordCreate, COPY в staging-таблицу и одно слияние
+        с пропуском дубликатов. Весь импорт - одна транзакция.
+        ValueError - файл не разбирается целиком, ничего не импортировано"""
+        owned_pet_ids = PetService.get_owned_pet_ids(db, user_id)
+        staging = staging_table()
+        errors: List[ImportRowError] = []
+        failed = 0
+        total = 0
+
+        text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+        rows = parse_rows(text, import_format)
+        try:
+            staging.create(db.connection())
+            while True:
+                chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                total += len(chunk)
+                valid = []
+                for row_number, payload, parse_error in chunk:
+                    messages = [parse_error] if parse_error else []
+                    if payload is not None:
+                        try:
+                            record = ActivityRecordCreate.model_validate(payload)
+                        except ValidationError as e:
+                            messages = validation_messages(e)
+                        else:
+                            if record.pet_id not in owned_pet_ids:
+                                messages = ["pet_id: Pet not found or access denied"]
+                            else:
+                                valid.append(staging_row(row_number, record))
+                    if messages:
+                        failed += 1
+                        if len(errors) < IMPORT_MAX_REPORTED_ROWS:
+                            errors.append(ImportRowError(row=row_number, errors=messages))
+                if valid:
+                    copy_rows(db, staging, valid)
+
+            imported, duplicate_rows, duplicates = ImportService._merge(db, staging, user_id)
+            staging.drop(db.connection())
+            db.commit()
+        except UnicodeDecodeError as e:
+            ImportService._rollback(db, staging)
+            raise ValueError("Import file must be UTF-8 encoded") from e
+        except Exception:
+            ImportService._rollback(db, staging)
+            raise
+        finally:
+            text.detach()
+
+        logger.info("Records imported", extra={
+            "user_id": user_id, "rows": total, "imported": imported, "duplicates": duplicates, "failed": failed
+        })
+        return ImportReport(
+            total_rows=total,
+            imported=imported,
+            duplicates=duplicates,
+            failed=failed,
+            duplicate_rows=duplicate_rows,
+            errors=errors,
+            truncated=failed > len(errors) or duplicates > len(duplicate_rows)
+        )
+
+    @staticmethod
+    def _rollback(db: Session, staging: Table):
+        """В Postgres staging-таблица исчезает вместе с транзакцией, SQLite создаёт её вне транзакции"""
+        db.rollback()
+        if db.get_bind().dialect.name != "postgresql":
+            staging.drop(db.connection(), checkfirst=True)
+            db.commit()
+
+    @staticmethod
+    def _merge(db: Session, staging: Table, user_id: int) -> Tuple[int, List[int], int]:
+        """Отметить дубликаты (уже есть в activity_records или повторяются в файле) и вставить остальное"""
+        if db.get_bind().dialect.name == "postgresql":
+            # Параллельные импорты одного пользователя не должны пропустить дубликаты друг друга
+            db.execute(select(func.pg_advisory_xact_lock(user_id)))
+
+        record_types = {name: ActivityRecord.__table__.c[name].type for name in ("category", "repeat_type")}
+        staged = {
+            name: cast(staging.c[name], record_types[name]) if name in record_types else staging.c[name]
+            for name in IMPORT_COLUMNS
+        }
+        already_exists = exists().where(*(getattr(ActivityRecord, name) == staged[name] for name in DEDUPE_KEY))
+        ranked = select(
+            staging.c.row_number,
+            func.row_number().over(
+                partition_by=[staging.c[name] for name in DEDUPE_KEY], order_by=staging.c.row_number
+            ).label("rank")
+        ).subquery()
+        repeated_in_file = select(ranked.c.row_number).where(ranked.c.rank > 1)
+        db.execute(
+            update(staging)
+            .where(or_(staging.c.row_number.in_(repeated_in_file), already_exists))
+            .values(duplicate=True)
+        )
+
+        created = db.execute(
+            insert(ActivityRecord)
+            .from_select(
+                list(IMPORT_COLUMNS),
+                select(*staged.values()).where(staging.c.duplicate.is_(False)).order_by(staging.c.row_number)
+            )
+            .returning(
+                ActivityRecord.id, ActivityRecord.pet_id, ActivityRecord.category, ActivityRecord.notify,
+                ActivityRecord.date, ActivityRecord.time, ActivityRecord.repeat_type, ActivityRecord.repeat_interval,
+                ActivityRecord.repeat_end_date, ActivityRecord.repeat_count
+            )
+        ).all()
+
+        duplicates = db.scalar(select(func.count()).select_from(staging).where(staging.c.duplicate.is_(True)))
+        duplicate_rows = db.scalars(
+            select(staging.c.row_number).where(staging.c.duplicate.is_(True))
+            .order_by(staging.c.row_number).limit(IMPORT_MAX_REPORTED_ROWS)
+        ).all()
+
+        if created:
+            for start in range(0, len(created), IMPORT_CHUNK_SIZE):
+                batch = created[start:start + IMPORT_CHUNK_SIZE]
+                ReminderService.schedule_records(db, batch, user_id)
+                AgendaService.add_records(db, batch, user_id)
+            PetService.bump_records_version(db, *{record.pet_id for record in created})
+        return len(created), list(duplicate_rows), duplicates
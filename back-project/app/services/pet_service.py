@@ -1,17 +1,49 @@
+import logging
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from app.models.pet import Pet
-from app.schemas.pet import PetCreate, PetUpdate
-from typing import List
+from app.schemas.pet import PetCreate, PetRead, PetUpdate
+from typing import Callable, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Колонки PetRead для выборки Core-строк без гидрации ORM-объектов
+PET_READ_COLUMNS = tuple(getattr(Pet, field) for field in PetRead.model_fields)
 
 class PetService:
     @staticmethod
-    def get_pets_for_user(db: Session, user_id: int) -> List[Pet]:
-        return db.query(Pet).filter(Pet.user_id == user_id).all()
+    def get_pets_for_user(db: Session, user_id: int, as_rows: bool = False) -> List[Pet]:
+        query = db.query(*PET_READ_COLUMNS) if as_rows else db.query(Pet)
+        return query.filter(Pet.user_id == user_id).all()
+
+    @staticmethod
+    def get_owned_pet_ids(db: Session, user_id: int) -> FrozenSet[int]:
+        """ID питомцев пользователя из БД (для проверки целой пачки строк, например при импорте)"""
+        return frozenset(pet_id for (pet_id,) in db.query(Pet.id).filter(Pet.user_id == user_id))
+
+    @staticmethod
+    def owned_pet_ids_query(user_id: int):
+        """Подзапрос ID питомцев пользователя: владение проверяется в том же SQL-запросе"""
+        return select(Pet.id).where(Pet.user_id == user_id)
+
+    @staticmethod
+    def bump_records_version(db: Session, *pet_ids: int):
+        """Отметить изменение записей питомцев (в текущей транзакции, без commit)"""
+        if pet_ids:
+            db.execute(
+                update(Pet).where(Pet.id.in_(pet_ids)).values(records_version=Pet.records_version + 1),
+                execution_options={"synchronize_session": False}
+            )
 
     @staticmethod
-    def create_pet(db: Session, pet_in: PetCreate, user_id: int) -> Pet:
+    def create_pet(db: Session, pet_in: PetCreate, user_id: int,
+                   before_commit: Optional[Callable[[Pet], None]] = None) -> Pet:
         pet = Pet(**pet_in.dict(), user_id=user_id)
         db.add(pet)
+        if before_commit:
+            # Например, ответ для Idempotency-Key: коммитится вместе с питомцем
+            db.flush()
+            before_commit(pet)
         db.commit()
         db.refresh(pet)
         return pet
@@ -41,7 +73,7 @@ class PetService:
             db.query(Pet).filter(Pet.user_id == user_id).delete()
             db.commit()
             return True
-        except Exception as e:
+        except Exception:
             db.rollback()
-            print(f"Error deleting user pets: {e}")
+            logger.exception("Error deleting user pets", extra={"user_id": user_id})
             return False 
\ No newline at end of file
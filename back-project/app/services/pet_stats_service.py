@@ -0,0 +1,200 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, case, cast, func, literal, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.activity_record import ActivityRecord, RepeatType
+from app.models.pet import Pet
+from app.schemas.pet import (
+    CategoryAdherence, CategoryStreak, CategoryTotals, PetStats, StatsBucket, StatsBucketCount
+)
+from app.utils.cache import TTLCache
+from app.utils.measurements import GRAMS, MILLILITRES
+from app.utils.recurrence import iter_occurrences
+
+# Ключ включает records_version питомца, поэтому запись в любом процессе сразу делает
+# старые значения недостижимыми; TTL только ограничивает память
+PET_STATS_CACHE_TTL_SECONDS = int(os.getenv("PET_STATS_CACHE_TTL_SECONDS", 3600))
+pet_stats_cache = TTLCache(ttl_seconds=PET_STATS_CACHE_TTL_SECONDS, max_entries=2000)
+
+# Модификаторы SQLite date() - аналог date_trunc для локальной разработки
+SQLITE_TRUNC_MODIFIERS = {
+    StatsBucket.DAY: (),
+    StatsBucket.WEEK: ("weekday 0", "-6 days"),
+    StatsBucket.MONTH: ("start of month",),
+}
+
+
+def truncate(db: Session, column, bucket: StatsBucket):
+    """Начало периода как DATE: date_trunc в Postgres (неделя начинается с понедельника)"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Единица - литерал, а не параметр: иначе Postgres не сопоставит выражение в SELECT и GROUP BY
+        return cast(func.date_trunc(literal_column(f"'{bucket.value}'"), column), Date)
+    return func.date(column, *SQLITE_TRUNC_MODIFIERS[bucket], type_=Date)
+
+
+def day_number(db: Session, day):
+    """Номер дня, чтобы вычесть из него row_number (gaps and islands)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return day - literal(date(2000, 1, 1), Date)
+    return func.julianday(day)
+
+
+class PetStatsService:
+    @staticmethod
+    def get_stats(
+        db: Session,
+        pet_id: int,
+        user_id: int,
+        bucket: StatsBucket = StatsBucket.MONTH,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> Optional[PetStats]:
+        """Статистика питомца; None, если питомец не найден или чужой.
+        Одна выборка версии по первичному ключу, при попадании в кэш больше запросов нет."""
+        version = db.scalar(select(Pet.records_version).where(Pet.id == pet_id, Pet.user_id == user_id))
+        if version is None:
+            return None
+
+        end_date = end_date or datetime.utcnow().date()
+        key = (pet_id, version, bucket, start_date, end_date)
+        stats = pet_stats_cache.get(key)
+        if stats is None:
+            stats = PetStatsService._compute(db, pet_id, bucket, start_date, end_date)
+            pet_stats_cache.set(key, stats)
+        return stats
+
+    @staticmethod
+    def _compute(db: Session, pet_id: int, bucket: StatsBucket, start_date: Optional[date], end_date: date) -> PetStats:
+        range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        in_range = [ActivityRecord.pet_id == pet_id, ActivityRecord.date < range_end]
+        if start_date:
+            in_range.append(ActivityRecord.date >= datetime.combine(start_date, datetime.min.time()))
+
+        # Счётчики по периодам; итог по категории и первая запись - оконными функциями в том же запросе
+        period = truncate(db, ActivityRecord.date, bucket).label("bucket")
+        count = func.count(ActivityRecord.id)
+        rows = db.execute(
+            select(
+                period,
+                ActivityRecord.category,
+                count.label("count"),
+                func.sum(count).over(partition_by=ActivityRecord.category).label("category_total"),
+                func.min(func.min(ActivityRecord.date)).over().label("first_at"),
+                func.sum(case((ActivityRecord.quantity_unit == GRAMS, ActivityRecord.quantity_value))).label("quantity_g"),
+                func.sum(case((ActivityRecord.quantity_unit == MILLILITRES, ActivityRecord.quantity_value))).label("quantity_ml"),
+                func.sum(ActivityRecord.duration_minutes).label("duration_minutes")
+            ).where(*in_range).group_by(period, ActivityRecord.category).order_by(period, ActivityRecord.category)
+        ).all()
+
+        totals = {}
+        first_day = start_date
+        for row in rows:
+            totals[row.category] = int(row.category_total)
+            if first_day is None:
+                first_day = row.first_at.date()
+        days_in_range = (end_date - first_day).days + 1 if first_day else 0
+
+        return PetStats(
+            pet_id=pet_id,
+            bucket=bucket,
+            start_date=start_date,
+            end_date=end_date,
+            buckets=[
+                StatsBucketCount(
+                    bucket=row.bucket, category=row.category, count=row.count,
+                    quantity_g=row.quantity_g, quantity_ml=row.quantity_ml, duration_minutes=row.duration_minutes
+                )
+                for row in rows
+            ],
+            totals=[
+                CategoryTotals(category=category, total=total, per_day=round(total / days_in_range, 3) if days_in_range > 0 else 0.0)
+                for category, total in totals.items()
+            ],
+            streaks=PetStatsService._streaks(db, in_range, end_date),
+            adherence=PetStatsService._adherence(db, pet_id, in_range, start_date, end_date)
+        )
+
+    @staticmethod
+    def _streaks(db: Session, in_range, end_date: date):
+        """Gaps and islands: у подряд идущих дней (номер дня - row_number) одинаков"""
+        day = truncate(db, ActivityRecord.date, StatsBucket.DAY)
+        days = select(ActivityRecord.category, day.label("day")).where(*in_range).distinct().subquery()
+        numbered = select(
+            days.c.category,
+            days.c.day,
+            (day_number(db, days.c.day) - func.row_number().over(
+                partition_by=days.c.category, order_by=days.c.day
+            )).label("island")
+        ).subquery()
+        islands = select(
+            numbered.c.category,
+            func.count().label("length"),
+            func.max(numbered.c.day).label("last_day")
+        ).group_by(numbered.c.category, numbered.c.island).subquery()
+        # Текущая серия не прервана, если последний день - сегодня или вчера
+        alive = islands.c.last_day >= end_date - timedelta(days=1)
+        rows = db.execute(
+            select(
+                islands.c.category,
+                func.max(case((alive, islands.c.length), else_=0)).label("current_days"),
+                func.max(islands.c.length).label("longest_days"),
+                func.max(islands.c.last_day).label("last_day")
+            ).group_by(islands.c.category).order_by(islands.c.category)
+        ).all()
+        return [
+            CategoryStreak(category=row.category, current_days=row.current_days, longest_days=row.longest_days, last_day=row.last_day)
+            for row in rows
+        ]
+
+    @staticmethod
+    def _adherence(db: Session, pet_id: int, in_range, start_date: Optional[date], end_date: date):
+        """Дни вхождений повторяющихся серий (по сегодняшний день) против дней с разовыми записями той же категории"""
+        today = min(end_date, datetime.utcnow().date())
+        window_end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        window_start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+        overlaps = [
+            ActivityRecord.pet_id == pet_id,
+            ActivityRecord.repeat_type != RepeatType.NONE,
+            ActivityRecord.date < window_end
+        ]
+        if window_start:
+            overlaps.append(or_(ActivityRecord.repeat_end_date.is_(None), ActivityRecord.repeat_end_date >= window_start))
+        series = db.execute(
+            select(
+                ActivityRecord.category, ActivityRecord.date, ActivityRecord.time, ActivityRecord.repeat_type,
+                ActivityRecord.repeat_interval, ActivityRecord.repeat_end_date, ActivityRecord.repeat_count
+            ).where(*overlaps)
+        ).all()
+        if not series:
+            return []
+
+        scheduled = {}
+        for row in series:
+            start = datetime.combine(row.date.date(), row.time.time())
+            for occurrence in iter_occurrences(
+                start, row.repeat_type, row.repeat_interval, row.repeat_end_date, row.repeat_count,
+                window_start=window_start, window_end=window_end
+            ):
+                scheduled.setdefault(row.category, set()).add(occurrence.date())
+
+        day = truncate(db, ActivityRecord.date, StatsBucket.DAY)
+        logged = {}
+        for category, logged_day in db.execute(
+            select(ActivityRecord.category, day).where(
+                *in_range, ActivityRecord.repeat_type == RepeatType.NONE, ActivityRecord.date < window_end
+            ).distinct()
+        ):
+            logged.setdefault(category, set()).add(logged_day)
+
+        return [
+            CategoryAdherence(
+                category=category,
+                scheduled_days=len(days),
+                logged_days=len(days & logged.get(category, set())),
+                rate=round(len(days & logged.get(category, set())) / len(days), 3)
+            )
+            for category, days in sorted(scheduled.items())
+        ]
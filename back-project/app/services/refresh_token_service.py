@@ -1,9 +1,12 @@
+import logging
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.refresh_token import RefreshToken
 from app.auth.jwt import create_refresh_token, hash_refresh_token, get_refresh_token_expiry, verify_refresh_token_hash
 
+logger = logging.getLogger(__name__)
+
 def create_user_refresh_token(db: Session, user_id: int, device_id: Optional[str] = None) -> str:
     """Create a new refresh token for a user."""
     # Generate new refresh token
@@ -31,7 +34,7 @@ def create_user_refresh_token(db: Session, user_id: int, device_id: Optional[str
 def validate_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
     """Validate a refresh token and return the token record if valid."""
     token_hash = hash_refresh_token(token)
-    print(f"🔍 Looking for token hash: {token_hash[:10]}...")
+    logger.debug("Looking up refresh token", extra={"token_hash_prefix": token_hash[:10]})
     
     # Find the token in database
     db_token = db.query(RefreshToken).filter(
@@ -41,15 +44,15 @@ def validate_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
     ).first()
     
     if not db_token:
-        print(f"❌ Token not found in database or expired")
+        logger.info("Refresh token not found or expired")
         return None
     
     # Verify token hash (double-check)
     if not verify_refresh_token_hash(token, db_token.token_hash):
-        print(f"❌ Token hash verification failed")
+        logger.warning("Refresh token hash verification failed", extra={"user_id": db_token.user_id})
         return None
     
-    print(f"✅ Token validated successfully for user {db_token.user_id}")
+    logger.debug("Refresh token validated", extra={"user_id": db_token.user_id})
     return db_token
 
 def revoke_refresh_token(db: Session, token: str) -> bool:
@@ -0,0 +1,329 @@
+import abc
+import argparse
+import importlib
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.activity_record import ActivityRecord, ActivityCategory
+from app.models.pet import Pet
+from app.models.scheduled_reminder import ScheduledReminder
+from app.utils.recurrence import next_occurrence
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SCHEDULER_ENABLED = os.getenv("REMINDER_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 1000))
+REMINDER_MAX_SLEEP_SECONDS = float(os.getenv("REMINDER_MAX_SLEEP_SECONDS", 10))
+# Напоминания, опоздавшие сильнее (например, пока сервер был выключен), не отправляются - серия просто сдвигается
+REMINDER_MAX_LATENESS_SECONDS = int(os.getenv("REMINDER_MAX_LATENESS_SECONDS", 3600))
+REMINDER_SINK = os.getenv("REMINDER_SINK", "app.services.reminder_service:LogReminderSink")
+
+# Часовые пояса: date/time записей хранятся без пояса - это настенное время, которое прислал клиент
+# (мобильное приложение шлёт локальное время без смещения), а пояс пользователя сервер не хранит.
+# Очередь сравнивает их с datetime.utcnow(), то есть считает время записей UTC: у пользователя
+# в UTC+3 напоминание на 09:00 уйдёт в 12:00 по его часам. Точное время требует пояса в профиле
+# пользователя; до тех пор due_at в DueReminder - то же настенное время записи
+
+# Поля записи, от которых зависит расписание напоминаний
+REMINDER_SCHEDULE_FIELDS = frozenset({
+    "date", "time", "notify", "repeat_type", "repeat_interval", "repeat_end_date", "repeat_count"
+})
+
+
+class DueReminder(BaseModel):
+    record_id: int
+    user_id: int
+    pet_id: int
+    category: ActivityCategory
+    title: str
+    due_at: datetime
+    occurrence_index: int
+
+
+class ReminderSink(abc.ABC):
+    """Получатель наступивших напоминаний (push-сервис, очередь сообщений и т.п.)"""
+
+    @abc.abstractmethod
+    def emit(self, reminders: List[DueReminder]) -> None:
+        """Доставить пачку; исключение оставляет напоминания в очереди до следующего прохода"""
+
+
+class LogReminderSink(ReminderSink):
+    def emit(self, reminders: List[DueReminder]) -> None:
+        for reminder in reminders:
+            logger.info("Reminder due", extra=reminder.model_dump())
+
+
+class InMemoryReminderSink(ReminderSink):
+    """Локальная заглушка для тестов: складывает напоминания в список"""
+
+    def __init__(self):
+        self.emitted: List[DueReminder] = []
+
+    def emit(self, reminders: List[DueReminder]) -> None:
+        self.emitted.extend(reminders)
+
+
+def load_sink(path: str = REMINDER_SINK) -> ReminderSink:
+    """Sink из строки вида "package.module:ClassName" """
+    module_name, _, class_name = path.partition(":")
+    sink = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(sink, ReminderSink):
+        raise TypeError(f"REMINDER_SINK {path} is not a ReminderSink")
+    return sink
+
+
+def series_start(date: datetime, time: datetime) -> datetime:
+    """Начало серии: день из date, время суток из time (без пояса, см. комментарий о часовых поясах выше)"""
+    return datetime.combine(date.date(), time.time())
+
+
+class ReminderService:
+    @staticmethod
+    def sync_record(db: Session, record: ActivityRecord, user_id: int, is_new: bool = False, now: Optional[datetime] = None):
+        """Поставить, сдвинуть или снять ближайшее напоминание записи (в текущей транзакции, без commit)"""
+        if not is_new:
+            db.execute(delete(ScheduledReminder).where(ScheduledReminder.record_id == record.id))
+        if not record.notify:
+            return
+
+        upcoming = next_occurrence(
+            series_start(record.date, record.time),
+            record.repeat_type,
+            record.repeat_interval,
+            record.repeat_end_date,
+            record.repeat_count,
+            after=now or datetime.utcnow()
+        )
+        if upcoming:
+            occurrence_index, due_at = upcoming
+            db.add(ScheduledReminder(record_id=record.id, user_id=user_id, occurrence_index=occurrence_index, due_at=due_at))
+
+    @staticmethod
+    def schedule_records(db: Session, records, user_id: int, now: Optional[datetime] = None) -> int:
+        """Поставить напоминания пачке только что созданных записей одним INSERT (импорт)"""
+        now = now or datetime.utcnow()
+        entries = []
+        for record in records:
+            if not record.notify:
+                continue
+            upcoming = next_occurrence(
+                series_start(record.date, record.time), record.repeat_type, record.repeat_interval,
+                record.repeat_end_date, record.repeat_count, after=now
+            )
+            if upcoming:
+                entries.append({
+                    "record_id": record.id,
+                    "user_id": user_id,
+                    "occurrence_index": upcoming[0],
+                    "due_at": upcoming[1],
+                })
+        if entries:
+            db.execute(ScheduledReminder.__table__.insert(), entries)
+        return len(entries)
+
+    @staticmethod
+    def remove_for_user(db: Session, user_id: int) -> int:
+        """Снять все напоминания пользователя (в текущей транзакции, без commit)"""
+        return db.execute(delete(ScheduledReminder).where(ScheduledReminder.user_id == user_id)).rowcount
+
+    @staticmethod
+    def rebuild_queue(db: Session, now: Optional[datetime] = None, batch_size: int = REMINDER_BATCH_SIZE) -> int:
+        """Пересобрать очередь из всех записей с notify (после миграции или для восстановления)"""
+        now = now or datetime.utcnow()
+        db.execute(delete(ScheduledReminder))
+        rows = db.execute(
+            select(
+                ActivityRecord.id, Pet.user_id, ActivityRecord.date, ActivityRecord.time,
+                ActivityRecord.repeat_type, ActivityRecord.repeat_interval,
+                ActivityRecord.repeat_end_date, ActivityRecord.repeat_count
+            ).join(Pet).where(ActivityRecord.notify.is_(True)),
+            execution_options={"yield_per": batch_size}
+        )
+        scheduled = 0
+        for chunk in rows.partitions():
+            entries = []
+            for record_id, user_id, date, time, repeat_type, repeat_interval, repeat_end_date, repeat_count in chunk:
+                upcoming = next_occurrence(
+                    series_start(date, time), repeat_type, repeat_interval, repeat_end_date, repeat_count, after=now
+                )
+                if upcoming:
+                    entries.append({
+                        "record_id": record_id,
+                        "user_id": user_id,
+                        "occurrence_index": upcoming[0],
+                        "due_at": upcoming[1],
+                    })
+            if entries:
+                db.execute(ScheduledReminder.__table__.insert(), entries)
+                scheduled += len(entries)
+        db.commit()
+        return scheduled
+
+    @staticmethod
+    def process_due(db: Session, sink: ReminderSink, now: Optional[datetime] = None, batch_size: int = REMINDER_BATCH_SIZE) -> int:
+        """Забрать пачку наступивших напоминаний, отправить в sink и поставить следующие вхождения.
+        SKIP LOCKED позволяет нескольким процессам разбирать очередь параллельно."""
+        now = now or datetime.utcnow()
+        rows = db.execute(
+            select(
+                ScheduledReminder.id,
+                ScheduledReminder.record_id,
+                ScheduledReminder.user_id,
+                ScheduledReminder.occurrence_index,
+                ScheduledReminder.due_at,
+                ActivityRecord.pet_id,
+                ActivityRecord.category,
+                ActivityRecord.title,
+                ActivityRecord.date,
+                ActivityRecord.time,
+                ActivityRecord.repeat_type,
+                ActivityRecord.repeat_interval,
+                ActivityRecord.repeat_end_date,
+                ActivityRecord.repeat_count
+            )
+            .join(ActivityRecord, ActivityRecord.id == ScheduledReminder.record_id)
+            .where(ScheduledReminder.due_at <= now)
+            .order_by(ScheduledReminder.due_at)
+            .limit(batch_size)
+            .with_for_update(of=ScheduledReminder, skip_locked=True)
+        ).all()
+        if not rows:
+            db.rollback()
+            return 0
+
+        due: List[DueReminder] = []
+        rescheduled = []
+        finished = []
+        max_lateness = timedelta(seconds=REMINDER_MAX_LATENESS_SECONDS)
+        for row in rows:
+            if now - row.due_at <= max_lateness:
+                due.append(DueReminder(
+                    record_id=row.record_id,
+                    user_id=row.user_id,
+                    pet_id=row.pet_id,
+                    category=row.category,
+                    title=row.title,
+                    due_at=row.due_at,
+                    occurrence_index=row.occurrence_index
+                ))
+            # Следующее вхождение строго после текущего момента (пропущенные за простой не догоняем)
+            upcoming = next_occurrence(
+                series_start(row.date, row.time), row.repeat_type, row.repeat_interval,
+                row.repeat_end_date, row.repeat_count, after=now + timedelta(microseconds=1)
+            )
+            if upcoming:
+                rescheduled.append({"id": row.id, "occurrence_index": upcoming[0], "due_at": upcoming[1]})
+            else:
+                finished.append(row.id)
+
+        if rescheduled:
+            db.execute(update(ScheduledReminder), rescheduled)
+        if finished:
+            db.execute(delete(ScheduledReminder).where(ScheduledReminder.id.in_(finished)))
+        try:
+            # Отправка до commit: при сбое пачка вернётся в очередь (at-least-once)
+            if due:
+                sink.emit(due)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+
+    @staticmethod
+    def next_due_at(db: Session) -> Optional[datetime]:
+        return db.scalar(select(func.min(ScheduledReminder.due_at)))
+
+
+class ReminderScheduler:
+    """Фоновый поток: разбирает очередь пачками и спит до ближайшего напоминания"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        sink: Optional[ReminderSink] = None,
+        batch_size: int = REMINDER_BATCH_SIZE,
+        max_sleep_seconds: float = REMINDER_MAX_SLEEP_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.sink = sink or load_sink()
+        self.batch_size = batch_size
+        self.max_sleep_seconds = max_sleep_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Обработать все наступившие напоминания; возвращает количество обработанных строк очереди"""
+        total = 0
+        while True:
+            db = self.session_factory()
+            try:
+                processed = ReminderService.process_due(db, self.sink, now, self.batch_size)
+            finally:
+                db.close()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        db = self.session_factory()
+        try:
+            next_due = ReminderService.next_due_at(db)
+        finally:
+            db.close()
+        if next_due is None:
+            return self.max_sleep_seconds
+        delay = (next_due - (now or datetime.utcnow())).total_seconds()
+        return max(0.0, min(delay, self.max_sleep_seconds))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                delay = self.seconds_until_next()
+            except Exception:
+                logger.exception("Reminder scheduler error")
+                delay = self.max_sleep_seconds
+            self._stop.wait(delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Серверные напоминания об активностях")
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать очередь из activity_records")
+    parser.add_argument("--run", action="store_true", help="запустить планировщик отдельным процессом")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        session = SessionLocal()
+        try:
+            print(f"Scheduled {ReminderService.rebuild_queue(session)} reminders")
+        finally:
+            session.close()
+    if args.run:
+        scheduler = ReminderScheduler()
+        scheduler.start()
+        try:
+            scheduler._thread.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
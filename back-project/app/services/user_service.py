@@ -1,11 +1,14 @@
+import logging
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.auth.jwt import hash_refresh_token
 from app.models.refresh_token import RefreshToken
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
 import secrets
 
+logger = logging.getLogger(__name__)
+
 class UserService:
     @staticmethod
     def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
@@ -39,7 +42,8 @@ class UserService:
         return db_user
 
     @staticmethod
-    def create_user_with_firebase(db: Session, user: UserCreate, firebase_uid: str) -> User:
+    def create_user_with_firebase(db: Session, user: UserCreate, firebase_uid: str,
+                                  before_commit: Optional[Callable[[User], None]] = None) -> User:
         """Создание пользователя с Firebase UID (для новых регистраций)"""
         hashed_password = UserService.hash_password(user.password)
         db_user = User(
@@ -50,6 +54,9 @@ class UserService:
             full_name=user.full_name
         )
         db.add(db_user)
+        if before_commit:
+            db.flush()
+            before_commit(db_user)
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -186,9 +193,9 @@ class UserService:
             db.query(RefreshToken).filter(RefreshToken.user_id == user_id).delete()
             db.commit()
             return True
-        except Exception as e:
+        except Exception:
             db.rollback()
-            print(f"Error deleting refresh tokens: {e}")
+            logger.exception("Error deleting refresh tokens", extra={"user_id": user_id})
             return False
 
     @staticmethod
@@ -0,0 +1,12 @@
+import os
+
+from dotenv import load_dotenv
+
+# back-project/.env
+ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env")
+
+
+def load_env() -> None:
+    """Единственная загрузка .env. Переменные, уже заданные в окружении процесса
+    (docker env_file, CI, shell), важнее значений из файла"""
+    load_dotenv(ENV_PATH, override=False)
@@ -0,0 +1,129 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# ID текущего HTTP-запроса (ставит RequestIdMiddleware)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Стандартные атрибуты LogRecord; всё остальное пришло через extra= и попадает в JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Проставляет request_id в потоке, который пишет лог (до передачи в очередь)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей уровня; WARNING и выше не сэмплируются"""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _PreformattedQueueHandler(QueueHandler):
+    """Как QueueHandler, но оставляет extra-поля и исключение для форматтера в потоке записи"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback держит ссылки на кадры стека, поэтому форматируем его сразу
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging() -> None:
+    """Корневой логгер пишет в очередь, вывод в stdout делает отдельный поток QueueListener.
+    Настройки читаются при вызове, после загрузки .env"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format = os.getenv("LOG_FORMAT", "json")  # json | text
+    # Доля записей, которые проходят на уровне (1.0 - все). Для частых DEBUG-строк горячих путей
+    sample_rates = {
+        logging.DEBUG: float(os.getenv("LOG_SAMPLE_DEBUG", 1.0)),
+        logging.INFO: float(os.getenv("LOG_SAMPLE_INFO", 1.0)),
+    }
+
+    output = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    _handler = _PreformattedQueueHandler(queue.SimpleQueue())
+    _handler.addFilter(SamplingFilter(sample_rates))
+    _handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(level)
+    # Логи uvicorn идут через тот же JSON-вывод
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _restart_after_fork() -> None:
+    """Поток QueueListener не переживает fork (gunicorn --preload): в дочернем процессе
+    нужна своя очередь и свой поток, иначе записи воркеров копятся и не выводятся"""
+    global _listener
+    if _listener is None:
+        return
+    _handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Дописать очередь перед выходом процесса"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,142 @@
+import re
+from typing import NamedTuple, Optional
+
+# Канонические единицы activity_records.quantity_unit: масса хранится в граммах,
+# объём в миллилитрах, штучные порции - под своим названием
+GRAMS = "g"
+MILLILITRES = "ml"
+
+# единица -> (каноническая единица, множитель); точные совпадения для сокращений
+QUANTITY_UNITS = {
+    "g": (GRAMS, 1), "gr": (GRAMS, 1), "г": (GRAMS, 1), "гр": (GRAMS, 1),
+    "kg": (GRAMS, 1000), "кг": (GRAMS, 1000),
+    "mg": (GRAMS, 0.001), "мг": (GRAMS, 0.001),
+    "lb": (GRAMS, 453.592), "lbs": (GRAMS, 453.592),
+    "oz": (GRAMS, 28.3495),
+    "ml": (MILLILITRES, 1), "мл": (MILLILITRES, 1),
+    "l": (MILLILITRES, 1000), "л": (MILLILITRES, 1000),
+    "tbsp": (MILLILITRES, 15), "ст.л": (MILLILITRES, 15),
+    "tsp": (MILLILITRES, 5), "ч.л": (MILLILITRES, 5),
+    "pcs": ("piece", 1), "шт": ("piece", 1),
+}
+# Основы слов (английское множественное число, русские падежи) проверяются по порядку после точных совпадений
+QUANTITY_STEMS = (
+    ("milligram", GRAMS, 0.001), ("миллиграм", GRAMS, 0.001),
+    ("kilogram", GRAMS, 1000), ("килограм", GRAMS, 1000),
+    ("gram", GRAMS, 1), ("грам", GRAMS, 1),
+    ("pound", GRAMS, 453.592), ("фунт", GRAMS, 453.592),
+    ("ounce", GRAMS, 28.3495), ("унци", GRAMS, 28.3495),
+    ("millilit", MILLILITRES, 1), ("миллилитр", MILLILITRES, 1), ("милилитр", MILLILITRES, 1),
+    ("lit", MILLILITRES, 1000), ("литр", MILLILITRES, 1000),
+    ("cup", MILLILITRES, 240), ("чаш", MILLILITRES, 240), ("стакан", MILLILITRES, 240),
+    ("tablespoon", MILLILITRES, 15), ("teaspoon", MILLILITRES, 5),
+    ("can", "can", 1), ("банк", "can", 1),
+    ("pouch", "pouch", 1), ("пакет", "pouch", 1),
+    ("scoop", "scoop", 1), ("мерн", "scoop", 1),
+    ("piece", "piece", 1), ("штук", "piece", 1),
+    ("treat", "treat", 1), ("лакомств", "treat", 1),
+)
+
+# единица -> минуты
+DURATION_UNITS = {
+    "s": 1 / 60, "sec": 1 / 60, "secs": 1 / 60, "с": 1 / 60, "сек": 1 / 60,
+    "m": 1, "min": 1, "mins": 1, "м": 1, "мин": 1,
+    "h": 60, "hr": 60, "hrs": 60, "ч": 60,
+    "d": 1440, "д": 1440,
+}
+DURATION_STEMS = (
+    ("second", 1 / 60), ("секунд", 1 / 60),
+    ("minute", 1), ("минут", 1),
+    ("hour", 60), ("час", 60),
+    ("day", 1440), ("дн", 1440), ("день", 1440), ("сут", 1440),
+)
+HALF_HOUR_PHRASES = ("полчаса", "half an hour", "half hour")
+
+NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?"
+AMOUNT_PATTERN = re.compile(
+    rf"(?P<number>{NUMBER})(?:\s*(?:-|–|to|до)\s*(?P<upper>{NUMBER}))?\s*(?P<unit>[a-zа-яё.]+)?"
+)
+CLOCK_PATTERN = re.compile(r"^\s*(\d{1,2}):([0-5]\d)\s*$")
+
+
+class Quantity(NamedTuple):
+    value: float
+    unit: Optional[str]
+
+
+def parse_number(text: str) -> float:
+    """"2", "2,5", "1/2", "1 1/2" -> float"""
+    text = text.strip().replace(",", ".")
+    if "/" not in text:
+        return float(text)
+    whole, _, fraction = text.rpartition(" ")
+    numerator, denominator = fraction.split("/")
+    value = float(numerator) / float(denominator) if float(denominator) else 0.0
+    return value + (float(whole) if whole.strip() else 0.0)
+
+
+def amounts(text: str):
+    """(значение, слово-единица или None) для каждого числа в тексте; для диапазона - середина"""
+    for match in AMOUNT_PATTERN.finditer(text.lower()):
+        value = parse_number(match.group("number"))
+        if match.group("upper"):
+            value = (value + parse_number(match.group("upper"))) / 2
+        unit = match.group("unit")
+        yield value, unit.rstrip(".") if unit else None
+
+
+def lookup(unit: str, exact: dict, stems: tuple):
+    if unit in exact:
+        return exact[unit]
+    for stem, *conversion in stems:
+        if unit.startswith(stem):
+            return tuple(conversion) if len(conversion) > 1 else conversion[0]
+    return None
+
+
+def parse_quantity(text: Optional[str]) -> Optional[Quantity]:
+    """Порция свободным текстом ("200g", "2 cups", "1 кг 200 г", "1 банка") -> значение в канонической единице.
+    Число без распознанной единицы - unit None; текст без чисел - None"""
+    if not text:
+        return None
+    result = None
+    for value, unit_word in amounts(text):
+        conversion = lookup(unit_word, QUANTITY_UNITS, QUANTITY_STEMS) if unit_word else None
+        unit, factor = conversion or (None, 1)
+        if result is None:
+            result = Quantity(value * factor, unit)
+        elif unit is not None and unit == result.unit:
+            # "1 kg 200 g": части одной размерности складываются
+            result = Quantity(result.value + value * factor, unit)
+    return Quantity(round(result.value, 3), result.unit) if result else None
+
+
+def parse_duration_minutes(text: Optional[str]) -> Optional[float]:
+    """Длительность свободным текстом ("30 minutes", "1 hour", "1h 30m", "1:30", "полчаса") -> минуты.
+    Число без единицы считается минутами"""
+    if not text:
+        return None
+    lowered = text.lower()
+    if any(phrase in lowered for phrase in HALF_HOUR_PHRASES):
+        return 30.0
+    clock = CLOCK_PATTERN.match(lowered)
+    if clock:
+        return float(int(clock.group(1)) * 60 + int(clock.group(2)))
+
+    total = None
+    for value, unit_word in amounts(lowered):
+        factor = lookup(unit_word, DURATION_UNITS, DURATION_STEMS) if unit_word else 1
+        if factor is None:
+            continue
+        total = (total or 0) + value * factor
+    return round(total, 3) if total is not None else None
+
+
+def measurement_columns(quantity: Optional[str], duration: Optional[str]) -> dict:
+    """Нормализованные колонки activity_records для текстовых quantity и duration"""
+    parsed = parse_quantity(quantity)
+    return {
+        "quantity_value": parsed.value if parsed else None,
+        "quantity_unit": parsed.unit if parsed else None,
+        "duration_minutes": parse_duration_minutes(duration),
+    }
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+# Профилирование выключено по умолчанию: middleware и SQL-хук тогда вообще не подключаются
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Секрет для заголовка X-Profile и скачивания артефактов; пустой - запуск по заголовку выключен
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+# Доля случайно профилируемых запросов (0 - только по заголовку)
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/petcare-profiles")
+PROFILING_MAX_ARTIFACTS = int(os.getenv("PROFILING_MAX_ARTIFACTS", 200))
+
+MAX_STACK_DEPTH = 128
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Профиль текущего запроса; виден и в threadpool, куда FastAPI отправляет sync-эндпоинты
+active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+
+def fold_stack(frame) -> str:
+    """Стек в формате folded (flamegraph.pl, speedscope): внешний;...;внутренний"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """Статистический профиль одного запроса: поток-сэмплер снимает стеки потока event loop
+    и worker-потоков, в которых выполнялся этот запрос (они регистрируются из SQL-хука)"""
+
+    def __init__(self, method: str, path: str, interval_ms: float = PROFILING_INTERVAL_MS):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval_ms / 1000
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.threads = {threading.get_ident(): "loop"}
+        self.samples: Counter = Counter()
+        self.queries = []
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id[:8]}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+        self._stop.set()
+        self._sampler.join()
+
+    def add_thread(self, ident: int):
+        self.threads.setdefault(ident, "worker")
+
+    def add_query(self, statement: str, duration: float):
+        ended = time.perf_counter()
+        self.queries.append({
+            "offset_ms": round((ended - duration - self.started) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": self.threads.get(threading.get_ident(), "worker"),
+            "statement": " ".join(statement.split()),
+        })
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, role in list(self.threads.items()):
+                frame = frames.get(ident)
+                # Простаивающий event loop (ждёт threadpool или сеть) не интересен
+                if frame is None or (role == "loop" and frame.f_code.co_name == "select"):
+                    continue
+                self.samples[f"{role};{fold_stack(frame)}"] += 1
+
+    def to_dict(self) -> dict:
+        leaf_counts: Counter = Counter()
+        for stack, count in self.samples.items():
+            leaf_counts[stack.rsplit(";", 1)[-1]] += count
+        total = sum(self.samples.values())
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(((self.finished or time.perf_counter()) - self.started) * 1000, 3),
+            "interval_ms": self.interval * 1000,
+            "sample_count": total,
+            # Где проводилось время (self time по самому внутреннему кадру)
+            "top": [
+                {"frame": frame, "samples": count, "share": round(count / total, 4)}
+                for frame, count in leaf_counts.most_common(30)
+            ],
+            "samples": dict(self.samples),
+            "sql": {
+                "count": len(self.queries),
+                "total_ms": round(sum(query["duration_ms"] for query in self.queries), 3),
+                "timeline": self.queries,
+            },
+        }
+
+
+def record_query(conn, statement, parameters, executemany, duration):
+    """Слушатель SQL-хука: привязывает worker-поток к профилю и пишет SQL-таймлайн"""
+    profile = active_profile.get()
+    if profile is not None:
+        profile.add_thread(threading.get_ident())
+        profile.add_query(statement, duration)
+
+
+def artifact_path(profile_id: str) -> str:
+    return os.path.join(PROFILING_DIR, f"{profile_id}.json")
+
+
+def save_profile(profile: RequestProfile) -> str:
+    """Сохранить артефакт и удалить самые старые сверх PROFILING_MAX_ARTIFACTS (вызывать вне event loop)"""
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    path = artifact_path(profile.id)
+    with open(path, "w") as f:
+        json.dump(profile.to_dict(), f)
+
+    artifacts = sorted(
+        (entry for entry in os.scandir(PROFILING_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in artifacts[:-PROFILING_MAX_ARTIFACTS]:
+        os.remove(entry.path)
+    return path
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(artifact_path(profile_id)):
+        return None
+    with open(artifact_path(profile_id)) as f:
+        return json.load(f)
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    artifacts = sorted(
+        (entry for entry in os.scandir(PROFILING_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    return [entry.name[:-len(".json")] for entry in artifacts]
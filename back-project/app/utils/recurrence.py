@@ -0,0 +1,121 @@
+import calendar
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+from app.models.activity_record import RepeatType
+
+# Те же значения по умолчанию, что у мобильного клиента (repeatHelpers.getRepeatDates),
+# когда серию не ограничивают ни repeat_count, ни repeat_end_date
+DEFAULT_REPEAT_COUNTS = {
+    RepeatType.DAY: 7,
+    RepeatType.WEEK: 4,
+    RepeatType.MONTH: 3,
+    RepeatType.YEAR: 1,
+}
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Сдвиг на целое число месяцев; день прижимается к концу целевого месяца"""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def occurrence_at(start: datetime, repeat_type: RepeatType, repeat_interval: int, index: int) -> datetime:
+    """Дата вхождения с номером index (0 - сама запись)"""
+    interval = max(repeat_interval or 1, 1)
+    if repeat_type == RepeatType.DAY:
+        return start + timedelta(days=index * interval)
+    if repeat_type == RepeatType.WEEK:
+        return start + timedelta(weeks=index * interval)
+    if repeat_type == RepeatType.MONTH:
+        return add_months(start, index * interval)
+    if repeat_type == RepeatType.YEAR:
+        return add_months(start, index * interval * 12)
+    return start
+
+
+def last_occurrence_index(repeat_type: RepeatType, repeat_count: Optional[int], repeat_end_date: Optional[datetime]) -> Optional[int]:
+    """Номер последнего вхождения; None, если серию ограничивает только repeat_end_date"""
+    if repeat_type == RepeatType.NONE:
+        return 0
+    if repeat_count and repeat_count > 0:
+        return repeat_count
+    if repeat_end_date:
+        return None
+    return DEFAULT_REPEAT_COUNTS[repeat_type]
+
+
+def first_index_from(start: datetime, repeat_type: RepeatType, repeat_interval: int, window_start: datetime) -> int:
+    """Наименьший номер вхождения >= window_start, без перебора серии"""
+    if window_start <= start:
+        return 0
+    if repeat_type == RepeatType.NONE:
+        return 1
+    interval = max(repeat_interval or 1, 1)
+    if repeat_type in (RepeatType.DAY, RepeatType.WEEK):
+        step = timedelta(days=interval * (7 if repeat_type == RepeatType.WEEK else 1))
+        return -(-(window_start - start) // step)
+    months_step = interval * (12 if repeat_type == RepeatType.YEAR else 1)
+    months = (window_start.year - start.year) * 12 + window_start.month - start.month
+    index = max(months // months_step - 1, 0)
+    while occurrence_at(start, repeat_type, repeat_interval, index) < window_start:
+        index += 1
+    return index
+
+
+def iter_occurrences(
+    start: datetime,
+    repeat_type: RepeatType,
+    repeat_interval: int = 1,
+    repeat_end_date: Optional[datetime] = None,
+    repeat_count: Optional[int] = None,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None,
+) -> Iterator[datetime]:
+    """Вхождения (возможно, повторяющейся) записи в окне [window_start, window_end)"""
+    last_index = last_occurrence_index(repeat_type, repeat_count, repeat_end_date)
+    index = first_index_from(start, repeat_type, repeat_interval, window_start) if window_start else 0
+    while last_index is None or index <= last_index:
+        occurrence = occurrence_at(start, repeat_type, repeat_interval, index)
+        if index > 0 and repeat_end_date and occurrence > repeat_end_date:
+            return
+        if window_end and occurrence >= window_end:
+            return
+        yield occurrence
+        if repeat_type == RepeatType.NONE:
+            return
+        index += 1
+
+
+def occurrence_in_series(
+    start: datetime,
+    repeat_type: RepeatType,
+    repeat_interval: int,
+    repeat_end_date: Optional[datetime],
+    repeat_count: Optional[int],
+    index: int,
+) -> Optional[datetime]:
+    """Вхождение с номером index; None, если серия заканчивается раньше"""
+    last_index = last_occurrence_index(repeat_type, repeat_count, repeat_end_date)
+    if index < 0 or (last_index is not None and index > last_index):
+        return None
+    occurrence = occurrence_at(start, repeat_type, repeat_interval, index)
+    if index > 0 and repeat_end_date and occurrence > repeat_end_date:
+        return None
+    return occurrence
+
+
+def next_occurrence(
+    start: datetime,
+    repeat_type: RepeatType,
+    repeat_interval: int = 1,
+    repeat_end_date: Optional[datetime] = None,
+    repeat_count: Optional[int] = None,
+    after: Optional[datetime] = None,
+) -> Optional[Tuple[int, datetime]]:
+    """(номер, дата) первого вхождения не раньше after, без развёртывания серии"""
+    index = first_index_from(start, repeat_type, repeat_interval, after) if after else 0
+    occurrence = occurrence_in_series(start, repeat_type, repeat_interval, repeat_end_date, repeat_count, index)
+    return (index, occurrence) if occurrence is not None else None
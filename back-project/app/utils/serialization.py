@@ -0,0 +1,46 @@
+import json
+import os
+from typing import Any, List, Sequence
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него - стандартный json
+    orjson = None
+
+# По флагу FAST_JSON_RESPONSES=true списочные эндпоинты не собирают ORM-объекты и не валидируют
+# response_model, а кодируют строки Core напрямую
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+def json_bytes(content: Any) -> bytes:
+    """Компактный JSON: через orjson, если установлен (datetime, date и Enum он кодирует сам)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ через orjson (без него - стандартный json)"""
+
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
+
+
+def rows_to_dicts(rows: Sequence[Any]) -> List[dict]:
+    """Словари из строк результата Core (имя колонки -> значение)"""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def list_response(items: Sequence[Any], projected: bool = False):
+    """Отдать строки быстрым путём, если он включён (проекции колонок - всегда),
+    иначе оставить их response_model"""
+    if FAST_JSON_RESPONSES or projected:
+        return FastJSONResponse(rows_to_dicts(items))
+    return items
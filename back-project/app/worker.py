@@ -0,0 +1,23 @@
+import logging
+
+from uvicorn_worker import UvicornWorker
+
+# Часть graceful_timeout, оставляемая на lifespan shutdown (планировщик, запись AI-событий, логи)
+LIFESPAN_SHUTDOWN_RESERVE_SECONDS = 10
+
+
+class PetcareUvicornWorker(UvicornWorker):
+    """Воркер gunicorn для production: uvloop и httptools вместо автовыбора,
+    логи uvicorn идут в общий JSON-вывод, SIGTERM дожидается активных запросов"""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # uvicorn-worker переключает логгеры uvicorn на обработчики gunicorn - возвращаем их в корневой
+        for name in ("uvicorn.error", "uvicorn.access"):
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+        # Сначала ждём активные запросы, затем lifespan shutdown; всё вместе укладывается в graceful_timeout,
+        # после которого мастер убивает воркер
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - LIFESPAN_SHUTDOWN_RESERVE_SECONDS, 1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Замер сжатия ответов: сколько байт экономит gzip/brotli
+и сколько CPU стоит сжатие одного ответа в зависимости от размера.
+
+Запуск: python benchmarks/bench_compression.py [--iterations 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.middleware.compression import COMPRESSION_MIN_SIZE, ENCODERS
+from app.utils.serialization import FastJSONResponse
+
+ROW_COUNTS = (5, 50, 500, 1000, 5000)
+
+
+def records_payload(rows: int) -> bytes:
+    """JSON как у /records/all-user-pets"""
+    start = datetime(2024, 1, 1, 8, 0)
+    return FastJSONResponse([
+        {
+            "id": i,
+            "pet_id": i % 3 + 1,
+            "category": ("FEEDING", "CARE", "ACTIVITY")[i % 3],
+            "title": f"Morning walk #{i}",
+            "date": start + timedelta(hours=i),
+            "time": start + timedelta(hours=i),
+            "notify": True,
+            "notes": "Take the long route through the park" if i % 4 == 0 else None,
+            "food_type": None,
+            "quantity": "200g" if i % 3 == 0 else None,
+            "duration": "30 minutes" if i % 3 == 2 else None,
+            "repeat_type": "none",
+            "repeat_interval": 1,
+            "repeat_end_date": None,
+            "repeat_count": None,
+        }
+        for i in range(rows)
+    ]).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"min size for compression: {COMPRESSION_MIN_SIZE} bytes")
+    print(f"{'rows':>6} {'raw bytes':>10} {'enc':<5} {'out bytes':>10} {'saved':>7} {'cpu ms':>8}")
+    for rows in ROW_COUNTS:
+        body = records_payload(rows)
+        for name, encoder in ENCODERS.items():
+            compressed = encoder(body)
+            started = time.process_time()
+            for _ in range(args.iterations):
+                encoder(body)
+            cpu_ms = (time.process_time() - started) / args.iterations * 1000
+            saved = 1 - len(compressed) / len(body)
+            print(f"{rows:>6} {len(body):>10} {name:<5} {len(compressed):>10} {saved:>7.1%} {cpu_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
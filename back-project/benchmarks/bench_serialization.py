@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark сериализации списочных эндпоинтов:
+ORM + response_model + stdlib json против Core-строк + orjson.
+
+Запуск: python benchmarks/bench_serialization.py [--iterations 30]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import Base
+from app.models import User, Pet, ActivityRecord, ActivityCategory
+from app.models.pet import PetGender
+from app.schemas.activity_record import ActivityRecordRead
+from app.services.activity_record_service import ActivityRecordService
+from app.utils.serialization import FastJSONResponse, rows_to_dicts
+
+PAYLOAD_SIZES = (1000, 10000)
+
+
+def seed(session_factory, rows: int) -> SimpleNamespace:
+    db = session_factory()
+    user = User(username=f"bench{rows}", email=f"bench{rows}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    pet = Pet(user_id=user.id, name="Rex", species="dog", gender=PetGender.MALE,
+              birthdate=date(2020, 1, 1), weight=12.5)
+    db.add(pet)
+    db.flush()
+    start = datetime(2024, 1, 1, 8, 0)
+    categories = list(ActivityCategory)
+    db.bulk_save_objects([
+        ActivityRecord(
+            pet_id=pet.id,
+            category=categories[i % len(categories)],
+            title=f"Record {i}",
+            date=start + timedelta(hours=i),
+            time=start + timedelta(hours=i),
+            notes="Lorem ipsum dolor sit amet " * 4,
+            quantity="200g",
+        )
+        for i in range(rows)
+    ])
+    db.commit()
+    current_user = SimpleNamespace(id=user.id)
+    db.close()
+    return current_user
+
+
+def orm_path(db, current_user, adapter, limit):
+    records = ActivityRecordService.get_all_user_records(db, current_user, limit=limit)
+    validated = adapter.validate_python(records, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+
+def fast_path(db, current_user, limit):
+    rows = ActivityRecordService.get_all_user_records(db, current_user, limit=limit, as_rows=True)
+    return FastJSONResponse(rows_to_dicts(rows)).body
+
+
+def measure(fn, session_factory, iterations: int, rows: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        db = session_factory()
+        started = time.perf_counter()
+        fn(db)
+        timings.append(time.perf_counter() - started)
+        db.close()
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    mean = statistics.mean(timings)
+    return {"rows_per_sec": rows / mean, "p50_ms": statistics.median(timings) * 1000, "p99_ms": p99 * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[ActivityRecordRead])
+    print(f"{'rows':>6} {'path':<8} {'rows/sec':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for rows in PAYLOAD_SIZES:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        current_user = seed(session_factory, rows)
+
+        results = {
+            "orm": measure(lambda db: orm_path(db, current_user, adapter, rows), session_factory, args.iterations, rows),
+            "fast": measure(lambda db: fast_path(db, current_user, rows), session_factory, args.iterations, rows),
+        }
+        for name, result in results.items():
+            print(f"{rows:>6} {name:<8} {result['rows_per_sec']:>12.0f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Наполнение локальной Postgres (POSTGRES_* из окружения) данными для нагрузочного теста:
+пользователи loadtest{N}@example.com с несколькими питомцами и тысячами записей активности.
+Данные детерминированы (--seed), повторный запуск пересоздаёт пользователей loadtest.
+
+Запуск: python benchmarks/load_seed.py [--users 20] [--pets 3] [--records 2000] [--seed 42]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+
+from app.db.session import SessionLocal
+from app.models import User, Pet, ActivityRecord, ActivityCategory
+from app.models.activity_record import RepeatType
+from app.models.pet import PetGender
+from app.services.account_deletion_service import AccountDeletionService
+from app.services.user_service import UserService
+from app.utils.measurements import measurement_columns
+
+LOAD_TEST_EMAIL = "loadtest{}@example.com"
+LOAD_TEST_PASSWORD = "loadtest-password"
+
+SPECIES = (("dog", "Labrador"), ("cat", "Persian"), ("dog", "Beagle"), ("cat", None), ("parrot", "Budgie"))
+TITLES = {
+    ActivityCategory.FEEDING: ("Morning feeding", "Evening feeding", "Treats"),
+    ActivityCategory.CARE: ("Vet visit", "Deworming", "Grooming", "Vaccination"),
+    ActivityCategory.ACTIVITY: ("Walk", "Play time", "Training"),
+}
+# Доля повторяющихся записей и их типы - примерно как в реальных данных приложения
+REPEAT_TYPES = (RepeatType.DAY, RepeatType.WEEK, RepeatType.MONTH)
+REPEAT_SHARE = 0.1
+
+
+def record_rows(rng: random.Random, pet_id: int, count: int, start: datetime):
+    categories = list(TITLES)
+    for _ in range(count):
+        category = rng.choice(categories)
+        moment = start + timedelta(days=rng.randint(0, 365), minutes=rng.randrange(6 * 60, 22 * 60, 15))
+        repeat_type = rng.choice(REPEAT_TYPES) if rng.random() < REPEAT_SHARE else RepeatType.NONE
+        row = {
+            "pet_id": pet_id,
+            "category": category,
+            "title": rng.choice(TITLES[category]),
+            "date": moment,
+            "time": moment,
+            "notify": rng.random() < 0.3,
+            "notes": "Remember to bring the leash and water" if rng.random() < 0.25 else None,
+            "food_type": "Dry food" if category == ActivityCategory.FEEDING else None,
+            "quantity": f"{rng.choice((50, 100, 150, 200))}g" if category == ActivityCategory.FEEDING else None,
+            "duration": f"{rng.choice((15, 30, 45, 60))} minutes" if category == ActivityCategory.ACTIVITY else None,
+            "repeat_type": repeat_type,
+            "repeat_interval": 1,
+            "repeat_end_date": None,
+            "repeat_count": rng.choice((None, 5, 10)) if repeat_type != RepeatType.NONE else None,
+        }
+        row.update(measurement_columns(row["quantity"], row["duration"]))
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--pets", type=int, default=3, help="питомцев на пользователя")
+    parser.add_argument("--records", type=int, default=2000, help="записей на питомца")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    # bcrypt медленный, хэш общий для всех пользователей
+    hashed_password = UserService.hash_password(LOAD_TEST_PASSWORD)
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        for i in range(args.users):
+            existing = UserService.get_user_by_email(db, LOAD_TEST_EMAIL.format(i))
+            if existing:
+                AccountDeletionService.delete_account(db, existing.id)
+
+            user = User(
+                username=f"loadtest{i}",
+                email=LOAD_TEST_EMAIL.format(i),
+                hashed_password=hashed_password,
+                email_verified=True,
+            )
+            db.add(user)
+            db.flush()
+            for j in range(args.pets):
+                species, breed = SPECIES[(i + j) % len(SPECIES)]
+                pet = Pet(
+                    user_id=user.id,
+                    name=f"Pet {i}-{j}",
+                    species=species,
+                    breed=breed,
+                    gender=rng.choice(list(PetGender)),
+                    birthdate=date(2015, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+                    weight=round(rng.uniform(0.5, 35), 1),
+                )
+                db.add(pet)
+                db.flush()
+                db.execute(insert(ActivityRecord), list(record_rows(rng, pet.id, args.records, start)))
+            db.commit()
+            print(f"user {i + 1}/{args.users} seeded")
+    finally:
+        db.close()
+
+    total = args.users * args.pets * args.records
+    print(f"Seeded {args.users} users, {args.users * args.pets} pets, {total} records "
+          f"in {time.perf_counter() - started:.1f}s (password: {LOAD_TEST_PASSWORD})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест API: RPS и p50/p95/p99 по сценариям с заданной конкурентностью.
+Перед запуском: python benchmarks/load_seed.py и uvicorn app.main:app против той же Postgres
+(нужен httpx: pip install httpx).
+
+Запуск:
+    python benchmarks/load_test.py [--base-url http://localhost:8000] [--concurrency 20] [--duration 30]
+                                   [--scenarios login,refresh,pets,records,...] [--save baselines/local.json]
+                                   [--compare baselines/local.json]
+
+Сценарий ai (POST /ai/assist) выключен по умолчанию: запускайте его только против сервера
+с локальной заглушкой модели (AI_MODEL=stub), иначе тест измеряет внешний LLM.
+
+Baseline сохраняется как JSON с округлёнными значениями, чтобы регрессии были видны в git diff.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_seed import LOAD_TEST_EMAIL, LOAD_TEST_PASSWORD
+
+DEFAULT_SCENARIOS = (
+    "login", "refresh", "pets", "records_all", "records_by_pet",
+    "records_by_date", "records_range", "calendar_summary", "agenda_week",
+)
+# Регрессия, если p95 вырос или RPS упал больше чем на эту долю относительно baseline
+REGRESSION_TOLERANCE = 0.15
+
+
+class LoadUser:
+    def __init__(self, email: str):
+        self.email = email
+        self.access_token = None
+        self.refresh_token = None
+        self.pet_ids = []
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+def random_day(rng: random.Random) -> date:
+    return date(2024, 1, 1) + timedelta(days=rng.randint(0, 365))
+
+
+def build_request(scenario: str, user: LoadUser, rng: random.Random):
+    """(method, url, kwargs) для сценария"""
+    if scenario == "login":
+        return "POST", "/auth/login", {"json": {"email": user.email, "password": LOAD_TEST_PASSWORD}}
+    if scenario == "refresh":
+        return "POST", "/auth/refresh", {"json": {"refresh_token": user.refresh_token}}
+    if scenario == "pets":
+        return "GET", "/pets/", {"headers": user.headers}
+    if scenario == "records_all":
+        return "GET", "/records/all-user-pets", {"headers": user.headers, "params": {"limit": 100}}
+    if scenario == "records_by_pet":
+        params = {"pet_id": rng.choice(user.pet_ids), "limit": 100}
+        return "GET", "/records/", {"headers": user.headers, "params": params}
+    if scenario == "records_by_date":
+        params = {"date": random_day(rng).isoformat()}
+        return "GET", "/records/by-date", {"headers": user.headers, "params": params}
+    if scenario == "records_range":
+        start = random_day(rng)
+        params = {"start_date": start.isoformat(), "end_date": (start + timedelta(days=30)).isoformat(), "fields": "calendar"}
+        return "GET", "/records/by-date-range", {"headers": user.headers, "params": params}
+    if scenario == "calendar_summary":
+        params = {"month": f"2024-{rng.randint(1, 12):02d}"}
+        return "GET", "/records/calendar-summary", {"headers": user.headers, "params": params}
+    if scenario == "agenda_week":
+        return "GET", "/records/agenda", {"headers": user.headers, "params": {"days": 7}}
+    if scenario == "ai":
+        return "POST", "/ai/assist", {"headers": user.headers, "json": {"message": "How often should I walk my dog?"}}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def authenticate(client: httpx.AsyncClient, user: LoadUser):
+    response = await client.post("/auth/login", json={"email": user.email, "password": LOAD_TEST_PASSWORD})
+    response.raise_for_status()
+    tokens = response.json()
+    user.access_token = tokens["access_token"]
+    user.refresh_token = tokens["refresh_token"]
+    response = await client.get("/pets/", headers=user.headers)
+    response.raise_for_status()
+    user.pet_ids = [pet["id"] for pet in response.json()]
+
+
+async def run_scenario(client, scenario: str, users, concurrency: int, duration: float, seed: int) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            user = users[rng.randrange(len(users))]
+            method, url, kwargs = build_request(scenario, user, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get("results", {}).get(scenario)
+        if not base:
+            continue
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{scenario}: p95 {base['p95_ms']} -> {result['p95_ms']} ms")
+        if base["rps"] and result["rps"] < base["rps"] * (1 - REGRESSION_TOLERANCE):
+            regressions.append(f"{scenario}: rps {base['rps']} -> {result['rps']}")
+    return regressions
+
+
+async def run(args) -> dict:
+    scenarios = args.scenarios.split(",")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        users = [LoadUser(LOAD_TEST_EMAIL.format(i)) for i in range(args.users)]
+        await asyncio.gather(*(authenticate(client, user) for user in users))
+
+        results = {}
+        print(f"{'scenario':<18} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for scenario in scenarios:
+            if args.warmup:
+                await run_scenario(client, scenario, users, args.concurrency, args.warmup, args.seed)
+            result = await run_scenario(client, scenario, users, args.concurrency, args.duration, args.seed)
+            results[scenario] = result
+            print(f"{scenario:<18} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("LOAD_TEST_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--users", type=int, default=20, help="сколько пользователей loadtest использовать")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="секунд на сценарий")
+    parser.add_argument("--warmup", type=float, default=3, help="секунд прогрева перед сценарием")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="сохранить результаты как baseline (JSON)")
+    parser.add_argument("--compare", help="сравнить с baseline и вернуть код 1 при регрессии")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.save:
+        baseline = {
+            "params": {"concurrency": args.concurrency, "duration": args.duration, "users": args.users, "seed": args.seed},
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
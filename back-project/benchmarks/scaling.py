@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Масштабирование по ядрам: поднимает production-профиль (gunicorn.conf.py) с разным числом
+воркеров и прогоняет один сценарий нагрузочного теста против каждого запуска.
+Перед запуском: python benchmarks/load_seed.py и доступная Postgres (POSTGRES_* из окружения).
+
+Запуск:
+    python benchmarks/scaling.py [--workers 1,2,4,8] [--scenario records_by_date] [--concurrency 64]
+                                 [--duration 20] [--save baselines/scaling.json]
+
+Эффективность = RPS / (RPS одного воркера * число воркеров). Заметно меньше 1 - упор не в CPU
+(пул соединений, Postgres, блокировки) или воркеров больше, чем свободных ядер.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_seed import LOAD_TEST_EMAIL
+from benchmarks.load_test import LoadUser, authenticate, run_scenario
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def default_worker_counts():
+    counts, n = [], 1
+    while n <= (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return ",".join(map(str, counts))
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py"],
+        cwd=PROJECT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(server: subprocess.Popen):
+    # Тот же путь, что и при остановке контейнера: SIGTERM и graceful shutdown
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def wait_ready(base_url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start in {timeout}s")
+
+
+async def measure(args, base_url: str) -> dict:
+    await wait_ready(base_url, args.startup_timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        users = [LoadUser(LOAD_TEST_EMAIL.format(i)) for i in range(args.users)]
+        await asyncio.gather(*(authenticate(client, user) for user in users))
+        if args.warmup:
+            await run_scenario(client, args.scenario, users, args.concurrency, args.warmup, args.seed)
+        return await run_scenario(client, args.scenario, users, args.concurrency, args.duration, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=default_worker_counts(), help="числа воркеров через запятую")
+    parser.add_argument("--scenario", default="records_by_date")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="сохранить результаты (JSON)")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    print(f"{'workers':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'speedup':>8} {'efficiency':>10}")
+    for workers in map(int, args.workers.split(",")):
+        server = start_server(workers, args.port)
+        try:
+            result = asyncio.run(measure(args, base_url))
+        finally:
+            stop_server(server)
+        base_rps = results[min(results)]["rps"] / min(results) if results else result["rps"] / workers
+        result["speedup"] = round(result["rps"] / base_rps, 2) if base_rps else 0.0
+        result["efficiency"] = round(result["speedup"] / workers, 2)
+        results[workers] = result
+        print(f"{workers:>7} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['errors']:>7} {result['speedup']:>8.2f} {result['efficiency']:>10.2f}")
+
+    if args.save:
+        report = {
+            "params": {
+                "scenario": args.scenario, "concurrency": args.concurrency, "duration": args.duration,
+                "users": args.users, "seed": args.seed, "cpu_count": os.cpu_count(),
+            },
+            "results": {str(workers): result for workers, result in results.items()},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Results saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Стоимость холодного старта: время импорта app.main по модулям (python -X importtime),
+время до первого ответа (lifespan + GET /) и RSS процесса.
+
+Запуск:
+    python benchmarks/startup.py [--runs 3] [--top 25] [--json startup.json]
+                                 [--budget benchmarks/startup_budget.json]
+
+Для тяжёлых пакетов дополнительно меряется RSS их изолированного импорта (общие зависимости
+при этом считаются в каждом пакете). Отложенные подсистемы (Firebase, AI-агент) показываются
+отдельно: при старте их быть не должно, они грузятся при первом обращении или в фоне.
+
+С --budget скрипт завершается с кодом 1, если медиана времени или RSS превышает бюджет
+или при старте импортирован модуль из списка отложенных - так регрессии ловятся в CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Подсистемы, которые грузятся лениво (app/ai/__init__.py, app/auth/firebase.py): при старте их быть не должно
+DEFERRED_MODULES = ("app.ai.agent", "firebase_admin", "google.adk", "google.generativeai", "google.genai", "requests")
+# Что показывается в отчёте как отложенная стоимость
+DEFERRED_ENTRY_POINTS = ("app.ai.agent", "firebase_admin", "requests")
+
+# Выполняется в отдельном интерпретаторе, чтобы каждый замер был холодным
+CHILD = r'''
+import json, os, resource, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Не Linux: пиковый RSS (на macOS в байтах, на Linux в КБ)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+module_name, app_attr = sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None
+result = {"rss_interpreter_mb": rss_mb()}
+started = time.perf_counter()
+module = __import__(module_name, fromlist=["_"])
+result["import_ms"] = (time.perf_counter() - started) * 1000
+result["rss_import_mb"] = rss_mb()
+if app_attr:
+    from fastapi.testclient import TestClient
+    with TestClient(getattr(module, app_attr)) as client:
+        client.get("/").raise_for_status()
+        result["first_response_ms"] = (time.perf_counter() - started) * 1000
+        result["rss_first_response_mb"] = rss_mb()
+result["modules"] = sorted(sys.modules)
+print(json.dumps(result))
+'''
+
+
+def run_child(args, importtime: bool = False) -> tuple:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    # Замер старта, а не фоновой догрузки и БД
+    env.update(PRELOAD_OPTIONAL_SUBSYSTEMS="false", DB_POOL_WARMUP="0", REMINDER_SCHEDULER_ENABLED="false")
+    # Импорт агента без GOOGLE_API_KEY (те же пакеты, без обращения к Gemini)
+    env.setdefault("AI_MODEL", "stub")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD] + list(args)
+    completed = subprocess.run(command, cwd=PROJECT_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Import of {args[0]} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(stderr: str) -> dict:
+    """{модуль: (self_us, cumulative_us)} из вывода python -X importtime"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def isolated_rss(package: str, interpreter_mb: float) -> float:
+    try:
+        result, _ = run_child([package])
+    except RuntimeError:
+        return 0.0
+    return max(result["rss_import_mb"] - interpreter_mb, 0.0)
+
+
+def profile(args) -> dict:
+    runs = [run_child([args.module, args.app_attr])[0] for _ in range(args.runs)]
+    # Только импорт: TestClient и его зависимости не должны попадать в таблицу модулей
+    imported, stderr = run_child([args.module], importtime=True)
+    modules = parse_importtime(stderr)
+    # Всё, что загружено к первому ответу (в том числе при startup)
+    loaded = runs[-1]["modules"]
+
+    packages = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        packages[name.split(".")[0]] += self_us
+    # Свой пакет приложения отдельно не импортируется - в нём нет смысла мерить RSS
+    packages.pop(args.module.split(".")[0], None)
+    heavy = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.packages]
+    interpreter_mb = imported["rss_interpreter_mb"]
+
+    deferred = {}
+    for name in DEFERRED_ENTRY_POINTS:
+        try:
+            result, _ = run_child([name])
+            deferred[name] = {
+                "import_ms": round(result["import_ms"], 1),
+                "rss_mb": round(max(result["rss_import_mb"] - interpreter_mb, 0.0), 1),
+            }
+        except RuntimeError as e:
+            deferred[name] = {"error": str(e).splitlines()[-1]}
+
+    return {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "first_response_ms": round(statistics.median(run["first_response_ms"] for run in runs), 1),
+        "rss_mb": round(statistics.median(run["rss_first_response_mb"] for run in runs), 1),
+        "rss_interpreter_mb": round(interpreter_mb, 1),
+        "module_count": len(loaded),
+        "top_modules": [
+            {"module": name, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+            for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        ],
+        "packages": [
+            {"package": name, "self_ms": round(self_us / 1000, 1), "isolated_rss_mb": round(isolated_rss(name, interpreter_mb), 1)}
+            for name, self_us in heavy
+        ],
+        "loaded_deferred": [name for name in DEFERRED_MODULES if name in loaded],
+        "deferred": deferred,
+    }
+
+
+def check_budget(report: dict, budget: dict) -> list:
+    violations = []
+    for key in ("import_ms", "first_response_ms", "rss_mb"):
+        if key in budget and report[key] > budget[key]:
+            violations.append(f"{key}: {report[key]} > budget {budget[key]}")
+    for name in report["loaded_deferred"]:
+        violations.append(f"{name} is imported at startup (must stay lazy)")
+    return violations
+
+
+def print_report(report: dict):
+    print(f"Cold start (median of {report['runs']}): import {report['import_ms']} ms, "
+          f"first response {report['first_response_ms']} ms, RSS {report['rss_mb']} MB "
+          f"(interpreter {report['rss_interpreter_mb']} MB), {report['module_count']} modules")
+    print(f"\n{'module':<50} {'self ms':>9} {'cum ms':>9}")
+    for row in report["top_modules"]:
+        print(f"{row['module'][:50]:<50} {row['self_ms']:>9.1f} {row['cumulative_ms']:>9.1f}")
+    print(f"\n{'package':<30} {'self ms':>9} {'isolated RSS MB':>16}")
+    for row in report["packages"]:
+        print(f"{row['package']:<30} {row['self_ms']:>9.1f} {row['isolated_rss_mb']:>16.1f}")
+    print(f"\n{'deferred (not loaded at startup)':<40} {'import ms':>10} {'RSS MB':>8}")
+    for name, row in report["deferred"].items():
+        if "error" in row:
+            print(f"{name:<40} {row['error']}")
+        else:
+            print(f"{name:<40} {row['import_ms']:>10.1f} {row['rss_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--app-attr", default="app")
+    parser.add_argument("--runs", type=int, default=3, help="холодных запусков для медианы")
+    parser.add_argument("--top", type=int, default=25, help="модулей в отчёте")
+    parser.add_argument("--packages", type=int, default=12, help="пакетов с замером RSS")
+    parser.add_argument("--json", help="сохранить отчёт (JSON)")
+    parser.add_argument("--budget", help="JSON с import_ms, first_response_ms, rss_mb; код 1 при превышении")
+    args = parser.parse_args()
+
+    report = profile(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.budget:
+        with open(args.budget) as f:
+            violations = check_budget(report, json.load(f))
+        for line in violations:
+            print(f"BUDGET {line}")
+        if violations:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
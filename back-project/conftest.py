@@ -0,0 +1,128 @@
+"""
+Общие фикстуры pytest: приложение поверх SQLite в памяти, без Postgres и Firebase
+"""
+
+from datetime import date, datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401 - регистрирует все таблицы в Base.metadata
+from app.auth.deps import get_current_user, get_db
+from app.db.session import Base
+from app.models import ActivityCategory, ActivityRecord, Pet, User
+from app.models.pet import PetGender
+from app.services.account_deletion_service import _known_tables
+from app.services.idempotency_service import idempotency_cache
+from app.services.pet_stats_service import pet_stats_cache
+
+# Ручной скрипт против запущенного сервера (python test_auth_features.py), pytest его не собирает
+collect_ignore = ["test_auth_features.py"]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кэши процесса не должны переживать тест: id в новой базе начинаются заново"""
+    yield
+    for cache in (idempotency_cache, pet_stats_cache, _known_tables):
+        cache.clear()
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def add_user(db, username: str) -> User:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def add_pet(db, user: User, name: str = "Rex") -> Pet:
+    pet = Pet(user_id=user.id, name=name, species="dog", gender=PetGender.MALE, birthdate=date(2020, 1, 1), weight=10)
+    db.add(pet)
+    db.commit()
+    return pet
+
+
+@pytest.fixture
+def user(db):
+    return add_user(db, "owner")
+
+
+@pytest.fixture
+def pet(db, user):
+    return add_pet(db, user)
+
+
+@pytest.fixture
+def other_pet(db):
+    """Питомец другого пользователя"""
+    return add_pet(db, add_user(db, "stranger"), name="Tom")
+
+
+@pytest.fixture
+def records(db, pet):
+    """Пять кормлений в январе 2024"""
+    items = [
+        ActivityRecord(
+            pet_id=pet.id, category=ActivityCategory.FEEDING, title=f"Feeding {day}",
+            date=datetime(2024, 1, day, 8), time=datetime(2024, 1, day, 8), notes="200 g"
+        )
+        for day in range(1, 6)
+    ]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+@pytest.fixture
+def make_client(session_factory, user):
+    """make_client(router, ...) - TestClient с переданными роутерами от имени user.
+    Как и настоящий get_current_user, пользователь читается из базы одним запросом"""
+    user_id = user.id
+
+    def factory(*routers) -> TestClient:
+        test_app = FastAPI()
+        for router in routers:
+            test_app.include_router(router)
+
+        def override_db():
+            session = session_factory()
+            try:
+                yield session
+            finally:
+                session.close()
+
+        def override_user():
+            session = session_factory()
+            try:
+                current_user = session.get(User, user_id)
+                session.expunge(current_user)
+                return current_user
+            finally:
+                session.close()
+
+        test_app.dependency_overrides[get_db] = override_db
+        test_app.dependency_overrides[get_current_user] = override_user
+        return TestClient(test_app)
+
+    return factory
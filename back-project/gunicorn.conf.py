@@ -0,0 +1,57 @@
+"""
+Production-профиль сервера: мастер gunicorn и воркеры uvicorn (uvloop + httptools).
+
+Запуск: gunicorn app.main:app -c gunicorn.conf.py
+
+Приложение импортируется один раз в мастере (preload) и наследуется воркерами через fork:
+воркеры стартуют быстрее и делят память. Пулы БД открываются в каждом воркере при startup
+(DB_POOL_WARMUP), до приёма трафика.
+
+SIGTERM: мастер перестаёт принимать соединения, воркеры дожидаются активных запросов, затем
+lifespan shutdown останавливает планировщик напоминаний и дописывает отложенные AI-события,
+а очередь логов выводится при выходе процесса. Всё это укладывается в GRACEFUL_TIMEOUT_SECONDS.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "app.worker.PetcareUvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Keep-alive дольше, чем у балансировщика перед нами - иначе он получает сброс соединения
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", 75))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", 30))
+# Воркер, не отвечающий мастеру дольше этого, перезапускается
+timeout = int(os.getenv("WORKER_TIMEOUT_SECONDS", 60))
+backlog = int(os.getenv("BACKLOG", 2048))
+# Плановый перезапуск воркеров против медленных утечек памяти (0 - выключено)
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+# Метрики Prometheus из всех воркеров (задаётся до импорта приложения)
+prometheus_multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/petcare-prometheus")
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска искажают счётчики
+    for name in os.listdir(prometheus_multiproc_dir):
+        path = os.path.join(prometheus_multiproc_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # Соединения, унаследованные от мастера, нельзя использовать в двух процессах
+    from app.db.session import engine
+    engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
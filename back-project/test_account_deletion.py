@@ -0,0 +1,168 @@
+"""
+Удаление аккаунта (AccountDeletionService) на SQLite: все таблицы пользователя, пачки с commit
+и жизненный цикл фоновой задачи - захват, повтор после сбоя, брошенные задачи и токен статуса
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from app.models import AccountDeletionJobRecord, ActivityRecord, IdempotencyKey, Pet, RefreshToken, User
+from app.services import account_deletion_service
+from app.services.account_deletion_service import MAX_ATTEMPTS, STALE_JOB_SECONDS, AccountDeletionService
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(account_deletion_service, "BATCH_SIZE", 2)
+
+
+@pytest.fixture
+def adk_tables(db):
+    """Таблицы ADK с нужными удалению колонками: события двух пользователей"""
+    db.execute(text("CREATE TABLE events (id VARCHAR PRIMARY KEY, app_name VARCHAR, user_id VARCHAR, session_id VARCHAR)"))
+    db.execute(text("CREATE TABLE sessions (id VARCHAR PRIMARY KEY, app_name VARCHAR, user_id VARCHAR)"))
+    db.execute(text("CREATE TABLE user_states (app_name VARCHAR, user_id VARCHAR)"))
+    db.commit()
+
+
+def add_adk_data(db, user_id: int, events: int):
+    db.execute(text("INSERT INTO sessions VALUES (:id, 'app', :user_id)"), {"id": f"s-{user_id}", "user_id": str(user_id)})
+    db.execute(text("INSERT INTO user_states VALUES ('app', :user_id)"), {"user_id": str(user_id)})
+    for index in range(events):
+        db.execute(
+            text("INSERT INTO events VALUES (:id, 'app', :user_id, :session_id)"),
+            {"id": f"e-{user_id}-{index}", "user_id": str(user_id), "session_id": f"s-{user_id}"}
+        )
+    db.commit()
+
+
+def add_account_data(db, pet: Pet) -> int:
+    """Пять записей активности питомца, токен обновления и сохранённый Idempotency-Key владельца"""
+    pet_id, user_id = pet.id, pet.user_id
+    db.add_all([
+        ActivityRecord(pet_id=pet_id, category="FEEDING", title=f"Feeding {day}",
+                       date=datetime(2024, 1, day, 8), time=datetime(2024, 1, day, 8))
+        for day in range(1, 6)
+    ])
+    db.add(RefreshToken(user_id=user_id, token_hash=f"hash-{user_id}", expires_at=datetime(2099, 1, 1)))
+    db.add(IdempotencyKey(scope=f"user:{user_id}", key="k", endpoint="pets.create", request_hash="h",
+                          created_at=datetime.utcnow(), expires_at=datetime(2099, 1, 1)))
+    db.commit()
+    return user_id
+
+
+def remaining(db, user_id: int) -> dict:
+    db.expire_all()
+    return {
+        "activity_records": db.query(ActivityRecord).join(Pet).filter(Pet.user_id == user_id).count(),
+        "pets": db.query(Pet).filter_by(user_id=user_id).count(),
+        "refresh_tokens": db.query(RefreshToken).filter_by(user_id=user_id).count(),
+        "idempotency_keys": db.query(IdempotencyKey).filter_by(scope=f"user:{user_id}").count(),
+        "users": db.query(User).filter_by(id=user_id).count(),
+    }
+
+
+@pytest.fixture
+def accounts(db, pet, other_pet):
+    """Удаляемый владелец pet и владелец other_pet, чьи данные должны остаться"""
+    return add_account_data(db, pet), add_account_data(db, other_pet)
+
+
+def start_job(db, user_id: int):
+    job, token = AccountDeletionService.start_background_deletion(db, user_id, total_estimate=5)
+    db.commit()
+    return job.job_id, token
+
+
+def job_record(db, job_id: str) -> AccountDeletionJobRecord:
+    db.expire_all()
+    return db.get(AccountDeletionJobRecord, job_id)
+
+
+def test_delete_account_removes_only_the_users_rows(db, accounts, adk_tables):
+    user_id, other_id = accounts
+    add_adk_data(db, user_id, events=5)
+    add_adk_data(db, other_id, events=3)
+    assert AccountDeletionService.estimate_rows(db, user_id) == 10
+
+    deleted = AccountDeletionService.delete_account(db, user_id)
+
+    assert deleted == {
+        "events": 5, "sessions": 1, "user_states": 1, "activity_records": 5,
+        "pets": 1, "refresh_tokens": 1, "idempotency_keys": 1, "users": 1,
+    }
+    assert set(remaining(db, user_id).values()) == {0}
+    assert remaining(db, other_id) == {
+        "activity_records": 5, "pets": 1, "refresh_tokens": 1, "idempotency_keys": 1, "users": 1
+    }
+    assert db.scalar(text("SELECT count(*) FROM events WHERE user_id = :u"), {"u": str(other_id)}) == 3
+
+
+def test_background_job_completes_and_reports_progress(db, session_factory, accounts):
+    user_id, _ = accounts
+    job_id, token = start_job(db, user_id)
+    assert job_record(db, job_id).status == "pending"
+
+    assert AccountDeletionService.run_background_deletion(job_id, session_factory=session_factory) == job_id
+
+    job = AccountDeletionService.get_job(db, job_id, token)
+    assert job.status == "completed"
+    assert job.deleted["activity_records"] == 5
+    assert job.deleted["users"] == 1
+    assert set(remaining(db, user_id).values()) == {0}
+    # Токен статуса обязателен: с чужим токеном задача "не найдена"
+    assert AccountDeletionService.get_job(db, job_id, "wrong-token") is None
+
+
+def test_failed_job_keeps_committed_batches_and_resumes(db, session_factory, accounts):
+    user_id, _ = accounts
+    job_id, _ = start_job(db, user_id)
+    engine = session_factory.kw["bind"]
+
+    def fail_on_pets(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM pets"):
+            raise RuntimeError("connection lost")
+
+    event.listen(engine, "before_cursor_execute", fail_on_pets)
+    try:
+        AccountDeletionService.run_background_deletion(job_id, session_factory=session_factory)
+    finally:
+        event.remove(engine, "before_cursor_execute", fail_on_pets)
+
+    failed = job_record(db, job_id)
+    assert (failed.status, failed.attempts, failed.error) == ("failed", 1, "connection lost")
+    # Пачки записей закоммичены до сбоя, и счётчик с ними совпадает
+    assert failed.deleted == {"activity_records": 5}
+    assert remaining(db, user_id)["activity_records"] == 0
+    assert remaining(db, user_id)["pets"] == 1
+
+    assert AccountDeletionService.resume_jobs(session_factory) == 1
+
+    resumed = job_record(db, job_id)
+    assert (resumed.status, resumed.attempts, resumed.error) == ("completed", 2, None)
+    assert resumed.deleted["activity_records"] == 5
+    assert resumed.deleted["pets"] == 1
+    assert set(remaining(db, user_id).values()) == {0}
+
+
+def test_claim_skips_live_and_exhausted_jobs(db, accounts):
+    user_id, other_id = accounts
+    now = datetime.utcnow()
+    live, _ = start_job(db, user_id)
+    stale, _ = start_job(db, other_id)
+    db.query(AccountDeletionJobRecord).filter_by(job_id=live).update({"status": "running", "heartbeat_at": now})
+    db.query(AccountDeletionJobRecord).filter_by(job_id=stale).update(
+        {"status": "running", "heartbeat_at": now - timedelta(seconds=STALE_JOB_SECONDS + 1)}
+    )
+    db.commit()
+
+    # Задача с живым heartbeat занята другим воркером, брошенная - подбирается
+    assert AccountDeletionService.claim_job(db, live, now=now) is None
+    assert AccountDeletionService.claim_job(db, now=now) == stale
+    assert AccountDeletionService.claim_job(db, now=now) is None
+
+    db.query(AccountDeletionJobRecord).filter_by(job_id=stale).update({"status": "failed", "attempts": MAX_ATTEMPTS})
+    db.commit()
+    assert AccountDeletionService.claim_job(db, stale, now=now) is None
@@ -0,0 +1,115 @@
+"""
+Материализованная повестка (AgendaService): окно, синхронизация при записи и сдвиг окна.
+Инкрементальные изменения должны давать ту же повестку, что и полная перестройка
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import AgendaOccurrence, AgendaWindow
+from app.routers.activity_records import router as records_router
+from app.services.agenda_service import AGENDA_HORIZON_DAYS, AgendaService
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(records_router)
+
+
+@pytest.fixture
+def today():
+    return datetime.utcnow().date()
+
+
+def at(day, hour: int) -> str:
+    return datetime.combine(day, datetime.min.time()).replace(hour=hour).isoformat()
+
+
+def create(client, pet_id: int, title: str, starts_at: str, **extra) -> int:
+    body = {"pet_id": pet_id, "category": "FEEDING", "title": title, "date": starts_at, "time": starts_at, **extra}
+    response = client.post("/records/", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def agenda(client, **params):
+    response = client.get("/records/agenda", params=params)
+    assert response.status_code == 200, response.text
+    return [(item["id"], item["occurrence_index"], item["starts_at"]) for item in response.json()]
+
+
+def rebuilt_agenda(client, db, **params):
+    AgendaService.reset(db)
+    return agenda(client, **params)
+
+
+def test_first_read_materializes_window(client, db, pet, today):
+    pet_id, user_id = pet.id, pet.user_id
+    daily = create(client, pet_id, "Daily", at(today - timedelta(days=2), 9), repeat_type="day", repeat_count=30)
+    assert db.query(AgendaWindow).count() == 0
+
+    items = agenda(client, days=7)
+
+    assert [index for record_id, index, _ in items] == [2, 3, 4, 5, 6, 7, 8]
+    assert {record_id for record_id, _, _ in items} == {daily}
+    window = db.get(AgendaWindow, user_id)
+    assert window.window_start.date() < today < window.window_end.date()
+    # Вся серия из 31 вхождения попадает в окно целиком
+    assert db.query(AgendaOccurrence).filter_by(record_id=daily).count() == 31
+
+
+def test_writes_keep_materialized_agenda_in_sync(client, db, pet, today):
+    pet_id = pet.id
+    daily = create(client, pet_id, "Daily", at(today - timedelta(days=2), 9), repeat_type="day", repeat_count=30)
+    agenda(client)  # окно построено, дальше записи синхронизируют его сами
+
+    vet = create(client, pet_id, "Vet", at(today, 7))
+    weekly = create(client, pet_id, "Weekly", at(today + timedelta(days=1), 18), repeat_type="week", repeat_count=8)
+    assert client.patch(f"/records/{daily}", json={"repeat_type": "week"}).status_code == 200
+    assert client.patch(f"/records/{vet}", json={"time": at(today, 20), "date": at(today, 20)}).status_code == 200
+    assert client.delete(f"/records/{weekly}").status_code == 200
+
+    incremental = agenda(client, days=14)
+    assert {record_id for record_id, _, _ in incremental} == {daily, vet}
+    assert incremental == rebuilt_agenda(client, db, days=14)
+
+
+def test_category_filter(client, pet, today):
+    pet_id = pet.id
+    create(client, pet_id, "Breakfast", at(today, 8))
+    walk = create(client, pet_id, "Walk", at(today, 10), category="ACTIVITY")
+
+    assert [record_id for record_id, _, _ in agenda(client, category="ACTIVITY")] == [walk]
+
+
+def test_range_outside_window_is_expanded_on_the_fly(client, db, pet, today):
+    pet_id, user_id = pet.id, pet.user_id
+    far = today + timedelta(days=AGENDA_HORIZON_DAYS + 30)
+    monthly = create(client, pet_id, "Monthly", at(today, 10), repeat_type="month", repeat_count=12)
+    agenda(client)
+    materialized = db.query(AgendaOccurrence).filter_by(record_id=monthly).count()
+
+    items = agenda(client, start_date=far.isoformat(), days=31)
+
+    assert len(items) == 1 and items[0][0] == monthly
+    # Чтение вне окна не расширяет материализованную часть
+    assert db.query(AgendaOccurrence).filter_by(record_id=monthly).count() == materialized
+    assert db.get(AgendaWindow, user_id).window_end.date() < far
+
+
+def test_window_rolls_forward(client, db, pet, user, today):
+    pet_id, user_id = pet.id, user.id
+    daily = create(client, pet_id, "Daily", at(today, 9), repeat_type="day", repeat_count=200)
+    agenda(client)
+    old_end = db.get(AgendaWindow, user_id).window_end
+
+    later = today + timedelta(days=100)
+    window = AgendaService.ensure_window(db, user_id, today=later)
+
+    assert window.window_end > old_end
+    starts = [row.starts_at for row in db.query(AgendaOccurrence).filter_by(record_id=daily)]
+    assert min(starts) >= window.window_start
+    assert max(starts) < window.window_end
+    # Дни без пропусков и дублей: сдвиг достроил только новый хвост
+    assert len(starts) == len(set(starts)) == (max(starts) - min(starts)).days + 1
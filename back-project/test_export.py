@@ -0,0 +1,124 @@
+"""
+Потоковая выгрузка (ExportService) на SQLite: NDJSON с тегами type, CSV с заголовком и без строк,
+переписка с AI, только данные текущего пользователя и нейтрализация формул в CSV
+"""
+
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.models import ActivityCategory, ActivityRecord
+from app.services.export_service import ExportDataset, ExportFormat, ExportService, csv_value
+
+
+def export(user_id: int, export_format: ExportFormat, datasets, session_factory, agent=None) -> str:
+    async def collect():
+        return b"".join([
+            chunk async for chunk in ExportService.stream(user_id, export_format, datasets, agent, session_factory)
+        ])
+    return asyncio.run(collect()).decode("utf-8")
+
+
+def ndjson_rows(body: str) -> list:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def csv_rows(body: str) -> list:
+    return list(csv.reader(io.StringIO(body)))
+
+
+@pytest.fixture
+def agent(user):
+    """Агент с сессиями ADK в памяти: одна беседа пользователя и одна чужая"""
+    service = InMemorySessionService()
+    user_id = str(user.id)
+
+    async def fill():
+        for owner, text in ((user_id, "Is chocolate safe for dogs?"), ("9999", "someone else's question")):
+            session = await service.create_session(app_name="petcare", user_id=owner)
+            for author, part in (("user", "User's pets:\n- Rex\n\n" + text), ("petcare_agent", "No, it is toxic")):
+                await service.append_event(session, Event(
+                    invocation_id="turn-1", author=author,
+                    content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=part)])
+                ))
+
+    asyncio.run(fill())
+    return SimpleNamespace(APP_NAME="petcare", session_service=service)
+
+
+def test_ndjson_tags_rows_and_skips_other_users(session_factory, pet, records, other_pet):
+    pet_id, user_id = pet.id, pet.user_id
+
+    rows = ndjson_rows(export(user_id, ExportFormat.NDJSON, [ExportDataset.PETS, ExportDataset.RECORDS], session_factory))
+
+    assert [row["type"] for row in rows] == ["pets"] + ["records"] * 5
+    assert (rows[0]["id"], rows[0]["name"]) == (pet_id, "Rex")
+    assert [row["title"] for row in rows[1:]] == [f"Feeding {day}" for day in range(1, 6)]
+    # Питомец other_pet и его записи принадлежат другому пользователю
+    assert {row["pet_id"] for row in rows[1:]} == {pet_id}
+
+
+def test_ndjson_includes_ai_transcripts(session_factory, user, agent):
+    rows = ndjson_rows(export(user.id, ExportFormat.NDJSON, [ExportDataset.AI_MESSAGES], session_factory, agent))
+
+    assert [(row["type"], row["author"], row["content"]) for row in rows] == [
+        ("ai_messages", "user", "Is chocolate safe for dogs?"),
+        ("ai_messages", "petcare_agent", "No, it is toxic"),
+    ]
+
+
+@pytest.mark.parametrize("dataset", list(ExportDataset))
+def test_empty_csv_still_has_a_header(session_factory, user, dataset):
+    agent = SimpleNamespace(APP_NAME="petcare", session_service=InMemorySessionService())
+
+    rows = csv_rows(export(user.id, ExportFormat.CSV, [dataset], session_factory, agent))
+
+    assert len(rows) == 1
+    assert "id" in rows[0]
+
+
+def test_csv_records_are_batched_under_one_header(session_factory, pet, records):
+    chunks = list(ExportService.table_chunks(pet.user_id, ExportDataset.RECORDS, ExportFormat.CSV, session_factory, batch_size=2))
+
+    rows = csv_rows(b"".join(chunks).decode("utf-8"))
+
+    assert len(chunks) == 3
+    assert rows[0][:3] == ["id", "pet_id", "category"]
+    assert [row[rows[0].index("title")] for row in rows[1:]] == [f"Feeding {day}" for day in range(1, 6)]
+
+
+def test_csv_neutralizes_formulas(db, session_factory, pet):
+    pet_id, user_id = pet.id, pet.user_id
+    db.add(ActivityRecord(
+        pet_id=pet_id, category=ActivityCategory.CARE, title='=HYPERLINK("http://evil.example","x")',
+        notes="+1 dose", date=datetime(2024, 2, 1, 9), time=datetime(2024, 2, 1, 9), quantity="-5 g"
+    ))
+    db.commit()
+
+    header, row = csv_rows(export(user_id, ExportFormat.CSV, [ExportDataset.RECORDS], session_factory))
+
+    values = dict(zip(header, row))
+    assert values["title"] == '\'=HYPERLINK("http://evil.example","x")'
+    assert values["notes"] == "'+1 dose"
+    assert values["quantity"] == "'-5 g"
+    assert values["category"] == "CARE"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("@SUM(A1)", "'@SUM(A1)"),
+    ("\tcmd", "'\tcmd"),
+    ("Walk = fun", "Walk = fun"),
+    (-5.0, -5.0),
+    (None, ""),
+])
+def test_csv_value(value, expected):
+    assert csv_value(value) == expected
+
@@ -0,0 +1,202 @@
+"""
+Idempotency-Key на POST /records/, /pets/ и /auth/register (SQLite): повтор отдаёт сохранённый ответ,
+409 для незавершённого запроса, 422 для другого тела; ответ и данные коммитятся вместе
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import ActivityRecord, IdempotencyKey, Pet, RefreshToken, User
+from app.routers import auth
+from app.routers.activity_records import router as records_router
+from app.routers.auth import router as auth_router
+from app.routers.pets import router as pets_router
+from app.schemas.pet import PetCreate
+from app.services import idempotency_service
+from app.services.account_deletion_service import AccountDeletionService
+from app.services.idempotency_service import IDEMPOTENCY_LOCK_SECONDS, IdempotencyService, registration_scope, request_hash
+from app.services.refresh_token_service import revoke_user_refresh_tokens
+from app.services.user_service import UserService
+
+PET_BODY = {"name": "Bo", "species": "dog", "gender": "Male", "birthdate": "2020-01-01", "weight": 3}
+
+
+@pytest.fixture
+def client(make_client, pet):
+    return make_client(records_router, pets_router)
+
+
+@pytest.fixture
+def record_body(pet):
+    return {"pet_id": pet.id, "category": "FEEDING", "title": "Breakfast",
+            "date": "2025-01-01T08:00:00", "time": "2025-01-01T08:00:00"}
+
+
+def key(value: str) -> dict:
+    return {"Idempotency-Key": value}
+
+
+def add_key(db, user_id: int, value: str, age_seconds: int = 0):
+    """Незавершённый захват ключа, как будто его держит другой запрос"""
+    created_at = datetime.utcnow() - timedelta(seconds=age_seconds)
+    db.add(IdempotencyKey(
+        scope=f"user:{user_id}", key=value, endpoint="pets.create",
+        request_hash=request_hash("pets.create", PetCreate(**PET_BODY)),
+        created_at=created_at, expires_at=created_at + timedelta(days=1)
+    ))
+    db.commit()
+
+
+def test_retry_replays_the_stored_response(client, db, record_body):
+    first = client.post("/records/", json=record_body, headers=key("r-1"))
+    idempotency_service.idempotency_cache.clear()  # повтор из другого процесса читает таблицу
+    retry = client.post("/records/", json=record_body, headers=key("r-1"))
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert db.query(ActivityRecord).filter_by(title="Breakfast").count() == 1
+
+
+def test_requests_without_key_are_not_deduplicated(client, db, record_body):
+    client.post("/records/", json=record_body)
+    client.post("/records/", json=record_body)
+
+    assert db.query(ActivityRecord).filter_by(title="Breakfast").count() == 2
+    assert db.query(IdempotencyKey).count() == 0
+
+
+def test_key_reused_with_different_request_is_422(client, record_body):
+    assert client.post("/records/", json=record_body, headers=key("r-2")).status_code == 200
+
+    assert client.post("/records/", json={**record_body, "title": "Dinner"}, headers=key("r-2")).status_code == 422
+    assert client.post("/pets/", json=PET_BODY, headers=key("r-2")).status_code == 422
+
+
+def test_request_in_progress_is_409_and_abandoned_claim_is_taken_over(client, db, user):
+    user_id = user.id
+    add_key(db, user_id, "busy")
+    add_key(db, user_id, "abandoned", age_seconds=IDEMPOTENCY_LOCK_SECONDS + 1)
+
+    assert client.post("/pets/", json=PET_BODY, headers=key("busy")).status_code == 409
+    taken_over = client.post("/pets/", json=PET_BODY, headers=key("abandoned"))
+    assert taken_over.status_code == 200
+    assert db.query(Pet).filter_by(name="Bo").count() == 1
+
+
+def test_failed_request_releases_the_key(client, db, record_body, other_pet):
+    foreign = {**record_body, "pet_id": other_pet.id}
+
+    assert client.post("/records/", json=foreign, headers=key("r-3")).status_code == 403
+    assert db.query(IdempotencyKey).filter_by(key="r-3").count() == 0
+    assert client.post("/records/", json=record_body, headers=key("r-3")).status_code == 200
+
+
+def test_response_is_committed_with_the_data(client, db, monkeypatch):
+    def failing_save(self, payload, status_code=200):
+        raise RuntimeError("save failed")
+
+    monkeypatch.setattr(idempotency_service.IdempotencyClaim, "save", failing_save)
+    with pytest.raises(RuntimeError):
+        client.post("/pets/", json=PET_BODY, headers=key("p-1"))
+
+    # Ответ не сохранился - не сохранился и питомец, ключ свободен
+    assert db.query(Pet).filter_by(name="Bo").count() == 0
+    assert db.query(IdempotencyKey).filter_by(key="p-1").count() == 0
+
+
+def test_crash_after_commit_still_replays(client, db, monkeypatch):
+    def crash(self):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(idempotency_service.IdempotencyClaim, "finish", crash)
+    with pytest.raises(RuntimeError):
+        client.post("/pets/", json=PET_BODY, headers=key("p-2"))
+    monkeypatch.undo()
+
+    retry = client.post("/pets/", json=PET_BODY, headers=key("p-2"))
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert db.query(Pet).filter_by(name="Bo").count() == 1
+
+
+def test_purge_expired(db, user):
+    add_key(db, user.id, "old")
+    assert IdempotencyService.purge_expired(db, now=datetime.utcnow() + timedelta(days=2)) == 1
+    assert db.query(IdempotencyKey).count() == 0
+
+
+@pytest.fixture
+def register(make_client, monkeypatch):
+    """register(body, key) - POST /auth/register с Firebase-заглушкой; firebase_calls - созданные в Firebase email"""
+    firebase_calls = []
+    monkeypatch.setattr(
+        auth, "register_user_and_send_verification",
+        lambda email, password, username=None: firebase_calls.append(email) or {"uid": f"firebase-{email}"}
+    )
+    client = make_client(auth_router)
+
+    def post(body: dict, value: str):
+        idempotency_service.idempotency_cache.clear()  # повтор читает таблицу, как из другого процесса
+        return client.post("/auth/register", json=body, headers=key(value))
+
+    post.firebase_calls = firebase_calls
+    return post
+
+
+def registration(name: str) -> dict:
+    return {"username": name, "email": f"{name}@example.com", "password": "secret-password"}
+
+
+def test_registration_replay_issues_new_tokens(register, db):
+    body = registration("newcomer")
+
+    first = register(body, "reg-1")
+    retry = register(body, "reg-1")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["user"] == first.json()["user"]
+    assert retry.json()["refresh_token"] != first.json()["refresh_token"]
+    assert register.firebase_calls == ["newcomer@example.com"]
+    # Токены под ключом не хранятся, email - только в виде HMAC
+    stored = db.query(IdempotencyKey).filter_by(key="reg-1").one()
+    assert "token" not in stored.response_body
+    assert stored.scope == registration_scope(" NewComer@Example.com ")
+    assert "newcomer" not in stored.scope
+
+    db.query(User).filter_by(username="newcomer").update({"is_active": False})
+    db.commit()
+    assert register(body, "reg-1").status_code == 403
+
+
+def test_registration_keys_are_scoped_by_email(register, db):
+    # Один и тот же ключ у разных клиентов - разные регистрации, а не 422
+    assert register(registration("alice"), "shared-key").status_code == 200
+    assert register(registration("bob"), "shared-key").status_code == 200
+    assert db.query(User).filter(User.username.in_(["alice", "bob"])).count() == 2
+
+
+@pytest.mark.parametrize("change", ["password", "revoke"])
+def test_registration_replay_refused_after_credentials_change(register, db, change):
+    body = registration("changer")
+    assert register(body, "reg-2").status_code == 200
+    db_user = db.query(User).filter_by(username="changer").one()
+    if change == "password":
+        UserService.change_password(db, db_user, "another-password")
+    else:
+        revoke_user_refresh_tokens(db, db_user.id)
+
+    retry = register(body, "reg-2")
+
+    assert retry.status_code == 401
+    assert db.query(RefreshToken).filter_by(user_id=db_user.id, is_valid=True).count() == (1 if change == "password" else 0)
+
+
+def test_account_deletion_purges_registration_keys(register, db):
+    assert register(registration("leaver"), "reg-3").status_code == 200
+    user_id = db.query(User.id).filter_by(username="leaver").scalar()
+
+    AccountDeletionService.delete_account(db, user_id)
+
+    assert db.query(IdempotencyKey).filter_by(key="reg-3").count() == 0
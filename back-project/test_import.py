@@ -0,0 +1,132 @@
+"""
+Массовый импорт POST /records/import на SQLite: пропуск дубликатов, ошибки по строкам
+и отказ для файла, который нельзя разобрать
+"""
+
+import csv
+import json
+
+import pytest
+
+from app.models import ActivityRecord, ScheduledReminder
+from app.routers import activity_records
+from app.routers.activity_records import router as records_router
+
+CSV_HEADER = "pet_id,category,title,date,time,quantity\n"
+
+
+@pytest.fixture
+def client(make_client, records):
+    return make_client(records_router)
+
+
+def ndjson(*rows) -> bytes:
+    return "".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows).encode("utf-8")
+
+
+def row(pet_id: int, title: str, day: int, **extra) -> dict:
+    moment = f"2025-01-{day:02d}T08:00:00"
+    return {"pet_id": pet_id, "category": "FEEDING", "title": title, "date": moment, "time": moment, **extra}
+
+
+def import_file(client, content: bytes, format: str = "ndjson"):
+    return client.post("/records/import", params={"format": format}, content=content)
+
+
+def test_ndjson_import_skips_duplicates(client, db, pet):
+    pet_id = pet.id
+    existing = {"pet_id": pet_id, "category": "FEEDING", "title": "Feeding 1",
+                "date": "2024-01-01T08:00:00", "time": "2024-01-01T08:00:00"}
+    content = ndjson(
+        row(pet_id, "Breakfast", 1, quantity="200 g"),
+        existing,  # уже есть в базе
+        row(pet_id, "Breakfast", 1, quantity="200 g"),  # повтор в самом файле
+        row(pet_id, "Dinner", 1),
+        {"type": "pets", "id": pet_id, "name": "Rex"},  # строки /export других типов пропускаются
+    )
+
+    response = import_file(client, content)
+
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["total_rows"], report["imported"], report["duplicates"], report["failed"]) == (4, 2, 2, 0)
+    assert report["duplicate_rows"] == [2, 3]
+    breakfast = db.query(ActivityRecord).filter_by(title="Breakfast").one()
+    assert (breakfast.quantity_value, breakfast.quantity_unit) == (200.0, "g")
+
+    # Повторный импорт того же файла ничего не добавляет
+    again = import_file(client, content).json()
+    assert (again["imported"], again["duplicates"]) == (0, 4)
+
+
+def test_row_errors_are_reported_and_valid_rows_imported(client, pet, other_pet):
+    pet_id, other_pet_id = pet.id, other_pet.id
+    content = ndjson(
+        row(pet_id, "Good", 2),
+        "{not json",
+        "[1, 2]",
+        {"pet_id": pet_id, "category": "FEEDING"},
+        row(other_pet_id, "Foreign", 2),
+        row(pet_id, "Nul\u0000", 2),
+    )
+
+    report = import_file(client, content).json()
+
+    assert (report["imported"], report["failed"]) == (1, 5)
+    errors = {error["row"]: error["errors"] for error in report["errors"]}
+    assert errors[2][0].startswith("Invalid JSON")
+    assert errors[3] == ["Expected a JSON object"]
+    assert any(message.startswith("title:") for message in errors[4])
+    assert errors[5] == ["pet_id: Pet not found or access denied"]
+    assert errors[6] == ["NUL characters are not allowed"]
+
+
+def test_csv_import_with_bad_row(client, pet):
+    pet_id = pet.id
+    content = (
+        CSV_HEADER
+        + f"{pet_id},FEEDING,Breakfast,2025-02-01T08:00:00,2025-02-01T08:00:00,1 cup\n"
+        + f"{pet_id},FEEDING,{'x' * 200},2025-02-02T08:00:00,2025-02-02T08:00:00,\n"
+        + f"{pet_id},CARE,Brushing,2025-02-03T08:00:00,2025-02-03T08:00:00,\n"
+    ).encode("utf-8")
+
+    # Слишком длинное поле - csv.Error на второй записи
+    previous_limit = csv.field_size_limit(100)
+    try:
+        report = import_file(client, content, "csv").json()
+    finally:
+        csv.field_size_limit(previous_limit)
+
+    assert (report["total_rows"], report["imported"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 2
+    assert report["errors"][0]["errors"][0].startswith("Invalid CSV")
+
+
+@pytest.mark.parametrize("content, format", [
+    (CSV_HEADER.encode("utf-8") + "1,FEEDING,Корм,2025-02-01T08:00:00,2025-02-01T08:00:00,\n".encode("cp1251"), "csv"),
+    (b'{"title": "\xff"}\n', "ndjson"),
+])
+def test_non_utf8_file_is_rejected(client, db, content, format):
+    before = db.query(ActivityRecord).count()
+
+    response = import_file(client, content, format)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Import file must be UTF-8 encoded"
+    assert db.query(ActivityRecord).count() == before
+    # Откат не оставляет staging-таблицу: следующий импорт проходит
+    assert import_file(client, ndjson()).status_code == 200
+
+
+def test_import_schedules_reminders(client, db, pet):
+    pet_id = pet.id
+    report = import_file(client, ndjson(row(pet_id, "Future", 1) | {"date": "2099-01-01T08:00:00", "time": "2099-01-01T08:00:00"})).json()
+
+    assert report["imported"] == 1
+    assert db.query(ScheduledReminder).count() == 1
+
+
+def test_oversized_body_is_rejected(client, pet, monkeypatch):
+    monkeypatch.setattr(activity_records, "IMPORT_MAX_BYTES", 10)
+
+    assert import_file(client, ndjson(row(pet.id, "Too big", 1))).status_code == 413
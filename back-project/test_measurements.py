@@ -0,0 +1,71 @@
+"""
+Разбор quantity/duration свободным текстом (app/utils/measurements.py)
+и нормализованные колонки при создании и изменении записи
+"""
+
+import pytest
+
+from app.models import ActivityRecord
+from app.routers.activity_records import router as records_router
+from app.utils.measurements import Quantity, measurement_columns, parse_duration_minutes, parse_quantity
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("200g", Quantity(200.0, "g")),
+    ("2,5 kg", Quantity(2500.0, "g")),
+    ("1 кг 200 г", Quantity(1200.0, "g")),
+    ("1 lb", Quantity(453.592, "g")),
+    ("2 cups", Quantity(480.0, "ml")),
+    ("1/2 cup", Quantity(120.0, "ml")),
+    ("100-150 g", Quantity(125.0, "g")),
+    ("1 1/2 scoops", Quantity(1.5, "scoop")),
+    ("1 банка", Quantity(1.0, "can")),
+    ("3 treats", Quantity(3.0, "treat")),
+    ("3", Quantity(3.0, None)),
+    ("немного", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("30 minutes", 30.0),
+    ("1 hour", 60.0),
+    ("1h 30m", 90.0),
+    ("1:30", 90.0),
+    ("полчаса", 30.0),
+    ("2 часа", 120.0),
+    ("1,5 ч", 90.0),
+    ("90 sec", 1.5),
+    ("2 days", 2880.0),
+    ("45", 45.0),
+    ("долго", None),
+    (None, None),
+])
+def test_parse_duration_minutes(text, expected):
+    assert parse_duration_minutes(text) == expected
+
+
+def test_measurement_columns():
+    assert measurement_columns("200 мл", "1 час") == {"quantity_value": 200.0, "quantity_unit": "ml", "duration_minutes": 60.0}
+    assert measurement_columns(None, None) == {"quantity_value": None, "quantity_unit": None, "duration_minutes": None}
+
+
+def test_record_writes_normalize_columns(db, pet, make_client):
+    client = make_client(records_router)
+    body = {
+        "pet_id": pet.id, "category": "FEEDING", "title": "Dinner", "quantity": "1 кг 200 г",
+        "date": "2024-01-01T18:00:00", "time": "2024-01-01T18:00:00"
+    }
+    created = client.post("/records/", json=body).json()
+    assert (created["quantity_value"], created["quantity_unit"], created["duration_minutes"]) == (1200.0, "g", None)
+
+    updated = client.patch(f"/records/{created['id']}", json={"quantity": "2 cups", "duration": "полчаса"}).json()
+    assert (updated["quantity_value"], updated["quantity_unit"], updated["duration_minutes"]) == (480.0, "ml", 30.0)
+
+    # Изменение без quantity/duration не сбрасывает разобранные значения
+    client.patch(f"/records/{created['id']}", json={"title": "Supper"})
+    stored = db.get(ActivityRecord, created["id"])
+    assert (stored.quantity_value, stored.quantity_unit, stored.duration_minutes) == (480.0, "ml", 30.0)
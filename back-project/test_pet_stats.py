@@ -0,0 +1,105 @@
+"""
+Статистика питомца GET /pets/{id}/stats: счётчики по периодам, серии дней (gaps and islands)
+и соблюдение расписания повторяющихся записей
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.models import ActivityCategory, ActivityRecord
+from app.models.activity_record import RepeatType
+from app.routers.activity_records import router as records_router
+from app.routers.pets import router as pets_router
+from app.utils.measurements import measurement_columns
+
+END_DATE = "2024-03-07"
+
+
+def record(pet_id: int, category: ActivityCategory, day: datetime, quantity=None, **extra) -> ActivityRecord:
+    return ActivityRecord(
+        pet_id=pet_id, category=category, title=category.value, date=day, time=day,
+        quantity=quantity, **measurement_columns(quantity, None), **extra
+    )
+
+
+@pytest.fixture
+def stats_pet(db, pet):
+    """Кормления 1-3 и 5-6 марта (два "острова"), визит 10 февраля и ежедневная серия кормлений 1-7 марта"""
+    feeding, care = ActivityCategory.FEEDING, ActivityCategory.CARE
+    db.add_all([record(pet.id, feeding, datetime(2024, 3, day, 8), quantity="200 g") for day in (1, 2, 3, 5, 6)])
+    db.add_all([
+        record(pet.id, feeding, datetime(2024, 3, 6, 19), quantity="0.1 kg"),
+        record(pet.id, care, datetime(2024, 2, 10, 12)),
+        record(pet.id, feeding, datetime(2024, 3, 1, 7), repeat_type=RepeatType.DAY, repeat_count=6),
+    ])
+    db.commit()
+    return pet.id
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(pets_router, records_router)
+
+
+def get_stats(client, pet_id: int, **params):
+    response = client.get(f"/pets/{pet_id}/stats", params={"end_date": END_DATE, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def by_category(items):
+    return {item["category"]: item for item in items}
+
+
+def test_month_buckets_and_totals(client, stats_pet):
+    stats = get_stats(client, stats_pet)
+
+    buckets = {(item["bucket"], item["category"]): item for item in stats["buckets"]}
+    assert buckets[("2024-02-01", "CARE")]["count"] == 1
+    march = buckets[("2024-03-01", "FEEDING")]
+    assert march["count"] == 7
+    assert march["quantity_g"] == pytest.approx(5 * 200 + 100)
+    totals = by_category(stats["totals"])
+    assert totals["FEEDING"]["total"] == 7
+    # С первой записи (10 февраля) по 7 марта 2024 - 27 дней
+    assert totals["FEEDING"]["per_day"] == pytest.approx(round(7 / 27, 3))
+
+
+def test_week_buckets_start_on_monday(client, stats_pet):
+    stats = get_stats(client, stats_pet, bucket="week", start_date="2024-03-01")
+
+    assert {item["bucket"] for item in stats["buckets"]} == {"2024-02-26", "2024-03-04"}
+    assert sum(item["count"] for item in stats["buckets"]) == 7
+
+
+def test_streaks_gaps_and_islands(client, stats_pet):
+    streaks = by_category(get_stats(client, stats_pet)["streaks"])
+
+    assert streaks["FEEDING"] == {"category": "FEEDING", "current_days": 2, "longest_days": 3, "last_day": "2024-03-06"}
+    assert streaks["CARE"]["current_days"] == 0
+    assert streaks["CARE"]["longest_days"] == 1
+
+
+def test_adherence_compares_schedule_with_logged_days(client, stats_pet):
+    adherence = by_category(get_stats(client, stats_pet)["adherence"])
+
+    assert list(adherence) == ["FEEDING"]
+    assert adherence["FEEDING"]["scheduled_days"] == 7
+    assert adherence["FEEDING"]["logged_days"] == 5
+    assert adherence["FEEDING"]["rate"] == pytest.approx(round(5 / 7, 3))
+
+
+def test_new_record_invalidates_cached_stats(client, stats_pet):
+    assert by_category(get_stats(client, stats_pet)["totals"])["CARE"]["total"] == 1
+    body = {"pet_id": stats_pet, "category": "CARE", "title": "Vet", "date": "2024-03-04T10:00:00", "time": "2024-03-04T10:00:00"}
+    assert client.post("/records/", json=body).status_code == 200
+
+    assert by_category(get_stats(client, stats_pet)["totals"])["CARE"]["total"] == 2
+
+
+def test_foreign_or_missing_pet_is_not_found(client, other_pet):
+    other_pet_id = other_pet.id
+    assert client.get(f"/pets/{other_pet_id}/stats").status_code == 404
+    assert client.get("/pets/9999/stats").status_code == 404
+    assert client.get(f"/pets/{other_pet_id}/stats", params={"start_date": "2024-03-02", "end_date": "2024-03-01"}).status_code == 400
@@ -0,0 +1,103 @@
+"""
+Бюджеты SQL-выражений горячих маршрутов (ROUTE_QUERY_BUDGETS) на SQLite.
+Записи проверяются по худшему случаю: холодный кэш питомцев, напоминание и окно повестки
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.query_debug import QueryBudgetExceeded, budget_for, query_budget
+from app.routers.activity_records import router as records_router
+from app.routers.auth import router as auth_router
+from app.routers.pets import router as pets_router
+from app.services.user_service import UserService
+
+PET_BODY = {"name": "Bo", "species": "dog", "gender": "Male", "birthdate": "2020-01-01", "weight": 3}
+
+
+@pytest.fixture
+def client(make_client, records):
+    return make_client(records_router, pets_router)
+
+
+def within_budget(method: str, route: str, request, idempotent: bool = False):
+    with query_budget(budget_for(method, route, idempotent), f"{method} {route}"):
+        response = request()
+    assert response.status_code == 200, response.text
+    return response
+
+
+def record_body(pet_id: int, **extra) -> dict:
+    # Через час: попадает и в напоминания, и в сегодняшнее окно повестки
+    starts_at = (datetime.utcnow() + timedelta(hours=1)).replace(microsecond=0).isoformat()
+    return {"pet_id": pet_id, "category": "FEEDING", "title": "Breakfast", "date": starts_at, "time": starts_at, **extra}
+
+
+def test_query_budget_raises_when_exceeded(client, pet):
+    pet_id = pet.id
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1, "GET /records/"):
+            client.get("/records/", params={"pet_id": pet_id})
+
+
+def test_pets_budgets(client):
+    within_budget("GET", "/pets/", lambda: client.get("/pets/"))
+    within_budget("POST", "/pets/", lambda: client.post("/pets/", json=PET_BODY))
+    within_budget(
+        "POST", "/pets/", lambda: client.post("/pets/", json=PET_BODY, headers={"Idempotency-Key": "pet-1"}),
+        idempotent=True
+    )
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/records/", {"pet_id": 1}),
+    ("/records/all-user-pets", {}),
+    ("/records/all-user-pets", {"fields": "calendar"}),
+    ("/records/by-date", {"date": "2024-01-02"}),
+    ("/records/by-date-range", {"start_date": "2024-01-01", "end_date": "2024-01-31"}),
+    ("/records/calendar-summary", {"month": "2024-01"}),
+])
+def test_record_read_budgets(client, path, params):
+    within_budget("GET", path, lambda: client.get(path, params=params))
+
+
+def test_get_record_budget(client, records):
+    record_id = records[0].id
+    within_budget("GET", "/records/{record_id}", lambda: client.get(f"/records/{record_id}"))
+
+
+def test_record_write_budgets(client, pet):
+    # Объекты фикстур истекли после commit: id читаем до подсчёта, иначе считается и их перечитывание
+    pet_id = pet.id
+    # Окно повестки уже материализовано: запись синхронизирует вхождения
+    assert client.get("/records/agenda").status_code == 200
+
+    created = within_budget("POST", "/records/", lambda: client.post("/records/", json=record_body(pet_id)))
+    record_id = created.json()["id"]
+    within_budget(
+        "POST", "/records/",
+        lambda: client.post("/records/", json=record_body(pet_id, repeat_type="day", repeat_count=5),
+                            headers={"Idempotency-Key": "record-1"}),
+        idempotent=True
+    )
+
+    later = (datetime.utcnow() + timedelta(hours=2)).replace(microsecond=0).isoformat()
+    within_budget("PATCH", "/records/{record_id}", lambda: client.patch(f"/records/{record_id}", json={"time": later}))
+    within_budget("PATCH", "/records/{record_id}", lambda: client.patch(f"/records/{record_id}", json={"repeat_type": "week"}))
+
+
+def test_auth_budgets(db, user, make_client):
+    user.hashed_password = UserService.hash_password("secret-password")
+    db.commit()
+    email = user.email
+    client = make_client(auth_router)
+
+    login = within_budget(
+        "POST", "/auth/login",
+        lambda: client.post("/auth/login", json={"email": email, "password": "secret-password"})
+    )
+    within_budget(
+        "POST", "/auth/refresh",
+        lambda: client.post("/auth/refresh", json={"refresh_token": login.json()["refresh_token"]})
+    )
@@ -0,0 +1,112 @@
+"""
+Повторы записей (app/utils/recurrence.py) и сводка календаря /records/calendar-summary
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import ActivityCategory, ActivityRecord
+from app.models.activity_record import RepeatType
+from app.routers.activity_records import router as records_router
+from app.utils.recurrence import (
+    DEFAULT_REPEAT_COUNTS,
+    add_months,
+    first_index_from,
+    iter_occurrences,
+    next_occurrence,
+    occurrence_at,
+)
+
+START = datetime(2024, 1, 31, 8, 0)
+
+
+def test_add_months_clamps_to_month_end():
+    assert add_months(START, 1) == datetime(2024, 2, 29, 8, 0)
+    assert add_months(START, 2) == datetime(2024, 3, 31, 8, 0)
+    assert add_months(START, 13) == datetime(2025, 2, 28, 8, 0)
+
+
+def test_occurrence_at_uses_interval():
+    assert occurrence_at(START, RepeatType.DAY, 2, 3) == START + timedelta(days=6)
+    assert occurrence_at(START, RepeatType.WEEK, 1, 2) == START + timedelta(weeks=2)
+    assert occurrence_at(START, RepeatType.YEAR, 1, 1) == datetime(2025, 1, 31, 8, 0)
+    assert occurrence_at(START, RepeatType.NONE, 1, 5) == START
+
+
+@pytest.mark.parametrize("repeat_type", list(DEFAULT_REPEAT_COUNTS))
+def test_unbounded_series_uses_client_defaults(repeat_type):
+    occurrences = list(iter_occurrences(START, repeat_type))
+    # Сама запись плюс повторы по умолчанию, как в мобильном клиенте
+    assert len(occurrences) == DEFAULT_REPEAT_COUNTS[repeat_type] + 1
+
+
+def test_series_bounded_by_count_and_end_date():
+    assert list(iter_occurrences(START, RepeatType.MONTH, repeat_count=2)) == [
+        START, datetime(2024, 2, 29, 8, 0), datetime(2024, 3, 31, 8, 0)
+    ]
+    by_end_date = list(iter_occurrences(START, RepeatType.DAY, repeat_end_date=datetime(2024, 2, 3, 23, 59)))
+    assert by_end_date[-1] == datetime(2024, 2, 3, 8, 0)
+    assert len(by_end_date) == 4
+
+
+@pytest.mark.parametrize("repeat_type, interval", [
+    (RepeatType.DAY, 1), (RepeatType.DAY, 3), (RepeatType.WEEK, 2), (RepeatType.MONTH, 1), (RepeatType.YEAR, 1),
+])
+def test_window_matches_walking_the_series(repeat_type, interval):
+    window_start, window_end = datetime(2024, 3, 1), datetime(2024, 6, 1)
+    walked = [
+        occurrence for occurrence in iter_occurrences(START, repeat_type, interval, repeat_count=400)
+        if window_start <= occurrence < window_end
+    ]
+    windowed = list(iter_occurrences(
+        START, repeat_type, interval, repeat_count=400, window_start=window_start, window_end=window_end
+    ))
+    assert windowed == walked
+    if walked:
+        index = first_index_from(START, repeat_type, interval, window_start)
+        assert occurrence_at(START, repeat_type, interval, index) == walked[0]
+
+
+def test_next_occurrence():
+    start = datetime(2024, 1, 1, 8, 0)
+    assert next_occurrence(start, RepeatType.WEEK, 1, None, 10, after=datetime(2024, 1, 9)) == (2, datetime(2024, 1, 15, 8, 0))
+    assert next_occurrence(start, RepeatType.WEEK, 1, None, 1, after=datetime(2024, 1, 9)) is None
+    assert next_occurrence(start, RepeatType.NONE, after=datetime(2023, 12, 1)) == (0, start)
+
+
+def test_calendar_summary_counts_singles_and_expanded_series(db, pet, other_pet, make_client):
+    db.add_all([
+        ActivityRecord(pet_id=pet.id, category=ActivityCategory.FEEDING, title="Breakfast",
+                       date=datetime(2024, 2, 10, 8), time=datetime(2024, 2, 10, 8)),
+        ActivityRecord(pet_id=pet.id, category=ActivityCategory.CARE, title="Vet",
+                       date=datetime(2024, 2, 10, 15), time=datetime(2024, 2, 10, 15)),
+        # Серия с конца января: в феврале три вхождения из шести
+        ActivityRecord(pet_id=pet.id, category=ActivityCategory.ACTIVITY, title="Walk",
+                       date=datetime(2024, 1, 29, 7), time=datetime(2024, 1, 29, 7),
+                       repeat_type=RepeatType.DAY, repeat_count=5),
+        # Чужой питомец в сводку не попадает
+        ActivityRecord(pet_id=other_pet.id, category=ActivityCategory.FEEDING, title="Foreign",
+                       date=datetime(2024, 2, 10, 8), time=datetime(2024, 2, 10, 8)),
+    ])
+    db.commit()
+    pet_id = pet.id
+    client = make_client(records_router)
+
+    response = client.get("/records/calendar-summary", params={"month": "2024-02"})
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["month"] == "2024-02"
+    days = {day["date"]: day for day in summary["days"]}
+    assert sorted(days) == ["2024-02-01", "2024-02-02", "2024-02-03", "2024-02-10"]
+    assert days["2024-02-10"]["total"] == 2
+    assert days["2024-02-10"]["by_category"] == {"FEEDING": 1, "CARE": 1}
+    assert days["2024-02-10"]["by_pet"] == {str(pet_id): 2}
+    assert days["2024-02-01"]["by_category"] == {"ACTIVITY": 1}
+
+
+def test_calendar_summary_rejects_bad_month(make_client):
+    client = make_client(records_router)
+    assert client.get("/records/calendar-summary", params={"month": "2024-13"}).status_code == 422
+    assert client.get("/records/calendar-summary", params={"month": date(2024, 2, 1).isoformat()}).status_code == 422
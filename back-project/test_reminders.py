@@ -0,0 +1,143 @@
+"""
+Серверные напоминания (ReminderService, ReminderScheduler): очередь при записи, перенос серии,
+пропуск опоздавших и возврат пачки в очередь при сбое sink (at-least-once)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import ScheduledReminder
+from app.routers.activity_records import router as records_router
+from app.services.reminder_service import (
+    REMINDER_MAX_LATENESS_SECONDS, InMemoryReminderSink, ReminderScheduler, ReminderService, ReminderSink
+)
+
+
+class FailingSink(ReminderSink):
+    def emit(self, reminders):
+        raise ConnectionError("push service unavailable")
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(records_router)
+
+
+@pytest.fixture
+def now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def create(client, pet_id: int, starts_at: datetime, **extra) -> int:
+    body = {"pet_id": pet_id, "category": "FEEDING", "title": "Feeding",
+            "date": starts_at.isoformat(), "time": starts_at.isoformat(), **extra}
+    response = client.post("/records/", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def queued(db, record_id: int):
+    db.expire_all()
+    reminder = db.query(ScheduledReminder).filter_by(record_id=record_id).one_or_none()
+    return reminder and (reminder.occurrence_index, reminder.due_at)
+
+
+def test_record_writes_keep_the_queue_in_sync(client, db, pet, now):
+    tomorrow = now + timedelta(days=1)
+    record_id = create(client, pet.id, tomorrow)
+    assert queued(db, record_id) == (0, tomorrow)
+
+    later = tomorrow + timedelta(hours=2)
+    client.patch(f"/records/{record_id}", json={"date": later.isoformat(), "time": later.isoformat()})
+    assert queued(db, record_id) == (0, later)
+
+    # Изменение вне расписания не трогает очередь
+    client.patch(f"/records/{record_id}", json={"title": "Dinner"})
+    assert queued(db, record_id) == (0, later)
+
+    client.patch(f"/records/{record_id}", json={"notify": False})
+    assert queued(db, record_id) is None
+
+
+def test_started_series_queues_its_next_occurrence(client, db, pet, now):
+    started = now - timedelta(days=2, hours=1)
+    record_id = create(client, pet.id, started, repeat_type="day", repeat_count=5)
+    assert queued(db, record_id) == (3, started + timedelta(days=3))
+
+    past = create(client, pet.id, now - timedelta(days=1))
+    assert queued(db, past) is None
+
+
+def test_process_due_emits_and_reschedules_series(client, db, pet, now):
+    pet_id = pet.id
+    start = now + timedelta(hours=1)
+    daily = create(client, pet_id, start, repeat_type="day", repeat_count=2)
+    once = create(client, pet_id, start + timedelta(minutes=5))
+    sink = InMemoryReminderSink()
+
+    assert ReminderService.process_due(db, sink, now=start - timedelta(minutes=1)) == 0
+    assert ReminderService.process_due(db, sink, now=start + timedelta(minutes=10)) == 2
+
+    assert [(item.record_id, item.occurrence_index, item.due_at) for item in sink.emitted] == [
+        (daily, 0, start), (once, 0, start + timedelta(minutes=5))
+    ]
+    assert sink.emitted[0].pet_id == pet_id
+    assert queued(db, daily) == (1, start + timedelta(days=1))
+    assert queued(db, once) is None
+
+    # Последнее вхождение серии снимает её с очереди
+    ReminderService.process_due(db, sink, now=start + timedelta(days=1))
+    ReminderService.process_due(db, sink, now=start + timedelta(days=2))
+    assert [item.occurrence_index for item in sink.emitted[2:]] == [1, 2]
+    assert queued(db, daily) is None
+
+
+def test_late_reminders_are_skipped_but_series_moves_on(client, db, pet, now):
+    start = now + timedelta(hours=1)
+    record_id = create(client, pet.id, start, repeat_type="day", repeat_count=10)
+    sink = InMemoryReminderSink()
+
+    # Сервер простоял больше REMINDER_MAX_LATENESS_SECONDS: пропущенные вхождения не догоняем
+    moment = start + timedelta(days=2, seconds=REMINDER_MAX_LATENESS_SECONDS + 1)
+    assert ReminderService.process_due(db, sink, now=moment) == 1
+
+    assert sink.emitted == []
+    assert queued(db, record_id) == (3, start + timedelta(days=3))
+
+
+def test_sink_failure_keeps_the_batch_queued(client, db, pet, now):
+    start = now + timedelta(hours=1)
+    record_id = create(client, pet.id, start, repeat_type="day", repeat_count=3)
+
+    with pytest.raises(ConnectionError):
+        ReminderService.process_due(db, FailingSink(), now=start)
+    assert queued(db, record_id) == (0, start)
+
+    sink = InMemoryReminderSink()
+    assert ReminderService.process_due(db, sink, now=start) == 1
+    assert [item.record_id for item in sink.emitted] == [record_id]
+
+
+def test_scheduler_drains_the_queue_in_batches(client, db, pet, session_factory, now):
+    start = now + timedelta(hours=1)
+    record_ids = [create(client, pet.id, start + timedelta(minutes=minute)) for minute in range(5)]
+    sink = InMemoryReminderSink()
+    scheduler = ReminderScheduler(session_factory=session_factory, sink=sink, batch_size=2, max_sleep_seconds=60)
+
+    assert scheduler.seconds_until_next(now=start - timedelta(seconds=30)) == 30
+    assert scheduler.run_once(now=start + timedelta(minutes=10)) == 5
+
+    assert [item.record_id for item in sink.emitted] == record_ids
+    assert scheduler.seconds_until_next() == 60
+
+
+def test_rebuild_queue_matches_incremental_sync(client, db, pet, now):
+    pet_id = pet.id
+    create(client, pet_id, now - timedelta(days=1, hours=1), repeat_type="day", repeat_count=5)
+    create(client, pet_id, now + timedelta(days=1))
+    create(client, pet_id, now + timedelta(days=1), notify=False)
+    incremental = sorted(db.query(ScheduledReminder.record_id, ScheduledReminder.occurrence_index, ScheduledReminder.due_at).all())
+
+    assert ReminderService.rebuild_queue(db, now=now) == 2
+    assert sorted(db.query(ScheduledReminder.record_id, ScheduledReminder.occurrence_index, ScheduledReminder.due_at).all()) == incremental